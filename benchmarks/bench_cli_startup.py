@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from expense_tracker.models import Database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(cmd, env) -> float:
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start time of 'finly summary' in a fresh interpreter.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(path)
+        with db.transaction():
+            for day in range(1, 29):
+                db.add_transaction(f"2024-06-{day:02d}", (10 + day) * 100, 1, "Expense", f"Item {day}")
+        db.close()
+
+        cmd = [sys.executable, "-m", "expense_tracker.cli", "--db", path, "summary", "2024-06"]
+        # The first run also compiles bytecode; it is not part of the sample.
+        timed(cmd, env)
+        samples = [timed(cmd, env) for _ in range(args.repeat)]
+        baseline = min(timed([sys.executable, "-c", "pass"], env) for _ in range(3))
+
+    leaked = subprocess.run(
+        [sys.executable, "-c", "import sys, expense_tracker.cli; print(','.join(m for m in ('PySide6', 'expense_tracker.importers', 'expense_tracker.exporters') if m in sys.modules))"],
+        check=True,
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+    median = statistics.median(samples) * 1000
+    print(f"finly summary: median {median:.1f} ms, min {min(samples) * 1000:.1f} ms over {args.repeat} runs")
+    print(f"bare interpreter: {baseline * 1000:.1f} ms")
+    failed = False
+    if leaked:
+        print(f"FAIL: importing expense_tracker.cli pulls in {leaked}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import build_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RESULT = re.compile(r"time to first paint: ([\d.]+) ms, time to data: ([\d.]+) ms")
+
+
+def start(cmd, env):
+    # (time to first paint, time to data) in ms as the app reports them.
+    out = subprocess.run(cmd, check=True, env=env, cwd=ROOT, capture_output=True, text=True, timeout=120).stderr
+    m = _RESULT.search(out)
+    if m is None:
+        raise RuntimeError(f"no startup profile in the output:\n{out}")
+    return float(m.group(1)), float(m.group(2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start of the desktop app (offscreen) in a fresh interpreter.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="for the median time to data")
+    args = parser.parse_args(argv)
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+        FINLY_AUTO_BACKUP="0",
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, args.rows).close()
+        cmd = [sys.executable, "-m", "expense_tracker.main", "--db", path, "--profile-startup", "--quit-after-startup"]
+        # The first run also compiles bytecode; it is not part of the sample.
+        start(cmd, env)
+        samples = [start(cmd, env) for _ in range(args.repeat)]
+
+    paint = statistics.median(s[0] for s in samples)
+    data = statistics.median(s[1] for s in samples)
+    print(f"first paint: median {paint:.1f} ms, min {min(s[0] for s in samples):.1f} ms over {args.repeat} runs")
+    print(f"data:        median {data:.1f} ms, min {min(s[1] for s in samples):.1f} ms")
+    if data > args.budget_ms:
+        print(f"FAIL: over the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from expense_tracker.migrations import LATEST_VERSION, migrate
+from expense_tracker.models import Database, TransactionFilter
+
+
+def populate(conn: sqlite3.Connection, rows: int, years: int = 5, seed: int = 1234):
+    rnd = random.Random(seed)
+    conn.executemany(
+        "INSERT OR IGNORE INTO categories (id, name) VALUES (?, ?)",
+        [(i, f"Category {i}") for i in range(2, 21)],
+    )
+    first_year = 2025 - years + 1
+
+    def gen():
+        for _ in range(rows):
+            date = f"{rnd.randint(first_year, 2025):04d}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+            t_type = "Income" if rnd.random() < 0.1 else "Expense"
+            yield date, round(rnd.uniform(1, 500), 2), rnd.randint(1, 20), t_type, "Synthetic"
+
+    conn.executemany(
+        "INSERT INTO transactions (date, amount, category_id, type, description) VALUES (?, ?, ?, ?, ?)",
+        gen(),
+    )
+    conn.commit()
+
+
+def capture_sql(db: Database, call):
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def measure(db: Database, repeat: int):
+    # The statements are captured from the real Database methods so the plans
+    # below are the ones the app actually runs.
+    workloads = {
+        "month page": lambda: db.get_transactions_page(2024, 6),
+        "monthly summary": lambda: db.get_monthly_summary(2024, 6),
+        "month range aggregate": lambda: db.conn.execute(
+            """
+            SELECT type, SUM(amount) FROM transactions
+            WHERE type IN ('Income', 'Expense') AND date >= ? AND date < ?
+            GROUP BY type
+            """,
+            ("2024-06-01", "2024-07-01"),
+        ).fetchall(),
+        "category in use": lambda: db.category_in_use(20),
+        "filtered page, two categories by date": lambda: db.query_page(
+            TransactionFilter(start_date="2023-01-01", category_ids=(3, 7))
+        ),
+        "filtered page, category by amount": lambda: db.query_page(
+            TransactionFilter(category_ids=(5,), min_amount=10_000), sort="amount", descending=False
+        ),
+        "sorted page, by category": lambda: db.query_page(TransactionFilter(), sort="category"),
+    }
+    results = {}
+    for name, call in workloads.items():
+        try:
+            call()
+        except sqlite3.OperationalError:
+            # The workload depends on a table a later migration creates.
+            results[name] = (None, ["n/a at this schema version"])
+            continue
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            call()
+        elapsed = (time.perf_counter() - t0) / repeat
+        plans = []
+        for sql in capture_sql(db, call):
+            plans.extend(r[3] for r in db.conn.execute("EXPLAIN QUERY PLAN " + sql))
+        results[name] = (elapsed, plans)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare hot query plans before and after the schema migrations.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path)
+        migrate(conn, target=1)
+        populate(conn, args.rows)
+        conn.close()
+
+        # Bypass Database.__init__ so the file stays at v1 for the baseline.
+        db = Database.__new__(Database)
+        db.db_path = path
+        db.conn = sqlite3.connect(path)
+        db.conn.row_factory = sqlite3.Row
+        db.cache = None
+        before = measure(db, args.repeat)
+        db.close()
+
+        t0 = time.perf_counter()
+        db = Database(path)
+        migrate_seconds = time.perf_counter() - t0
+        # Uncached, so repeated calls measure the query and not the cache.
+        db.cache = None
+        after = measure(db, args.repeat)
+        db.close()
+
+    print(f"{args.rows} rows, migrated v1 -> v{LATEST_VERSION} in {migrate_seconds:.2f}s")
+    failed = False
+    for name in before:
+        b_time, b_plans = before[name]
+        a_time, a_plans = after[name]
+        if b_time is None:
+            print(f"\n{name}: n/a -> {a_time * 1000:.2f} ms")
+        else:
+            print(f"\n{name}: {b_time * 1000:.2f} ms -> {a_time * 1000:.2f} ms ({b_time / max(a_time, 1e-9):.1f}x)")
+        print("  before: " + "; ".join(b_plans))
+        print("  after:  " + "; ".join(a_plans))
+        if any(p.startswith("SCAN t") or p == "SCAN transactions" for p in a_plans):
+            failed = True
+    if failed:
+        print("\nFAIL: a hot query still scans the transactions table")
+        return 1
+    print("\nOK: all hot queries use index seeks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
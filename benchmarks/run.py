@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic import build_database
+from expense_tracker.exporters import export_transactions
+from expense_tracker.models import Database, TransactionFilter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def stats(samples: List[float], **extra) -> Dict[str, float]:
+    ordered = sorted(samples)
+    result = {
+        "n": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def timeit(call: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_database(db: Database, tmp: str, repeat: int, seed: int) -> Dict[str, dict]:
+    # Uncached: these time the queries, not the result cache.
+    db.cache = None
+    rnd = random.Random(seed)
+    months = [r[0] for r in db.conn.execute("SELECT DISTINCT month FROM monthly_totals ORDER BY month")]
+    picks = [tuple(int(p) for p in rnd.choice(months).split("-")) for _ in range(repeat)]
+    categories = [r["id"] for r in db.get_categories()]
+    results = {}
+
+    it = iter(picks)
+    results["month_query"] = stats(timeit(lambda: db.get_transactions_page(*next(it), limit=200), repeat))
+
+    def whole_month():
+        year, month = next(it)
+        cursor = None
+        while True:
+            _rows, cursor = db.get_transactions_page(year, month, after=cursor, limit=200)
+            if cursor is None:
+                break
+
+    it = iter(picks)
+    results["month_query_all_pages"] = stats(timeit(whole_month, repeat))
+
+    it = iter(picks)
+    results["summary"] = stats(timeit(lambda: db.get_monthly_summary(*next(it)), repeat))
+
+    # Recurring transactions running since the first month, expanded for one.
+    with db.transaction():
+        for i in range(20):
+            db.add_recurring_rule(
+                f"{months[0]}-{1 + i:02d}", 1000 + i, categories[i % len(categories)], "Expense", f"rule {i}", 1 + i % 3
+            )
+    it = iter(picks)
+    results["summary_planned"] = stats(timeit(lambda: db.get_monthly_summary(*next(it), planned=True), repeat))
+
+    with db.transaction():
+        for cid in categories[:5]:
+            db.set_budget(cid, 50_000)
+    it = iter(picks)
+    results["budget_status"] = stats(timeit(lambda: db.get_budget_status(*next(it)), repeat))
+
+    it = iter(picks)
+    results["balance_before"] = stats(timeit(lambda: db.balance_before(*next(it)), repeat))
+
+    # Filtered views over all history, first page and 25 pages deep.
+    filters = [
+        (TransactionFilter(category_ids=tuple(rnd.sample(categories, 2))), "date"),
+        (TransactionFilter(t_type="Income", min_amount=10_000), "amount"),
+    ]
+    results["filter_query"] = stats(timeit(lambda: db.query_page(*rnd.choice(filters), limit=200), repeat))
+
+    def filter_pages():
+        flt, sort = rnd.choice(filters)
+        cursor = None
+        for _ in range(25):
+            _rows, cursor = db.query_page(flt, sort, after=cursor, limit=200)
+            if cursor is None:
+                break
+
+    results["filter_query_25_pages"] = stats(timeit(filter_pages, max(1, repeat // 3)))
+
+    results["category_in_use"] = stats(timeit(lambda: db.category_in_use(rnd.choice(categories)), repeat))
+
+    def add_and_delete():
+        with db.transaction():
+            db.delete_transaction(db.add_transaction("2024-06-15", 1234, 1, "Expense", "bench"))
+
+    results["insert_single"] = stats(timeit(add_and_delete, repeat))
+
+    from expense_tracker import analytics
+
+    if analytics.available():
+        last = int(max(months)[:4])
+        snap = None
+
+        def load():
+            nonlocal snap
+            snap = analytics.load_snapshot(db)
+
+        results["analytics_snapshot_load"] = stats(timeit(load, max(1, repeat // 10)))
+        # The app reuses the snapshot until the next write.
+        report = lambda: analytics.build_report(db, last - 4, last, snap=snap)
+        results["analytics_report_5_years"] = stats(timeit(report, repeat))
+
+    for fmt in ("csv", "jsonl"):
+        path = os.path.join(tmp, f"export.{fmt}")
+        count = 0
+
+        def export():
+            nonlocal count
+            count = export_transactions(db, path, fmt)
+
+        samples = timeit(export, max(1, repeat // 10))
+        results[f"export_{fmt}"] = stats(samples, rows_per_second=round(count / statistics.median(samples)))
+
+    from expense_tracker import backup
+
+    snapshots = os.path.join(tmp, "backups")
+    size = 0
+
+    def snapshot():
+        nonlocal size
+        size = backup.create_backup(db.db_path, snapshots).size
+
+    samples = timeit(snapshot, max(1, repeat // 10))
+    results["backup"] = stats(samples, mib_per_second=round(size / 2**20 / statistics.median(samples), 1))
+
+    from expense_tracker import sync
+
+    # A delta of 100 edits; its cost should not depend on the ledger size.
+    peer = os.path.join(tmp, "peer.db")
+    db.conn.execute("VACUUM INTO ?", (peer,))
+    other = Database(peer)
+    sync.new_device_id(other)
+    path = os.path.join(tmp, "changes.finly")
+    sync.apply_changes(other, sync.export_changes(db, path).path)
+    sync.apply_changes(db, sync.export_changes(other, path, peer=sync.device_id(db)).path)
+
+    def delta():
+        with db.transaction():
+            for _ in range(100):
+                db.delete_transaction(db.add_transaction("2024-06-15", 1234, categories[0], "Expense", "bench"))
+        sync.apply_changes(other, sync.export_changes(db, path, peer=sync.device_id(other)).path)
+        sync.apply_changes(db, sync.export_changes(other, path, peer=sync.device_id(db)).path)
+
+    results["sync_delta_100"] = stats(timeit(delta, max(1, repeat // 10)))
+    other.close()
+    return results
+
+
+def bench_table_refresh(path: str, month: str, repeat: int) -> Dict[str, dict]:
+    # Time from Controller.refresh_table() to the first page being in the
+    # model, and to the whole month being loaded, in an offscreen window.
+    # The query cache is cleared before every run.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("FINLY_AUTO_BACKUP", "0")
+    from PySide6 import QtCore, QtWidgets
+
+    from expense_tracker.controllers import Controller
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    ctrl = Controller(app, db_path=path)
+    ctrl.window.current_year, ctrl.window.current_month = (int(p) for p in month.split("-"))
+    model = ctrl.window.table_model
+    loop = QtCore.QEventLoop()
+    model.page_loaded.connect(loop.quit)
+
+    def first_page():
+        ctrl.executor.cache.clear()
+        ctrl.refresh_table()
+        loop.exec()
+
+    def whole_month():
+        ctrl.executor.cache.clear()
+        ctrl.refresh_table()
+        loop.exec()
+        while model.canFetchMore():
+            model.fetchMore()
+            loop.exec()
+
+    try:
+        first_page()  # opens the reader connections
+        results = {
+            "table_refresh_first_page": stats(timeit(first_page, repeat)),
+            "table_refresh_all_pages": stats(timeit(whole_month, repeat), rows=model.rowCount()),
+        }
+    finally:
+        ctrl.executor.shutdown()
+    return results
+
+
+def metadata(rows: int, seed: int) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "rows": rows,
+        "seed": seed,
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "durability": os.environ.get("FINLY_DURABILITY") or "balanced",
+    }
+
+
+def compare(previous: dict, current: dict):
+    print(f"\ncompared with {previous['meta'].get('commit')} ({previous['meta'].get('rows')} rows):")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before:
+            continue
+        ratio = result["median_ms"] / max(before["median_ms"], 1e-9)
+        flag = "  <-- slower" if ratio > 1.2 else ""
+        print(f"  {name:28} {before['median_ms']:10.2f} -> {result['median_ms']:10.2f} ms ({ratio:.2f}x){flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time Finly's database and table refresh paths on a synthetic ledger.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--no-ui", action="store_true", help="skip the offscreen Qt table refresh")
+    parser.add_argument("--out", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    report = {"meta": metadata(args.rows, args.seed), "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        db = build_database(path, args.rows, seed=args.seed)
+        seconds = time.perf_counter() - t0
+        report["results"]["insert_bulk"] = {
+            "n": 1,
+            "median_ms": round(seconds * 1000, 3),
+            "rows_per_second": round(args.rows / seconds),
+        }
+        try:
+            # The busiest month, so the table refresh pages through the most rows.
+            month = db.conn.execute(
+                "SELECT month FROM monthly_totals GROUP BY month ORDER BY SUM(tx_count) DESC LIMIT 1"
+            ).fetchone()[0]
+            report["results"].update(bench_database(db, tmp, args.repeat, args.seed))
+        finally:
+            db.close()
+        if not args.no_ui:
+            report["results"].update(bench_table_refresh(path, month, args.repeat))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Iterator, Optional, Tuple
+
+from expense_tracker.models import Database
+
+# (category, type, relative frequency, min amount, max amount, descriptions)
+CATEGORIES = [
+    ("Groceries", "Expense", 22, 8.0, 180.0, ["Whole Foods", "Trader Joe's", "Aldi", "Costco", "Farmers market", "Safeway"]),
+    ("Dining", "Expense", 18, 4.5, 95.0, ["Starbucks", "Chipotle", "Pizza place", "Sushi bar", "Cafe latte", "Burger joint"]),
+    ("Transport", "Expense", 12, 2.5, 60.0, ["Uber", "Metro card", "Shell gas", "Parking", "Lyft", "Train ticket"]),
+    ("Shopping", "Expense", 10, 5.0, 400.0, ["Amazon", "Target", "IKEA", "Best Buy", "Bookstore", "Clothing store"]),
+    ("Entertainment", "Expense", 6, 5.0, 120.0, ["Netflix", "Spotify", "Cinema", "Concert tickets", "Steam", "Museum"]),
+    ("Health", "Expense", 4, 10.0, 300.0, ["Pharmacy", "Dentist", "Gym membership", "Doctor copay", "Optician"]),
+    ("Utilities", "Expense", 4, 30.0, 220.0, ["Electricity bill", "Water bill", "Internet", "Phone plan", "Gas bill"]),
+    ("Travel", "Expense", 2, 50.0, 1500.0, ["Airline", "Hotel", "Airbnb", "Car rental", "Travel insurance"]),
+    ("Rent", "Expense", 2, 900.0, 2400.0, ["Monthly rent"]),
+    ("Gifts", "Expense", 2, 10.0, 250.0, ["Birthday gift", "Wedding gift", "Charity donation"]),
+    ("Salary", "Income", 3, 2500.0, 6500.0, ["Payroll ACME Corp", "Salary"]),
+    ("Freelance", "Income", 2, 100.0, 2000.0, ["Client invoice", "Consulting", "Upwork payout"]),
+    ("Interest", "Income", 1, 0.5, 40.0, ["Savings interest", "Dividend"]),
+]
+
+Row = Tuple[str, int, str, str, str]
+
+
+def generate(rows: int, years: int = 10, end: Optional[date] = None, seed: int = 1234) -> Iterator[Row]:
+    # Deterministic ledger of (date, amount in cents, category, type,
+    # description) rows in date order, spread evenly over `years` years
+    # ending at `end` with a weekend bump. The same arguments always yield
+    # the same rows.
+    rnd = random.Random(seed)
+    end = end or date(2025, 12, 31)
+    first = date(end.year - years + 1, 1, 1)
+    days = (end - first).days + 1
+    weights = []
+    acc = 0
+    for spec in CATEGORIES:
+        acc += spec[2]
+        weights.append(acc)
+    last = first
+    for i in range(rows):
+        day = first + timedelta(days=i * days // rows)
+        if day.weekday() >= 5 and rnd.random() < 0.3:
+            day = min(day + timedelta(days=1), end)
+        # A bumped row must not be followed by one from the day before.
+        day = last = max(day, last)
+        name, t_type, _w, low, high, descriptions = rnd.choices(CATEGORIES, cum_weights=weights)[0]
+        # Log-uniform amounts: many small purchases, few large ones.
+        amount = round(low * (high / low) ** rnd.random() * 100)
+        yield day.isoformat(), amount, name, t_type, rnd.choice(descriptions)
+
+
+def build_database(path: str, rows: int, years: int = 10, seed: int = 1234) -> Database:
+    db = Database(path)
+    db.import_transactions((d, a, c, t, desc, None) for d, a, c, t, desc in generate(rows, years=years, seed=seed))
+    return db
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic Finly database.")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=100_000, help="10k to 10M are realistic")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    if os.path.exists(args.path):
+        print(f"{args.path} already exists", file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    build_database(args.path, args.rows, args.years, args.seed).close()
+    print(f"Wrote {args.rows} transactions to {args.path} in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import threading
+import time
+import weakref
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from . import money
+from .cache import QueryCache
+
+try:
+    import numpy as np
+except ImportError:  # optional, see requirements.txt
+    np = None
+
+Month = Tuple[int, int]
+
+# Same dependencies as the cached Database reads (see cache.cached).
+_DEPS = ("transactions", "categories", "*")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class Snapshot:
+    # Columnar copy of the transactions table, one array per column:
+    #   days      int32  days since 1970-01-01
+    #   cents     int64  amount in minor units, as stored (always positive)
+    #   category  int32  category id, 0 for uncategorized
+    #   income    bool   True for income, False for expenses
+    #   merchant  int32  index into merchants (the distinct descriptions)
+    def __init__(self, days, cents, category, income, merchant, merchants: List[str], categories: Dict[int, str]):
+        self.days = days
+        self.cents = cents
+        self.category = category
+        self.income = income
+        self.merchant = merchant
+        self.merchants = merchants
+        self.categories = categories
+        # Months since year 0 (see month_index), derived once per snapshot.
+        self.months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32) + 1970 * 12
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.days, self.cents, self.category, self.income, self.merchant, self.months))
+
+
+def load_snapshot(db, chunk_size: int = 100_000) -> Snapshot:
+    if np is None:
+        raise RuntimeError("Reports need numpy installed (pip install numpy)")
+    cur = db.conn.cursor()
+    cur.row_factory = None  # plain tuples; sqlite3.Row costs more per row
+    cur.execute("SELECT id, name FROM categories")
+    categories = {r[0]: r[1] for r in cur.fetchall()}
+    categories[0] = "Uncategorized"
+    merchant_codes: Dict[Optional[str], int] = {None: 0}
+    days, cents, flags, merchants = [], [], [], []
+    # Archived years included; row order does not matter here.
+    for table in db.transaction_tables():
+        # Category and type share one column: fewer Python objects per row
+        # is what loading a million rows through sqlite3 is bound by.
+        cur.execute(
+            f"""
+            SELECT date, amount, IFNULL(category_id, 0) * 2 + (type = 'Income'), description
+            FROM {table}
+            """
+        )
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            d, c, f, m = zip(*rows)
+            days.append(np.array(d, dtype="datetime64[D]").astype(np.int32))
+            cents.append(np.array(c, dtype=np.int64))
+            flags.append(np.array(f, dtype=np.int32))
+            # Factorize descriptions: register the few new distinct ones,
+            # then look every row up with a C-level map.
+            for name in dict.fromkeys(m):
+                if name not in merchant_codes:
+                    merchant_codes[name] = len(merchant_codes)
+            merchants.append(np.fromiter(map(merchant_codes.__getitem__, m), dtype=np.int32, count=len(m)))
+    if days:
+        days, cents, flags, merchants = (np.concatenate(a) for a in (days, cents, flags, merchants))
+    else:
+        days, cents, flags, merchants = (np.zeros(0, dtype=t) for t in (np.int32, np.int64, np.int32, np.int32))
+    names = [""] * len(merchant_codes)
+    for name, i in merchant_codes.items():
+        names[i] = name or ""
+    return Snapshot(days, cents, flags >> 1, (flags & 1).astype(bool), merchants, names, categories)
+
+
+# Keyed by the query cache whose generations validate the entry: each
+# cache counts its own, so two caches on one file must not share entries.
+_snapshots: "weakref.WeakKeyDictionary[QueryCache, Tuple[tuple, Snapshot]]" = weakref.WeakKeyDictionary()
+_snapshots_lock = threading.Lock()
+
+
+def snapshot(db) -> Snapshot:
+    # The snapshot is kept until a commit touches transactions or
+    # categories, using the same write generations as the query cache, so
+    # repeated reports skip the load entirely.
+    if db.cache is None:
+        return load_snapshot(db)
+    db._check_external_writes()
+    generations = db.cache.generations(_DEPS)
+    with _snapshots_lock:
+        entry = _snapshots.get(db.cache)
+    if entry is not None and entry[0] == generations:
+        return entry[1]
+    snap = load_snapshot(db)
+    with _snapshots_lock:
+        _snapshots[db.cache] = (generations, snap)
+    return snap
+
+
+def _mask(snap: Snapshot, start: int, end: int, income: Optional[bool] = None):
+    mask = (snap.months >= start) & (snap.months <= end)
+    if income is not None:
+        mask &= snap.income == income
+    return mask
+
+
+def _sum_by(codes, cents, size: int):
+    # Per-code totals of cents as int64. np.bincount would add them up as
+    # float64 weights, which stop being exact past 2**53 minor units.
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, codes, cents)
+    return totals
+
+
+def category_breakdown(snap: Snapshot, start: int, end: int, income: bool = False) -> List[Tuple[str, Decimal, int, float]]:
+    # (category, total, transactions, share of the total) for the months
+    # start..end inclusive (month_index values), largest first.
+    mask = _mask(snap, start, end, income)
+    cats = snap.category[mask]
+    size = int(snap.category.max()) + 1 if len(snap) else 1
+    totals = _sum_by(cats, snap.cents[mask], size)
+    counts = np.bincount(cats, minlength=size)
+    grand = int(totals.sum())
+    order = np.argsort(-totals, kind="stable")
+    return [
+        (snap.categories.get(int(i), f"#{i}"), money.from_minor(int(totals[i])), int(counts[i]), int(totals[i]) / grand if grand else 0.0)
+        for i in order
+        if counts[i]
+    ]
+
+
+def monthly_series(snap: Snapshot, start: int, end: int):
+    # Income and expense totals in cents for every month start..end, as two
+    # int64 arrays indexed by month - start.
+    mask = _mask(snap, start, end)
+    offsets = snap.months[mask] - start
+    cents = snap.cents[mask]
+    is_income = snap.income[mask]
+    n = end - start + 1
+    return _sum_by(offsets[is_income], cents[is_income], n), _sum_by(offsets[~is_income], cents[~is_income], n)
+
+
+def rolling_mean(values, window: int):
+    # Trailing mean over up to `window` values; the first window - 1 entries
+    # average over what is available so far.
+    sums = np.cumsum(values)  # int64 for the monthly series, so exact
+    shifted = np.concatenate([np.zeros(window, dtype=sums.dtype), sums])[: len(sums)]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (sums - shifted) / counts
+
+
+def year_over_year(values, periods: int = 12):
+    # Change against the value `periods` entries earlier (NaN where there is
+    # nothing to compare with), absolute and relative.
+    values = np.asarray(values, dtype=np.float64)
+    previous = np.full(len(values), np.nan)
+    if len(values) > periods:
+        previous[periods:] = values[:-periods]
+    delta = values - previous
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(previous != 0, delta / previous, np.nan)
+    return delta, pct
+
+
+def top_merchants(snap: Snapshot, start: int, end: int, n: int = 10, income: bool = False) -> List[Tuple[str, Decimal, int]]:
+    mask = _mask(snap, start, end, income)
+    codes = snap.merchant[mask]
+    totals = _sum_by(codes, snap.cents[mask], len(snap.merchants))
+    counts = np.bincount(codes, minlength=len(snap.merchants))
+    totals[0] = 0  # no description
+    n = min(n, int(np.count_nonzero(totals)))
+    if n == 0:
+        return []
+    top = np.argpartition(-totals, n - 1)[:n]
+    top = top[np.argsort(-totals[top], kind="stable")]
+    return [(snap.merchants[i], money.from_minor(int(totals[i])), int(counts[i])) for i in top]
+
+
+def build_report(
+    db, start_year: int, end_year: int, income: bool = False, top_n: int = 10, snap: Optional[Snapshot] = None
+) -> dict:
+    # Everything the reports dialog shows for the years start..end, as plain
+    # Python values: totals and deltas as exact Decimals, averages and
+    # ratios as floats. The trend includes the year before start so that
+    # the first year has rolling averages and a year-over-year comparison.
+    t0 = time.perf_counter()
+    if snap is None:
+        snap = snapshot(db)
+    loaded = time.perf_counter()
+    start, end = month_index(start_year, 1), month_index(end_year, 12)
+    inc, exp = monthly_series(snap, start - 12, end)
+    series = inc if income else exp
+    avg3 = rolling_mean(series, 3)[12:]
+    avg12 = rolling_mean(series, 12)[12:]
+    _delta, pct = year_over_year(series)
+    months = [
+        (
+            month_label(start + i),
+            money.from_minor(int(inc[12 + i])),
+            money.from_minor(int(exp[12 + i])),
+            round(float(avg3[i]) / money.SCALE, money.EXPONENT),
+            round(float(avg12[i]) / money.SCALE, money.EXPONENT),
+            money.from_minor(int(series[12 + i]) - int(series[i])),
+            float(pct[12 + i]),
+        )
+        for i in range(end - start + 1)
+    ]
+    # series starts in January of start_year - 1 and ends in December.
+    yearly = series.reshape(-1, 12).sum(axis=1)
+    _year_delta, year_pct = year_over_year(yearly, periods=1)
+    years = [
+        (
+            start_year + i,
+            money.from_minor(int(yearly[i + 1])),
+            money.from_minor(int(yearly[i + 1]) - int(yearly[i])),
+            float(year_pct[i + 1]),
+        )
+        for i in range(end_year - start_year + 1)
+    ]
+    return {
+        "income": income,
+        "start_year": start_year,
+        "end_year": end_year,
+        "rows": len(snap),
+        "categories": category_breakdown(snap, start, end, income),
+        "months": months,
+        "years": years,
+        "merchants": top_merchants(snap, start, end, top_n, income),
+        "load_seconds": loaded - t0,
+        "compute_seconds": time.perf_counter() - loaded,
+    }
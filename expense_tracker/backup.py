@@ -0,0 +1,311 @@
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from .migrations import LATEST_VERSION
+
+try:
+    import zstandard
+except ImportError:  # optional, see requirements.txt
+    zstandard = None
+
+# Snapshots are named finly-YYYYMMDD-HHMMSS.db.zst (or .gz), local time; the
+# timestamp in the name is what retention goes by.
+COMPRESSIONS = {"zstd": ".zst", "gzip": ".gz"}
+_NAME = re.compile(r"^finly-(\d{8}-\d{6})\.db(\.zst|\.gz)$")
+_STAMP = "%Y%m%d-%H%M%S"
+
+DIR_ENV_VAR = "FINLY_BACKUP_DIR"
+# Set to 0 to turn off the app's automatic daily backup.
+AUTO_ENV_VAR = "FINLY_AUTO_BACKUP"
+
+# Snapshots kept by prune(): the newest one of each of the last n days,
+# ISO weeks and months that have any.
+RETENTION = {"daily": 7, "weekly": 4, "monthly": 12}
+
+# A backup copied in batches starts over whenever another connection
+# commits between two batches; after this many restarts it copies the rest
+# in one step instead.
+MAX_RESTARTS = 3
+
+_CHUNK = 1024 * 1024
+
+_READ_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+class BackupResult(
+    namedtuple("BackupResult", ["path", "compression", "pages", "size", "compressed_size", "copy_seconds", "seconds"])
+):
+    # size is the database as copied, compressed_size the snapshot file;
+    # copy_seconds covers the page copy, seconds the whole backup.
+    def throughput(self) -> float:
+        # Database bytes per second, end to end.
+        return self.size / self.seconds if self.seconds else 0.0
+
+
+BackupInfo = namedtuple("BackupInfo", ["path", "created", "size"])
+
+VerifyResult = namedtuple("VerifyResult", ["path", "ok", "message", "user_version", "transactions", "seconds"])
+
+
+def available_compressions() -> List[str]:
+    return [name for name in COMPRESSIONS if name != "zstd" or zstandard is not None]
+
+
+def default_compression() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def default_dir(db_path: str) -> str:
+    return os.environ.get(DIR_ENV_VAR) or os.path.join(os.path.dirname(os.path.abspath(db_path)), "backups")
+
+
+def auto_enabled() -> bool:
+    return os.environ.get(AUTO_ENV_VAR, "1") not in ("", "0")
+
+
+def _copy(db_path: str, target: str, pages_per_step: int, progress, is_cancelled) -> int:
+    # Online copy through SQLite's backup API: each batch of pages is read
+    # in its own short read transaction, so writers only ever wait for one
+    # batch (and, in WAL mode, not at all).
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(target)
+    try:
+        last = None
+        restarts = 0
+
+        def step(_status, remaining, total):
+            nonlocal last, restarts
+            if is_cancelled and is_cancelled():
+                raise BackupCancelled()
+            if last is not None and remaining > last:
+                restarts += 1
+                if restarts > MAX_RESTARTS:
+                    raise _Restarted()
+            last = remaining
+            if progress:
+                progress(total - remaining, 2 * total)
+
+        try:
+            src.backup(dst, pages=pages_per_step, progress=step)
+        except _Restarted:
+            # One read transaction for the rest: consistent however busy the
+            # writer is, and under WAL it still does not block it.
+            src.backup(dst, pages=-1)
+        return dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def _compress(raw: str, path: str, compression: str, pages: int, progress, is_cancelled):
+    size = os.path.getsize(raw) or 1
+    with open(raw, "rb") as src, open(path, "wb") as f:
+        if compression == "zstd":
+            out = zstandard.ZstdCompressor(level=3, write_checksum=True).stream_writer(f)
+        else:
+            # Level 1: database pages compress about as well as at the
+            # default level 6, at twice the speed.
+            out = gzip.GzipFile(fileobj=f, mode="wb", compresslevel=1)
+        with out:
+            done = 0
+            while True:
+                if is_cancelled and is_cancelled():
+                    raise BackupCancelled()
+                chunk = src.read(_CHUNK)
+                if not chunk:
+                    break
+                out.write(chunk)
+                done += len(chunk)
+                if progress:
+                    # Second half of the range, still counted in pages so
+                    # the numbers fit a Qt int.
+                    progress(pages + pages * done // size, 2 * pages)
+
+
+def _extract(path: str, target: str):
+    if path.endswith(COMPRESSIONS["zstd"]):
+        if zstandard is None:
+            raise BackupError(f"{os.path.basename(path)} is zstd-compressed; install zstandard to read it")
+        with open(path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as src, open(target, "wb") as out:
+            shutil.copyfileobj(src, out, _CHUNK)
+    elif path.endswith(COMPRESSIONS["gzip"]):
+        with gzip.open(path, "rb") as src, open(target, "wb") as out:
+            shutil.copyfileobj(src, out, _CHUNK)
+    else:
+        raise BackupError(f"Not a Finly backup: {path}")
+
+
+def create_backup(
+    db_path: str,
+    dest_dir: Optional[str] = None,
+    compression: Optional[str] = None,
+    pages_per_step: int = 4096,
+    progress: Optional[Callable[[int, int], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None,
+) -> BackupResult:
+    # Writes a compressed snapshot of the database at db_path into dest_dir
+    # (default_dir() by default). progress(done, total) is called from this
+    # thread; the copy is the first half of the range, compression the
+    # second.
+    compression = compression or default_compression()
+    if compression not in available_compressions():
+        raise BackupError(f"Compression '{compression}' is not available (zstd needs zstandard installed)")
+    dest_dir = dest_dir or default_dir(db_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, f"finly-{datetime.now().strftime(_STAMP)}.db{COMPRESSIONS[compression]}")
+    t0 = time.perf_counter()
+    # The uncompressed copy and the snapshot are written under temporary
+    # names, so a failed or cancelled backup leaves nothing that looks like
+    # a snapshot behind.
+    fd, raw = tempfile.mkstemp(suffix=".db", prefix="tmp-finly-", dir=dest_dir)
+    os.close(fd)
+    part = path + ".part"
+    try:
+        pages = _copy(db_path, raw, pages_per_step, progress, is_cancelled)
+        copied = time.perf_counter()
+        size = os.path.getsize(raw)
+        _compress(raw, part, compression, pages, progress, is_cancelled)
+        os.replace(part, path)
+    finally:
+        for leftover in (raw, part):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return BackupResult(path, compression, pages, size, os.path.getsize(path), copied - t0, time.perf_counter() - t0)
+
+
+def list_backups(dest_dir: str) -> List[BackupInfo]:
+    # Oldest first.
+    if not os.path.isdir(dest_dir):
+        return []
+    backups = []
+    for name in os.listdir(dest_dir):
+        m = _NAME.match(name)
+        if m is None:
+            continue
+        path = os.path.join(dest_dir, name)
+        backups.append(BackupInfo(path, datetime.strptime(m.group(1), _STAMP), os.path.getsize(path)))
+    backups.sort(key=lambda b: b.created)
+    return backups
+
+
+def is_due(dest_dir: str, every: timedelta = timedelta(days=1)) -> bool:
+    backups = list_backups(dest_dir)
+    return not backups or datetime.now() - backups[-1].created >= every
+
+
+def retained(backups: List[BackupInfo], daily: int, weekly: int, monthly: int) -> List[BackupInfo]:
+    # Grandfather-father-son: the newest snapshot of each of the `daily`
+    # most recent days with a snapshot, likewise for ISO weeks and months.
+    # The newest snapshot overall is always kept.
+    keep = {b.path for b in backups[-1:]}
+    for count, bucket in (
+        (daily, lambda d: d.date()),
+        (weekly, lambda d: d.isocalendar()[:2]),
+        (monthly, lambda d: (d.year, d.month)),
+    ):
+        seen = set()
+        for b in reversed(backups):
+            key = bucket(b.created)
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(key)
+            keep.add(b.path)
+    return [b for b in backups if b.path in keep]
+
+
+def prune(
+    dest_dir: str, daily: int = RETENTION["daily"], weekly: int = RETENTION["weekly"], monthly: int = RETENTION["monthly"]
+) -> List[str]:
+    # Deletes the snapshots retained() does not keep; returns their paths.
+    backups = list_backups(dest_dir)
+    keep = {b.path for b in retained(backups, daily, weekly, monthly)}
+    removed = []
+    for b in backups:
+        if b.path not in keep:
+            os.remove(b.path)
+            removed.append(b.path)
+    return removed
+
+
+def _check(path: str, raw: str, t0: float) -> VerifyResult:
+    conn = sqlite3.connect(raw)
+    try:
+        problems = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+        if problems != ["ok"]:
+            return VerifyResult(path, False, "; ".join(problems[:5]), None, None, time.perf_counter() - t0)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        count = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        return VerifyResult(path, False, str(e), None, None, time.perf_counter() - t0)
+    finally:
+        conn.close()
+    return VerifyResult(path, True, "ok", version, count, time.perf_counter() - t0)
+
+
+def verify_backup(path: str) -> VerifyResult:
+    # Decompresses the snapshot to a temporary file (checking the
+    # compression checksums on the way) and runs SQLite's integrity check.
+    t0 = time.perf_counter()
+    fd, raw = tempfile.mkstemp(suffix=".db", prefix="tmp-finly-")
+    os.close(fd)
+    try:
+        try:
+            _extract(path, raw)
+        except _READ_ERRORS as e:
+            return VerifyResult(path, False, f"cannot decompress: {e}", None, None, time.perf_counter() - t0)
+        return _check(path, raw, t0)
+    finally:
+        os.remove(raw)
+
+
+def restore_backup(path: str, db_path: str, progress: Optional[Callable[[int, int], None]] = None) -> VerifyResult:
+    # Replaces the contents of db_path with the snapshot, after verifying it.
+    # The pages go in through the backup API, so the swap is one transaction
+    # on the destination: it either happens completely or not at all. A
+    # snapshot from an older schema is upgraded the next time it is opened.
+    t0 = time.perf_counter()
+    fd, raw = tempfile.mkstemp(suffix=".db", prefix="tmp-finly-", dir=os.path.dirname(os.path.abspath(db_path)))
+    os.close(fd)
+    try:
+        try:
+            _extract(path, raw)
+        except _READ_ERRORS as e:
+            raise BackupError(f"{path}: cannot decompress: {e}") from None
+        result = _check(path, raw, t0)
+        if not result.ok:
+            raise BackupError(f"{path}: {result.message}")
+        if result.user_version > LATEST_VERSION:
+            raise BackupError(f"{path}: schema version {result.user_version} is newer than this version of Finly supports")
+        src = sqlite3.connect(raw)
+        dst = sqlite3.connect(db_path)
+        try:
+            src.backup(dst, progress=(lambda _s, remaining, total: progress(total - remaining, total)) if progress else None)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        os.remove(raw)
+    return result._replace(seconds=time.perf_counter() - t0)
@@ -0,0 +1,136 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Tuple
+
+
+def _estimate_size(value) -> int:
+    # Rough footprint: results are mostly lists of equally shaped rows, so
+    # one row is measured and multiplied instead of walking every value.
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    if isinstance(value, list):
+        size = sys.getsizeof(value)
+        if value:
+            size += len(value) * _estimate_size(value[0])
+        return size
+    try:
+        fields = tuple(value)
+    except TypeError:
+        return sys.getsizeof(value)
+    return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in fields)
+
+
+class QueryCache:
+    # LRU of query results bounded by entry count and estimated bytes. Every
+    # entry remembers the write generation of each table it was read from;
+    # a mutator bumps the generation of the tables it touched after its
+    # commit, which makes exactly the dependent entries stale.
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], object, int]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.commit_seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generations(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in tables)
+
+    def bump(self, tables: Iterable[str]):
+        with self._lock:
+            for t in tables:
+                self._generations[t] = self._generations.get(t, 0) + 1
+            self.commit_seq += 1
+
+    def bump_all(self):
+        with self._lock:
+            for t in self._generations:
+                self._generations[t] += 1
+            self._generations["*"] = self._generations.get("*", 0) + 1
+            self.commit_seq += 1
+
+    def get(self, key: Hashable, tables: Tuple[str, ...]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == tuple(self._generations.get(t, 0) for t in tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, generations: Tuple[int, ...], value):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (generations, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        _gens, _value, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+def cached(*tables: str):
+    # Caches a Database read method on self.cache. Results are shared between
+    # callers and must be treated as read-only. "*" is implied so that
+    # QueryCache.bump_all() invalidates everything.
+    deps = tuple(tables) + ("*",)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            cache = self.cache
+            if cache is None:
+                return fn(self, *args, **kwargs)
+            self._check_external_writes()
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key, deps)
+            if found:
+                return value
+            # Snapshot before querying: a write that commits while the query
+            # runs leaves this entry stale instead of wrongly current.
+            generations = cache.generations(deps)
+            value = fn(self, *args, **kwargs)
+            cache.put(key, generations, value)
+            return value
+
+        wrapper.tables = deps  # what the result depends on, "*" included
+        return wrapper
+
+    return decorator
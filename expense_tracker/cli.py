@@ -0,0 +1,589 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+from typing import Optional, Tuple
+
+from . import money
+from .models import Database
+
+# Keep this module free of Qt and of the importer/exporter modules at import
+# time: printing a summary from cron should not pay for any of them.
+
+
+def _this_month() -> Tuple[int, int]:
+    today = date.today()
+    return today.year, today.month
+
+
+def _month_arg(text: str) -> Tuple[int, int]:
+    try:
+        year, month = (int(p) for p in text.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {text!r}")
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {text!r}")
+    return year, month
+
+
+def _date_arg(text: str) -> str:
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {text!r}")
+
+
+def _amount_arg(text: str) -> int:
+    try:
+        return money.to_minor(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an amount like 12.34, got {text!r}")
+
+
+def _print_rows(rows):
+    for r in rows:
+        print(f"{r['id']}\t{r['date']}\t{money.format_minor(r['amount'])}\t{r['type']}\t{r['category'] or 'Uncategorized'}\t{r['description'] or ''}")
+
+
+def _category_id(db: Database, name: str) -> Optional[int]:
+    wanted = name.strip().casefold()
+    return next((c["id"] for c in db.get_categories() if c["name"].casefold() == wanted), None)
+
+
+def cmd_add(db: Database, args) -> int:
+    category_id = 1
+    if args.category:
+        category_id = _category_id(db, args.category)
+        if category_id is None:
+            print(f"Unknown category: {args.category}", file=sys.stderr)
+            return 1
+    if args.amount <= 0:
+        print("Amount must be greater than zero.", file=sys.stderr)
+        return 1
+    try:
+        tx_id = db.add_transaction(args.date, args.amount, category_id, args.type, args.description)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(tx_id)
+    return 0
+
+
+def cmd_import(db: Database, args) -> int:
+    from .importers import StatementError, detect_format, import_file
+
+    for path in args.files:
+        try:
+            fmt = args.format or detect_format(path)
+            options = {"date_format": args.date_format} if fmt in ("csv", "qif") else {}
+            result = import_file(db, path, fmt=fmt, account=args.account, **options)
+        except (StatementError, OSError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        print(f"{path}: {result.summary()}")
+    return 0
+
+
+def cmd_export(db: Database, args) -> int:
+    from .exporters import export_transactions
+
+    try:
+        count = export_transactions(db, args.path, args.format)
+    except (ValueError, OSError) as e:
+        print(f"{args.path}: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {count} transactions to {args.path}")
+    return 0
+
+
+def cmd_summary(db: Database, args) -> int:
+    year, month = args.month or _this_month()
+    income, expense, balance = db.get_monthly_summary(year, month, planned=args.planned)
+    print(f"{year:04d}-{month:02d}" + (" (with planned recurring transactions)" if args.planned else ""))
+    print(f"Income:   {money.format_minor(income):>12}")
+    print(f"Expenses: {money.format_minor(expense):>12}")
+    print(f"Balance:  {money.format_minor(balance):>12}")
+    return 0
+
+
+def cmd_budget(db: Database, args) -> int:
+    category_id = _category_id(db, args.category)
+    if category_id is None:
+        print(f"Unknown category: {args.category}", file=sys.stderr)
+        return 1
+    if args.amount < 0:
+        print("A budget cannot be negative.", file=sys.stderr)
+        return 1
+    db.set_budget(category_id, args.amount or None, *(args.month or ()))
+    return 0
+
+
+def cmd_budgets(db: Database, args) -> int:
+    year, month = args.month or _this_month()
+    budgets = db.get_budget_status(year, month)
+    if not budgets:
+        print(f"No budgets for {year:04d}-{month:02d}")
+    for b in budgets:
+        state = "OVER" if b.over() else f"{b.utilization():.0%}"
+        print(f"{b.category:20} {money.format_minor(b.spent):>12} / {money.format_minor(b.limit):>12}  {state}")
+    return 0
+
+
+def cmd_recur(db: Database, args) -> int:
+    category_id = 1
+    if args.category:
+        category_id = _category_id(db, args.category)
+        if category_id is None:
+            print(f"Unknown category: {args.category}", file=sys.stderr)
+            return 1
+    if args.amount <= 0:
+        print("Amount must be greater than zero.", file=sys.stderr)
+        return 1
+    try:
+        rule_id = db.add_recurring_rule(
+            args.start, args.amount, category_id, args.type, args.description, args.every, args.day, args.until
+        )
+    except (ValueError, sqlite3.IntegrityError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(rule_id)
+    return 0
+
+
+def cmd_recurring(db: Database, args) -> int:
+    rules = db.get_recurring_rules()
+    if not rules:
+        print("No recurring transactions")
+    today = date.today().isoformat()
+    categories = {c["id"]: c["name"] for c in db.get_categories()}
+    for r in rules:
+        every = "monthly" if r.interval_months == 1 else f"every {r.interval_months} months"
+        upcoming = r.next_from(today)
+        when = f"next {upcoming}, {money.format_minor(r.amount_on(upcoming))}" if upcoming else "ended"
+        print(
+            f"{r.id}\t{r.type}\t{categories.get(r.category_id) or 'Uncategorized'}\t{r.description or ''}\t"
+            f"{every} on day {r.day} from {r.start_date}" + (f" to {r.end_date}" if r.end_date else "") + f"\t{when}"
+        )
+    return 0
+
+
+def _rule_change(change, *params) -> int:
+    try:
+        change(*params)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_recur_amount(db: Database, args) -> int:
+    if args.amount <= 0:
+        print("Amount must be greater than zero.", file=sys.stderr)
+        return 1
+    return _rule_change(db.change_recurring_amount, args.rule, args.start, args.amount)
+
+
+def cmd_recur_end(db: Database, args) -> int:
+    return _rule_change(db.end_recurring_rule, args.rule, args.on)
+
+
+def cmd_recur_delete(db: Database, args) -> int:
+    return _rule_change(db.delete_recurring_rule, args.rule)
+
+
+def cmd_planned(db: Database, args) -> int:
+    year, month = args.month or _this_month()
+    for p in db.get_planned(year, month):
+        print(f"{p.rule_id}\t{p.date}\t{money.format_minor(p.amount)}\t{p.type}\t{p.category or 'Uncategorized'}\t{p.description or ''}")
+    return 0
+
+
+def cmd_confirm(db: Database, args) -> int:
+    edited = {}
+    if args.date:
+        edited["date"] = args.date
+    if args.amount is not None:
+        if args.amount <= 0:
+            print("Amount must be greater than zero.", file=sys.stderr)
+            return 1
+        edited["amount"] = args.amount
+    if args.description is not None:
+        edited["description"] = args.description
+    try:
+        tx_id = db.confirm_occurrence(args.rule, args.occurrence, edited)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(tx_id)
+    return 0
+
+
+def cmd_skip(db: Database, args) -> int:
+    return _rule_change(db.skip_occurrence, args.rule, args.occurrence)
+
+
+def cmd_query(db: Database, args) -> int:
+    if args.search:
+        rows, _ = db.search(args.search, limit=args.limit)
+        _print_rows(rows)
+        return 0
+    year, month = args.month or _this_month()
+    cursor = None
+    remaining = args.limit
+    while remaining > 0:
+        rows, cursor = db.get_transactions_page(year=year, month=month, after=cursor, limit=min(remaining, 1000))
+        _print_rows(rows)
+        remaining -= len(rows)
+        if cursor is None:
+            break
+    return 0
+
+
+def cmd_maintenance(db: Database, args) -> int:
+    from .maintenance import COMMANDS
+
+    return COMMANDS[args.command](db)
+
+
+def _size(n: float) -> str:
+    return f"{n / (1024 * 1024):.1f} MiB"
+
+
+def cmd_backup(db: Database, args) -> int:
+    from . import backup
+
+    dest_dir = args.dir or backup.default_dir(db.db_path)
+    try:
+        result = backup.create_backup(db.db_path, dest_dir, compression=args.compression)
+    except (backup.BackupError, OSError, sqlite3.Error) as e:
+        print(f"Backup failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Backed up {_size(result.size)} ({result.pages} pages) to {result.path}")
+    print(
+        f"{result.compression}: {_size(result.compressed_size)}, copied in {result.copy_seconds:.2f}s, "
+        f"{result.seconds:.2f}s in total ({_size(result.throughput())}/s)"
+    )
+    if not args.no_prune:
+        removed = backup.prune(dest_dir, args.keep_daily, args.keep_weekly, args.keep_monthly)
+        if removed:
+            print(f"Removed {len(removed)} older backups")
+    return 0
+
+
+def cmd_backups(db: Database, args) -> int:
+    from . import backup
+
+    dest_dir = args.dir or backup.default_dir(db.db_path)
+    backups = backup.list_backups(dest_dir)
+    if not backups:
+        print(f"No backups in {dest_dir}")
+    for b in backups:
+        print(f"{b.created:%Y-%m-%d %H:%M:%S}\t{_size(b.size):>10}\t{b.path}")
+    return 0
+
+
+def cmd_verify_backup(_db, args) -> int:
+    from . import backup
+
+    failed = 0
+    for path in args.paths:
+        try:
+            result = backup.verify_backup(path)
+        except (backup.BackupError, OSError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        if result.ok:
+            print(f"{path}: ok, schema v{result.user_version}, {result.transactions} transactions ({result.seconds:.2f}s)")
+        else:
+            print(f"{path}: FAILED: {result.message}")
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_restore(db: Database, args) -> int:
+    from . import backup
+
+    if not args.yes:
+        print(f"This replaces everything in {db.db_path} with {args.path}.", file=sys.stderr)
+        print("Close Finly first, then run again with --yes.", file=sys.stderr)
+        return 1
+    try:
+        if not args.no_safety_backup:
+            # The current state becomes a snapshot of its own, so a restore
+            # can be undone.
+            safety = backup.create_backup(db.db_path, args.dir or backup.default_dir(db.db_path))
+            print(f"Saved the current database to {safety.path}")
+        db.close()
+        result = backup.restore_backup(args.path, db.db_path)
+    except (backup.BackupError, OSError, sqlite3.Error) as e:
+        print(f"Restore failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Restored {result.transactions} transactions from {args.path} in {result.seconds:.2f}s")
+    return 0
+
+
+def cmd_archive(db: Database, args) -> int:
+    for year in args.years:
+        t0 = time.perf_counter()
+        try:
+            moved = db.archive_year(year)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            print(f"{year}: {e}", file=sys.stderr)
+            return 1
+        print(f"Archived {moved} transactions of {year} in {time.perf_counter() - t0:.2f}s")
+    if args.vacuum:
+        before = os.path.getsize(db.db_path)
+        db.vacuum()
+        print(f"Vacuumed {_size(before)} -> {_size(os.path.getsize(db.db_path))}")
+    return 0
+
+
+def cmd_unarchive(db: Database, args) -> int:
+    try:
+        restored = db.unarchive_year(args.year)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"{args.year}: {e}", file=sys.stderr)
+        return 1
+    print(f"Moved {restored} transactions of {args.year} back into {db.db_path}")
+    return 0
+
+
+def cmd_archives(db: Database, args) -> int:
+    archives = db.get_archives()
+    if not archives:
+        print("No archived years")
+    for r in archives:
+        print(f"{r['year']}\t{r['row_count']:>10} transactions\t{r['archived_at']}\t{r['path']}")
+    return 0
+
+
+def cmd_sync_export(db: Database, args) -> int:
+    from . import sync
+
+    try:
+        result = sync.export_changes(db, args.path, peer=args.peer, full=args.full)
+    except (sync.SyncError, OSError, sqlite3.Error) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    what = f"changes since #{result.since}" if result.since else "the whole ledger"
+    print(f"Wrote {result.changes} records ({what}, up to #{result.seq}) to {result.path}")
+    print(f"{result.size / 1024:.1f} KiB in {result.seconds:.2f}s")
+    return 0
+
+
+def cmd_sync_apply(db: Database, args) -> int:
+    from . import sync
+
+    for path in args.paths:
+        try:
+            result = sync.apply_changes(db, path)
+        except (sync.SyncError, OSError, ValueError, sqlite3.Error) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        print(
+            f"{path}: {result.changes} records from {result.device[:8]}: {result.applied} applied, "
+            f"{result.superseded} superseded, {result.skipped} skipped ({result.seconds:.2f}s)"
+        )
+    return 0
+
+
+def cmd_sync_status(db: Database, args) -> int:
+    from . import sync
+
+    if args.new_device:
+        print(f"This database is now device {sync.new_device_id(db)}")
+        return 0
+    print(f"This database is device {sync.device_id(db)}")
+    peers = sync.peers(db)
+    if not peers:
+        print("It has not synced with another database yet")
+    for p in peers:
+        acked = f"#{p.acked}" if p.acked is not None else "nothing yet"
+        print(f"{p.device}\treceived #{p.received}\tacknowledged {acked}\t{p.pending} changes to send")
+    return 0
+
+
+def cmd_gui(_db, args) -> int:
+    from .main import main as gui_main
+
+    # The app opens the database itself, on its writer thread.
+    argv = ["--db", args.db] if args.db else []
+    if args.trace:
+        argv.append("--trace")
+    gui_main(argv)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="finly", description="Finly from the command line")
+    parser.add_argument("--db", help="path to expenses.db (defaults to the app database)")
+    parser.add_argument("--trace", action="store_true", help="time queries and write a JSON trace report on exit")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add", help="add a transaction")
+    p.add_argument("amount", type=_amount_arg)
+    p.add_argument("description", nargs="?")
+    p.add_argument("--date", type=_date_arg, default=date.today().isoformat(), help="YYYY-MM-DD (default: today)")
+    p.add_argument("--type", choices=["Expense", "Income"], default="Expense")
+    p.add_argument("--category", help="category name (default: Uncategorized)")
+    p.set_defaults(func=cmd_add)
+
+    p = sub.add_parser("import", help="import bank statements (CSV, OFX/QFX, QIF)")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--format", choices=["csv", "ofx", "qfx", "qif"], help="override detection by file extension")
+    p.add_argument("--date-format", help="strptime format for CSV/QIF dates, e.g. %%d/%%m/%%Y")
+    p.add_argument("--account", help="account the statements belong to, if they do not name it")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="export all transactions")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "jsonl", "parquet", "arrow"], help="default: from the file extension")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("summary", help="income, expenses and balance for a month")
+    p.add_argument("month", nargs="?", type=_month_arg, help="YYYY-MM (default: this month)")
+    p.add_argument("--planned", action="store_true", help="count recurring transactions not yet confirmed")
+    p.set_defaults(func=cmd_summary)
+
+    p = sub.add_parser("budget", help="set or remove a category's monthly budget")
+    p.add_argument("category")
+    p.add_argument("amount", type=_amount_arg, help="0 removes the budget")
+    p.add_argument("--month", type=_month_arg, help="YYYY-MM for that month only (default: every month)")
+    p.set_defaults(func=cmd_budget)
+
+    p = sub.add_parser("budgets", help="spending against budgets for a month")
+    p.add_argument("month", nargs="?", type=_month_arg, help="YYYY-MM (default: this month)")
+    p.set_defaults(func=cmd_budgets)
+
+    p = sub.add_parser("recur", help="add a recurring transaction (rent, salary, a subscription)")
+    p.add_argument("amount", type=_amount_arg)
+    p.add_argument("description", nargs="?")
+    p.add_argument("--start", type=_date_arg, default=date.today().isoformat(), help="first date, YYYY-MM-DD (default: today)")
+    p.add_argument("--every", type=int, default=1, help="months between occurrences (default: 1)")
+    p.add_argument("--day", type=int, choices=range(1, 32), metavar="DAY", help="day of the month (default: the start's)")
+    p.add_argument("--until", type=_date_arg, help="last date, YYYY-MM-DD (default: no end)")
+    p.add_argument("--type", choices=["Expense", "Income"], default="Expense")
+    p.add_argument("--category", help="category name (default: Uncategorized)")
+    p.set_defaults(func=cmd_recur)
+
+    p = sub.add_parser("recurring", help="list recurring transactions")
+    p.set_defaults(func=cmd_recurring)
+
+    p = sub.add_parser("recur-amount", help="change a recurring transaction's amount from a date on")
+    p.add_argument("rule", type=int)
+    p.add_argument("amount", type=_amount_arg)
+    p.add_argument("--from", dest="start", type=_date_arg, default=date.today().isoformat(), help="YYYY-MM-DD (default: today)")
+    p.set_defaults(func=cmd_recur_amount)
+
+    p = sub.add_parser("recur-end", help="end a recurring transaction")
+    p.add_argument("rule", type=int)
+    p.add_argument("--on", type=_date_arg, default=date.today().isoformat(), help="last date, YYYY-MM-DD (default: today)")
+    p.set_defaults(func=cmd_recur_end)
+
+    p = sub.add_parser("recur-delete", help="delete a recurring transaction; confirmed ones stay")
+    p.add_argument("rule", type=int)
+    p.set_defaults(func=cmd_recur_delete)
+
+    p = sub.add_parser("planned", help="recurring transactions of a month still to be confirmed")
+    p.add_argument("month", nargs="?", type=_month_arg, help="YYYY-MM (default: this month)")
+    p.set_defaults(func=cmd_planned)
+
+    p = sub.add_parser("confirm", help="book a planned recurring transaction")
+    p.add_argument("rule", type=int)
+    p.add_argument("occurrence", type=_date_arg, help="its planned date, YYYY-MM-DD")
+    p.add_argument("--date", type=_date_arg, help="book it on another date")
+    p.add_argument("--amount", type=_amount_arg, help="book another amount")
+    p.add_argument("--description", help="book another description")
+    p.set_defaults(func=cmd_confirm)
+
+    p = sub.add_parser("skip", help="drop one planned recurring transaction")
+    p.add_argument("rule", type=int)
+    p.add_argument("occurrence", type=_date_arg, help="its planned date, YYYY-MM-DD")
+    p.set_defaults(func=cmd_skip)
+
+    p = sub.add_parser("query", help="list a month's transactions or search descriptions")
+    p.add_argument("--month", type=_month_arg, help="YYYY-MM (default: this month)")
+    p.add_argument("--search", help="full-text search over all months instead")
+    p.add_argument("--limit", type=int, default=200)
+    p.set_defaults(func=cmd_query)
+
+    for name in ("rebuild-totals", "verify-totals"):
+        p = sub.add_parser(name, help="database maintenance")
+        p.set_defaults(func=cmd_maintenance)
+
+    p = sub.add_parser("backup", help="write a compressed snapshot of the database and prune old ones")
+    p.add_argument("--dir", help="backup directory (default: $FINLY_BACKUP_DIR or backups/ next to the database)")
+    p.add_argument("--compression", choices=["zstd", "gzip"], help="default: zstd if zstandard is installed")
+    p.add_argument("--keep-daily", type=int, default=7)
+    p.add_argument("--keep-weekly", type=int, default=4)
+    p.add_argument("--keep-monthly", type=int, default=12)
+    p.add_argument("--no-prune", action="store_true", help="keep every snapshot")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("backups", help="list backups")
+    p.add_argument("--dir", help="backup directory")
+    p.set_defaults(func=cmd_backups)
+
+    p = sub.add_parser("verify-backup", help="decompress backups and check their integrity")
+    p.add_argument("paths", nargs="+")
+    p.set_defaults(func=cmd_verify_backup, needs_db=False)
+
+    p = sub.add_parser("restore", help="replace the database with a backup")
+    p.add_argument("path")
+    p.add_argument("--yes", action="store_true", help="confirm replacing the database")
+    p.add_argument("--dir", help="where to save the current database first")
+    p.add_argument("--no-safety-backup", action="store_true", help="do not save the current database first")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("archive", help="move past years into their own files")
+    p.add_argument("years", nargs="+", type=int)
+    p.add_argument("--vacuum", action="store_true", help="shrink the database file afterwards")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("unarchive", help="move an archived year back into the database")
+    p.add_argument("year", type=int)
+    p.set_defaults(func=cmd_unarchive)
+
+    p = sub.add_parser("archives", help="list archived years")
+    p.set_defaults(func=cmd_archives)
+
+    p = sub.add_parser("sync-export", help="write the changes another database has not seen to a sync file")
+    p.add_argument("path")
+    p.add_argument("--peer", help="device id (or its start) to export for, if several databases sync with this one")
+    p.add_argument("--full", action="store_true", help="export the whole ledger, not only the changes")
+    p.set_defaults(func=cmd_sync_export)
+
+    p = sub.add_parser("sync-apply", help="merge sync files written by another database")
+    p.add_argument("paths", nargs="+")
+    p.set_defaults(func=cmd_sync_apply)
+
+    p = sub.add_parser("sync-status", help="this database's device id and the devices it syncs with")
+    p.add_argument("--new-device", action="store_true", help="give a copied database its own device id")
+    p.set_defaults(func=cmd_sync_status)
+
+    p = sub.add_parser("gui", help="start the desktop app")
+    p.set_defaults(func=cmd_gui, needs_db=False)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.trace or os.environ.get("FINLY_TRACE", "") not in ("", "0"):
+        from . import tracing
+
+        tracer = tracing.enable()
+        print(f"Tracing to {tracer.out_path}", file=sys.stderr)
+    if not getattr(args, "needs_db", True):
+        return args.func(None, args)
+    db = Database(args.db)
+    try:
+        return args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
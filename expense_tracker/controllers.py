@@ -1,17 +1,71 @@
-from PySide6 import QtWidgets
+from PySide6 import QtCore, QtWidgets
 from PySide6.QtCore import Qt
-from .models import Database
-from .views import MainWindow, TransactionDialog, CategoryDialog
+from . import money
+from .executor import DatabaseExecutor
+from .models import TransactionFilter, signed_amount
+from .prefetch import MonthPrefetcher
+from . import tracing
+from .views import (
+    AboutDialog,
+    BudgetDialog,
+    CategoryDialog,
+    MainWindow,
+    RecurringDialog,
+    RecurringRuleDialog,
+    RuleChangeDialog,
+    TransactionDialog,
+)
+from .workers import FutureWatcher
 import os
 
 
 class Controller:
-    def __init__(self, app: QtWidgets.QApplication):
+    DEFAULT_SORT = ("date", True)
+
+    def __init__(self, app: QtWidgets.QApplication, db_path: str = None, profile=None, executor: DatabaseExecutor = None):
         self.app = app
-        self.db = Database()
+        # The executor opens and migrates the database on its writer thread
+        # (main starts it before importing Qt); everything below only queues
+        # work behind that, so the window can paint first.
+        self.executor = executor or DatabaseExecutor(db_path)
+        # startup.StartupProfile with --profile-startup.
+        self.profile = profile
+        self._export_worker = None
+        self._backup_worker = None
+        # Bumped whenever what is on screen changes (e.g. another month), so
+        # results of reads issued for the previous view are dropped.
+        self._view_token = 0
+        self._search_text = ""
+        # (sort key, descending) of the table; see TransactionTableModel.sort.
+        self._sort = self.DEFAULT_SORT
+        # (income, expense, balance) on screen, or None while it is loading.
+        self._summary = None
+        # models.BudgetStatus rows on screen, or None while they are loading.
+        self._budgets = None
+        # Built on first use and reused (see _dialog).
+        self._dialogs = {}
         self.window = MainWindow()
+        if profile is not None:
+            profile.mark("window built")
+        self.prefetcher = MonthPrefetcher(self.executor, self.window.table_model.page_size)
+        self.tasks = FutureWatcher(self.window)
+        self.app.aboutToQuit.connect(self.executor.shutdown)
         self._connect_signals()
+        tracer = tracing.active()
+        if tracer is not None:
+            self.window.add_trace_panel(tracer)
+        if profile is not None:
+            profile.watch_paint(self.window)
+            self.window.table_model.page_loaded.connect(lambda: profile.mark("first page"))
         self.refresh()
+        # Housekeeping waits until the first month is on screen, so it does
+        # not compete with it for the writer, the readers or the GIL.
+        self.window.table_model.page_loaded.connect(self._after_first_page, Qt.SingleShotConnection)
+
+    def _after_first_page(self):
+        self.refresh_filter_categories()
+        self._write(self._store_balance_checkpoints)
+        self._write(lambda db: db.db_path, lambda path: self._start_backup(path, scheduled=True))
 
     def _connect_signals(self):
         w = self.window
@@ -19,69 +73,308 @@ class Controller:
         w.edit_btn.clicked.connect(self.edit_transaction)
         w.delete_btn.clicked.connect(self.delete_transaction)
         w.manage_cats_btn.clicked.connect(self.manage_categories)
-        w.export_btn.clicked.connect(self.export_csv)
+        w.budgets_btn.clicked.connect(self.manage_budgets)
+        w.recurring_btn.clicked.connect(self.manage_recurring)
+        w.reports_btn.clicked.connect(self.show_reports)
+        w.import_btn.clicked.connect(self.import_statements)
+        w.export_btn.clicked.connect(self.export_transactions)
+        w.backup_btn.clicked.connect(self.backup_now)
         w.prev_month_btn.clicked.connect(self.prev_month)
         w.next_month_btn.clicked.connect(self.next_month)
+        w.search_timer.timeout.connect(self.search)
+        w.filter_bar.changed.connect(self.apply_filters)
+        w.filter_btn.toggled.connect(lambda shown: shown or w.filter_bar.clear())
+        w.table_model.sort_requested.connect(self.sort_table)
         try:
             w.about_action.triggered.connect(self.show_about)
         except Exception:
             pass
 
-    def load_categories(self):
-        cats = self.db.get_categories()
+    def _read(self, fn, on_result, on_error=None, stale=True):
+        # Runs fn(db) on a reader connection and hands the result to
+        # on_result on the GUI thread, unless the view moved on meanwhile.
+        token = self._view_token
+
+        def deliver(result):
+            if stale and token != self._view_token:
+                return
+            on_result(result)
+
+        self.tasks.watch(self.executor.read(fn), deliver, on_error or self._on_db_error)
+
+    def _write(self, fn, on_result=None, on_error=None):
+        self.tasks.watch(self.executor.write(fn), on_result or (lambda _: None), on_error or self._on_db_error)
+
+    def _on_db_error(self, exc):
+        QtWidgets.QMessageBox.warning(self.window, "Error", f"Database error: {exc}")
+
+    @staticmethod
+    def load_categories(db):
+        cats = db.get_categories()
         return [(c["id"], c["name"]) for c in cats]
 
     def refresh(self):
+        self._view_token += 1
+        w = self.window
+        plain = not self._search_text and self._table_filter() is None
+        warm = self.prefetcher.take(w.current_year, w.current_month) if plain else None
+        self.refresh_table(warm[0] if warm else None)
+        if warm:
+            self._show_summary(warm[1])
+        else:
+            self._summary = None
+            self.refresh_summary()
+        self._budgets = None
+        self.refresh_budgets()
+        self.refresh_planned()
+        self.prefetcher.prefetch_around(w.current_year, w.current_month)
+
+    def refresh_table(self, first_page=None):
+        # first_page: (rows, next_cursor) already loaded by the prefetcher,
+        # handed to the model synchronously instead of queuing a read.
+        w = self.window
+        year, month = w.current_year, w.current_month
+        query = self._search_text
+        flt = self._table_filter()
+        sort, descending = self._sort
+
+        def fetch_page(cursor, limit, deliver):
+            nonlocal first_page
+            if first_page is not None and cursor is None:
+                page, first_page = first_page, None
+                deliver(*page)
+                return
+            if query:
+                load = lambda db: db.search(query, offset=cursor or 0, limit=limit)
+            elif flt is not None:
+                load = lambda db: db.query_page(flt, sort, descending, after=cursor, limit=limit)
+            else:
+                load = lambda db: db.get_transactions_page(year=year, month=month, after=cursor, limit=limit)
+            # The model drops pages for an old source itself.
+            self._read(load, lambda page: deliver(*page), stale=False)
+
+        w.table_model.set_source(fetch_page)
+
+    def search(self):
+        text = self.window.search_edit.text()
+        if text.strip() == self._search_text.strip() and text.strip():
+            return
+        self._search_text = text if text.strip() else ""
+        if self._search_text:
+            shown = self._search_text.strip()
+            self.window.status.showMessage(f"Search results for “{shown}” (all months)")
+
+            def note_archives(years):
+                # The search index only covers the main database.
+                if years and self._search_text.strip() == shown:
+                    skipped = ", ".join(str(y) for y in sorted(years))
+                    self.window.status.showMessage(f"Search results for “{shown}” (all months; archived {skipped} not searched)")
+
+            self._read(lambda db: db.archived_years(), note_archives, stale=False)
+        else:
+            self._show_filter_status()
         self.refresh_table()
-        self.refresh_summary()
 
-    def refresh_table(self):
+    def _table_filter(self):
+        # The filter for query_page, or None for the plain month view in the
+        # default order (get_transactions_page, which the prefetcher warms).
+        w = self.window
+        if not w.filter_bar.active() and self._sort == self.DEFAULT_SORT:
+            return None
+        c = w.filter_bar.criteria()
+        if c["scope"] == "month":
+            # Inclusive ISO bounds; no month has a day past 31.
+            month = f"{w.current_year:04d}-{w.current_month:02d}"
+            start, end = f"{month}-01", f"{month}-31"
+        else:
+            start, end = c["start"], c["end"]
+        return TransactionFilter(start, end, c["category_ids"], c["t_type"], c["min_amount"], c["max_amount"], c["text"])
+
+    def _show_filter_status(self):
         w = self.window
-        cats = self.load_categories()
-        rows = self.db.get_transactions(year=w.current_year, month=w.current_month)
-        w.table.setRowCount(0)
-        for r in rows:
-            row = w.table.rowCount()
-            w.table.insertRow(row)
-            w.table.setItem(row, 0, QtWidgets.QTableWidgetItem(str(r["id"])))
-            w.table.setItem(row, 1, QtWidgets.QTableWidgetItem(r["date"]))
-            w.table.setItem(row, 2, QtWidgets.QTableWidgetItem(f"{r['amount']:.2f}"))
-            w.table.setItem(row, 3, QtWidgets.QTableWidgetItem(r["type"]))
-            w.table.setItem(row, 4, QtWidgets.QTableWidgetItem(r["category"] or "Uncategorized"))
-            w.table.setItem(row, 5, QtWidgets.QTableWidgetItem(r["description"] or ""))
+        if not w.filter_bar.active():
+            w.status.clearMessage()
+            return
+        c = w.filter_bar.criteria()
+        scope = {"month": "this month", "all": "all dates", "range": f"{c['start']} to {c['end']}"}[c["scope"]]
+        w.status.showMessage(f"Filtered transactions ({scope})")
+
+    def apply_filters(self):
+        self._clear_search()
+        self._show_filter_status()
+        self.refresh_table()
+
+    def sort_table(self, key, descending):
+        if (key, descending) == self._sort:
+            return
+        self._sort = (key, descending)
+        # Search results are ranked by relevance, so sorting ends a search.
+        self._clear_search()
+        self.refresh_table()
+
+    def refresh_filter_categories(self):
+        self._read(self.load_categories, self.window.filter_bar.set_categories, stale=False)
+
+    def _clear_search(self):
+        if not self._search_text:
+            return
+        w = self.window
+        w.search_edit.blockSignals(True)
+        w.search_edit.clear()
+        w.search_edit.blockSignals(False)
+        w.search_timer.stop()
+        self._search_text = ""
+        self._show_filter_status()
 
     def refresh_summary(self):
         w = self.window
-        income, expense, balance = self.db.get_monthly_summary(w.current_year, w.current_month)
-        w.income_label.setText(f"Income: {income:.2f}")
-        w.expense_label.setText(f"Expenses: {expense:.2f}")
-        w.balance_label.setText(f"Balance: {balance:.2f}")
+        year, month = w.current_year, w.current_month
+        self._read(lambda db: db.get_monthly_summary(year, month), self._show_summary)
+
+    def _show_summary(self, summary):
+        self._summary = summary
+        if self.profile is not None:
+            self.profile.mark("summary")
+        income, expense, balance = summary
+        w = self.window
+        w.income_label.setText(f"Income: {money.format_minor(income)}")
+        w.expense_label.setText(f"Expenses: {money.format_minor(expense)}")
+        w.balance_label.setText(f"Balance: {money.format_minor(balance)}")
+
+    def refresh_budgets(self):
+        w = self.window
+        year, month = w.current_year, w.current_month
+        self._read(lambda db: db.get_budget_status(year, month), self._show_budgets)
+
+    def _show_budgets(self, budgets):
+        self._budgets = budgets
+        self.window.budget_strip.set_status(budgets)
+
+    def refresh_planned(self):
+        w = self.window
+        year, month = w.current_year, w.current_month
+        self._read(lambda db: db.get_planned(year, month), self._show_planned)
+
+    def _show_planned(self, planned):
+        # Left out of the summary, which only counts booked transactions.
+        label = self.window.planned_label
+        label.setVisible(bool(planned))
+        if planned:
+            net = sum(p.amount if p.type == "Income" else -p.amount for p in planned)
+            label.setText(f"Planned: {len(planned)} ({money.format_minor(net)})")
+            label.setToolTip("\n".join(f"{p.date}  {p.description or ''}  {money.format_minor(p.amount)}" for p in planned))
+
+    @staticmethod
+    def _store_balance_checkpoints(db):
+        # Reads only compute balances; the writer refills the checkpoints a
+        # write dropped.
+        db.store_balance_checkpoints()
+
+    def _change_transaction(self, write, tx_id=None, then=None):
+        # Runs one add/edit/delete on the writer thread and returns the row
+        # before and after it, so the view is patched instead of reloaded.
+        # then() runs after the patch.
+        def run(db):
+            with db.transaction():
+                old = db.get_transaction(tx_id) if tx_id is not None else None
+                new_id = write(db)
+                new = db.get_transaction(tx_id if tx_id is not None else new_id)
+                self._store_balance_checkpoints(db)
+            return old, new
+
+        def done(change):
+            self._apply_change(*change)
+            if then is not None:
+                then()
+
+        self._write(run, done)
+
+    def _apply_change(self, old, new):
+        w = self.window
+        month = f"{w.current_year:04d}-{w.current_month:02d}"
+        # Rows in earlier months move the opening balance of this one.
+        earlier = sum(
+            sign * signed_amount(row) for row, sign in ((old, -1), (new, 1)) if row is not None and row["date"][:7] < month
+        )
+        old = old if old is not None and old["date"].startswith(month) else None
+        new = new if new is not None and new["date"].startswith(month) else None
+        # A summary read issued before the write would overwrite the delta.
+        self._view_token += 1
+        if self._summary is None:
+            self.refresh_summary()
+        elif old is not None or new is not None:
+            income, expense, _balance = self._summary
+            for row, sign in ((old, -1), (new, 1)):
+                if row is None:
+                    continue
+                if row["type"] == "Income":
+                    income += sign * row["amount"]
+                else:
+                    expense += sign * row["amount"]
+            self._show_summary((income, expense, income - expense))
+        if self._budgets is None:
+            self.refresh_budgets()
+        elif any(row is not None and row["type"] == "Expense" for row in (old, new)):
+            # The same amount deltas the write applied to monthly_totals.
+            budgets = {b.category_id: b for b in self._budgets}
+            for row, sign in ((old, -1), (new, 1)):
+                b = budgets.get(row["category_id"]) if row is not None and row["type"] == "Expense" else None
+                if b is not None:
+                    budgets[b.category_id] = b._replace(spent=b.spent + sign * row["amount"], count=b.count + sign)
+            self._show_budgets(sorted(budgets.values(), key=lambda b: (-b.utilization(), b.category)))
+        # The model only knows how to place rows in the plain month view;
+        # search results, filtered and re-sorted views are re-run.
+        custom = self._search_text or self._table_filter() is not None
+        if custom or not w.table_model.apply_change(old, new):
+            self.refresh_table()
+        else:
+            w.table_model.shift_balances(earlier)
+        self.prefetcher.prefetch_around(w.current_year, w.current_month)
 
     def add_transaction(self):
-        cats = self.load_categories()
-        dlg = TransactionDialog(self.window, categories=cats)
+        self._read(self.load_categories, self._show_add_dialog, stale=False)
+
+    def _dialog(self, cls):
+        # One instance per dialog class, built the first time it is needed
+        # instead of at startup, then reset and reused.
+        dlg = self._dialogs.get(cls)
+        if dlg is None:
+            dlg = self._dialogs[cls] = cls(self.window)
+        return dlg
+
+    def _show_add_dialog(self, cats):
+        dlg = self._dialog(TransactionDialog)
+        dlg.load(cats)
         if dlg.exec() == QtWidgets.QDialog.Accepted:
             data = dlg.get_data()
             if data["amount"] <= 0:
                 QtWidgets.QMessageBox.warning(self.window, "Validation", "Amount must be greater than zero.")
                 return
-            self.db.add_transaction(data["date"], data["amount"], data["category_id"], data["type"], data["description"])
-            self.refresh()
+            self._change_transaction(
+                lambda db: db.add_transaction(data["date"], data["amount"], data["category_id"], data["type"], data["description"])
+            )
 
     def _selected_tx_id(self):
-        sel = self.window.table.selectedItems()
+        sel = self.window.table.selectionModel().selectedIndexes()
         if not sel:
             return None
-        row = sel[0].row()
-        item = self.window.table.item(row, 0)
-        return int(item.text())
+        row = self.window.table_model.row_at(sel[0].row())
+        if row is None:
+            return None
+        return row["id"]
 
     def edit_transaction(self):
         tx_id = self._selected_tx_id()
         if tx_id is None:
             QtWidgets.QMessageBox.information(self.window, "Edit", "Please select a transaction to edit.")
             return
-        rows = self.db.conn.execute("SELECT * FROM transactions WHERE id = ?", (tx_id,)).fetchone()
+        self._read(
+            lambda db: (db.get_transaction(tx_id), self.load_categories(db)),
+            lambda result: self._show_edit_dialog(tx_id, *result),
+            stale=False,
+        )
+
+    def _show_edit_dialog(self, tx_id, rows, cats):
         if not rows:
             return
         data = {
@@ -91,14 +384,17 @@ class Controller:
             "category_id": rows["category_id"],
             "description": rows["description"],
         }
-        dlg = TransactionDialog(self.window, categories=self.load_categories(), data=data)
+        dlg = self._dialog(TransactionDialog)
+        dlg.load(cats, data)
         if dlg.exec() == QtWidgets.QDialog.Accepted:
             nd = dlg.get_data()
             if nd["amount"] <= 0:
                 QtWidgets.QMessageBox.warning(self.window, "Validation", "Amount must be greater than zero.")
                 return
-            self.db.update_transaction(tx_id, nd["date"], nd["amount"], nd["category_id"], nd["type"], nd["description"])
-            self.refresh()
+            self._change_transaction(
+                lambda db: db.update_transaction(tx_id, nd["date"], nd["amount"], nd["category_id"], nd["type"], nd["description"]),
+                tx_id,
+            )
 
     def delete_transaction(self):
         tx_id = self._selected_tx_id()
@@ -106,8 +402,7 @@ class Controller:
             QtWidgets.QMessageBox.information(self.window, "Delete", "Please select a transaction to delete.")
             return
         if QtWidgets.QMessageBox.question(self.window, "Delete", "Delete selected transaction?") == QtWidgets.QMessageBox.StandardButton.Yes:
-            self.db.delete_transaction(tx_id)
-            self.refresh()
+            self._change_transaction(lambda db: db.delete_transaction(tx_id), tx_id)
 
     def manage_categories(self):
         dlg = QtWidgets.QDialog(self.window)
@@ -125,23 +420,28 @@ class Controller:
         btn_h.addWidget(delete)
         layout.addLayout(btn_h)
 
-        def load_list():
+        def fill_list(cats):
             listw.clear()
-            for cid, name in self.load_categories():
+            for cid, name in cats:
                 item = QtWidgets.QListWidgetItem(name)
                 item.setData(Qt.UserRole, cid)
                 listw.addItem(item)
 
+        def load_list(*_):
+            self._read(self.load_categories, fill_list, stale=False)
+
         def on_add():
-            cd = CategoryDialog(dlg)
+            cd = self._dialog(CategoryDialog)
+            cd.set_name("")
             if cd.exec() == QtWidgets.QDialog.Accepted:
                 name = cd.get_name()
                 if name:
-                    try:
-                        self.db.add_category(name)
-                    except Exception as e:
+
+                    def failed(e):
                         QtWidgets.QMessageBox.warning(dlg, "Error", f"Could not add category: {e}")
-                load_list()
+                        load_list()
+
+                    self._write(lambda db: db.add_category(name), load_list, failed)
 
         def on_edit():
             item = listw.currentItem()
@@ -149,12 +449,12 @@ class Controller:
                 return
             cid = item.data(Qt.UserRole)
             name = item.text()
-            cd = CategoryDialog(dlg, name=name)
+            cd = self._dialog(CategoryDialog)
+            cd.set_name(name)
             if cd.exec() == QtWidgets.QDialog.Accepted:
                 new_name = cd.get_name()
                 if new_name:
-                    self.db.update_category(cid, new_name)
-                load_list()
+                    self._write(lambda db: db.update_category(cid, new_name), load_list)
 
         def on_delete():
             item = listw.currentItem()
@@ -162,10 +462,13 @@ class Controller:
                 return
             cid = item.data(Qt.UserRole)
             if QtWidgets.QMessageBox.question(dlg, "Delete", f"Delete category '{item.text()}'?") == QtWidgets.QMessageBox.StandardButton.Yes:
-                ok = self.db.delete_category(cid)
-                if not ok:
-                    QtWidgets.QMessageBox.warning(dlg, "Cannot delete", "Category is used by transactions or is protected.")
-                load_list()
+
+                def deleted(ok):
+                    if not ok:
+                        QtWidgets.QMessageBox.warning(dlg, "Cannot delete", "Category is used by transactions or is protected.")
+                    load_list()
+
+                self._write(lambda db: db.delete_category(cid), deleted)
 
         add.clicked.connect(on_add)
         edit.clicked.connect(on_edit)
@@ -173,27 +476,293 @@ class Controller:
 
         load_list()
         dlg.exec()
+        self.refresh_filter_categories()
         self.refresh()
 
-    def export_csv(self):
-        path, _ = QtWidgets.QFileDialog.getSaveFileName(self.window, "Export CSV", os.path.expanduser("~/transactions.csv"), "CSV Files (*.csv)")
+    def manage_budgets(self):
+        w = self.window
+        year, month = w.current_year, w.current_month
+        self._read(
+            lambda db: (self.load_categories(db), db.get_budgets(year, month)),
+            lambda result: self._show_budget_dialog(year, month, *result),
+            stale=False,
+        )
+
+    def _show_budget_dialog(self, year, month, cats, budgets):
+        dlg = self._dialog(BudgetDialog)
+        dlg.load(cats, budgets, QtCore.QDate(year, month, 1).toString("MMMM yyyy"))
+        if dlg.exec() != QtWidgets.QDialog.Accepted:
+            return
+        changes = dlg.changes()
+        if not changes:
+            return
+
+        def save(db):
+            with db.transaction():
+                for cid, own, amount in changes:
+                    db.set_budget(cid, amount, *((year, month) if own else ()))
+
+        self._write(save, lambda _: self.refresh_budgets())
+
+    def manage_recurring(self):
+        w = self.window
+        year, month = w.current_year, w.current_month
+        month_label = QtCore.QDate(year, month, 1).toString("MMMM yyyy")
+        dlg = RecurringDialog(self.window)
+
+        def load(*_):
+            self._read(
+                lambda db: (db.get_planned(year, month), db.get_recurring_rules(), self.load_categories(db)),
+                lambda result: dlg.load(month_label, *result),
+                stale=False,
+            )
+
+        def changed(*_):
+            load()
+            self.refresh_planned()
+
+        def failed(e):
+            QtWidgets.QMessageBox.warning(dlg, "Recurring", str(e))
+            changed()
+
+        def on_confirm():
+            p = dlg.selected_planned()
+            if p is not None:
+                self._change_transaction(lambda db: db.confirm_occurrence(p.rule_id, p.date), then=changed)
+
+        def on_edit():
+            p = dlg.selected_planned()
+            if p is None:
+                return
+            td = self._dialog(TransactionDialog)
+            td.load(dlg.categories, p._asdict())
+            if td.exec() != QtWidgets.QDialog.Accepted:
+                return
+            data = td.get_data()
+            if data["amount"] <= 0:
+                QtWidgets.QMessageBox.warning(dlg, "Validation", "Amount must be greater than zero.")
+                return
+            self._change_transaction(lambda db: db.confirm_occurrence(p.rule_id, p.date, data), then=changed)
+
+        def on_skip():
+            p = dlg.selected_planned()
+            if p is not None:
+                self._write(lambda db: db.skip_occurrence(p.rule_id, p.date), changed, failed)
+
+        def on_add():
+            rd = self._dialog(RecurringRuleDialog)
+            rd.load(dlg.categories)
+            if rd.exec() != QtWidgets.QDialog.Accepted:
+                return
+            d = rd.get_data()
+            if d["amount"] <= 0:
+                QtWidgets.QMessageBox.warning(dlg, "Validation", "Amount must be greater than zero.")
+                return
+            self._write(
+                lambda db: db.add_recurring_rule(
+                    d["date"], d["amount"], d["category_id"], d["type"], d["description"],
+                    d["interval_months"], d["day"], d["end_date"],
+                ),
+                changed,
+                failed,
+            )
+
+        def on_amount():
+            r = dlg.selected_rule()
+            if r is None:
+                return
+            cd = self._dialog(RuleChangeDialog)
+            today = QtCore.QDate.currentDate()
+            cd.load("New amount from", today, r.amount_on(today.toString("yyyy-MM-dd")))
+            if cd.exec() == QtWidgets.QDialog.Accepted:
+                start, amount = cd.get_data()
+                self._write(lambda db: db.change_recurring_amount(r.id, start, amount), changed, failed)
+
+        def on_end():
+            r = dlg.selected_rule()
+            if r is None:
+                return
+            cd = self._dialog(RuleChangeDialog)
+            cd.load("Last date", QtCore.QDate.currentDate())
+            if cd.exec() == QtWidgets.QDialog.Accepted:
+                end, _amount = cd.get_data()
+                self._write(lambda db: db.end_recurring_rule(r.id, end), changed, failed)
+
+        def on_delete():
+            r = dlg.selected_rule()
+            if r is None:
+                return
+            question = f"Delete recurring transaction '{r.description or r.type}'? Transactions already confirmed stay."
+            if QtWidgets.QMessageBox.question(dlg, "Delete", question) == QtWidgets.QMessageBox.StandardButton.Yes:
+                self._write(lambda db: db.delete_recurring_rule(r.id), changed, failed)
+
+        dlg.confirm_btn.clicked.connect(on_confirm)
+        dlg.edit_btn.clicked.connect(on_edit)
+        dlg.skip_btn.clicked.connect(on_skip)
+        dlg.add_btn.clicked.connect(on_add)
+        dlg.amount_btn.clicked.connect(on_amount)
+        dlg.end_btn.clicked.connect(on_end)
+        dlg.delete_btn.clicked.connect(on_delete)
+        load()
+        dlg.exec()
+
+    def show_reports(self):
+        from . import analytics
+        from .views import ReportsDialog
+
+        if not analytics.available():
+            QtWidgets.QMessageBox.information(self.window, "Reports", "Reports need numpy installed (pip install numpy).")
+            return
+        dlg = ReportsDialog(self.window, year=self.window.current_year)
+
+        def compute(start, end, income):
+            self._read(
+                lambda db: analytics.build_report(db, start, end, income),
+                dlg.show_report,
+                lambda e: dlg.show_error(f"Report failed: {e}"),
+                stale=False,
+            )
+
+        dlg.report_requested.connect(compute)
+        dlg.request()
+        dlg.exec()
+
+    def import_statements(self):
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            self.window, "Import statements", os.path.expanduser("~"), "Bank statements (*.csv *.ofx *.qfx *.qif)"
+        )
+        if not paths:
+            return
+        from .importers import StatementError, import_file
+
+        def run_imports(db):
+            lines = []
+            for path in paths:
+                try:
+                    result = import_file(db, path)
+                except (StatementError, OSError) as e:
+                    lines.append(f"{os.path.basename(path)}: failed: {e}")
+                    continue
+                lines.append(f"{os.path.basename(path)}: {result.summary()}")
+            self._store_balance_checkpoints(db)
+            return lines
+
+        def finished(lines):
+            self._show_filter_status()
+            self.refresh_filter_categories()
+            self.refresh()
+            QtWidgets.QMessageBox.information(self.window, "Import", "\n".join(lines))
+
+        self.window.status.showMessage("Importing statements…")
+        self._write(run_imports, finished)
+
+    def export_transactions(self):
+        from .exporters import FORMATS, available_formats
+        from .workers import ExportWorker
+
+        if self._export_worker is not None:
+            return
+        formats = available_formats()
+        filters = [f"{FORMATS[f][1]} (*{FORMATS[f][0]})" for f in formats]
+        path, chosen = QtWidgets.QFileDialog.getSaveFileName(
+            self.window, "Export transactions", os.path.expanduser("~/transactions.csv"), ";;".join(filters)
+        )
         if not path:
             return
-        try:
-            self.db.export_csv(path)
-            QtWidgets.QMessageBox.information(self.window, "Export", f"Exported to {path}")
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self.window, "Error", f"Export failed: {e}")
+        fmt = formats[filters.index(chosen)] if chosen in filters else "csv"
+        if not os.path.splitext(path)[1]:
+            path += FORMATS[fmt][0]
+
+        progress = QtWidgets.QProgressDialog("Exporting transactions…", "Cancel", 0, 0, self.window)
+        progress.setWindowTitle("Export")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        worker = ExportWorker(self.executor.wait_ready(), path, fmt)
+        self._export_worker = worker
+
+        def on_progress(done, total):
+            progress.setMaximum(max(total, 1))
+            progress.setValue(done)
+
+        def done():
+            self._export_worker = None
+            progress.reset()
+
+        def on_finished(count):
+            done()
+            QtWidgets.QMessageBox.information(self.window, "Export", f"Exported {count} transactions to {path}")
+
+        def on_failed(message):
+            done()
+            QtWidgets.QMessageBox.warning(self.window, "Error", f"Export failed: {message}")
+
+        worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(on_failed)
+        worker.signals.cancelled.connect(done)
+        progress.canceled.connect(worker.cancel)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def backup_now(self):
+        self._start_backup(self.executor.wait_ready(), scheduled=False)
+
+    def _start_backup(self, db_path, scheduled):
+        # scheduled: the automatic daily backup at startup, which only runs
+        # when the newest snapshot is a day old and reports in the status bar.
+        from . import backup
+        from .workers import BackupWorker
+
+        if self._backup_worker is not None:
+            return
+        dest_dir = backup.default_dir(db_path)
+        if scheduled and not (backup.auto_enabled() and backup.is_due(dest_dir)):
+            return
+        worker = BackupWorker(db_path, dest_dir)
+        self._backup_worker = worker
+        progress = None
+        if not scheduled:
+            progress = QtWidgets.QProgressDialog("Backing up the database…", "Cancel", 0, 0, self.window)
+            progress.setWindowTitle("Back Up")
+            progress.setWindowModality(Qt.WindowModal)
+            progress.setMinimumDuration(300)
+            progress.canceled.connect(worker.cancel)
+
+        def on_progress(done, total):
+            if progress is not None:
+                progress.setMaximum(max(total, 1))
+                progress.setValue(done)
+
+        def done():
+            self._backup_worker = None
+            if progress is not None:
+                progress.reset()
+
+        def on_finished(result):
+            done()
+            message = (
+                f"Backed up to {result.path} ({result.compressed_size / 2**20:.1f} MiB) "
+                f"in {result.seconds:.1f}s, {result.throughput() / 2**20:.1f} MiB/s"
+            )
+            if scheduled:
+                self.window.status.showMessage(message, 10000)
+            else:
+                QtWidgets.QMessageBox.information(self.window, "Back Up", message)
+
+        def on_failed(message):
+            done()
+            if scheduled:
+                self.window.status.showMessage(f"Automatic backup failed: {message}", 10000)
+            else:
+                QtWidgets.QMessageBox.warning(self.window, "Error", f"Backup failed: {message}")
+
+        worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(on_failed)
+        worker.signals.cancelled.connect(done)
+        QtCore.QThreadPool.globalInstance().start(worker)
 
     def show_about(self):
-        # Show the About dialog (views.AboutDialog)
-        try:
-            dlg = AboutDialog(self.window)
-        except Exception:
-            # import lazily to avoid circular import if necessary
-            from .views import AboutDialog
-            dlg = AboutDialog(self.window)
-        dlg.exec()
+        self._dialog(AboutDialog).exec()
 
     def prev_month(self):
         w = self.window
@@ -203,6 +772,7 @@ class Controller:
         else:
             w.current_month -= 1
         w.update_month_label()
+        self._clear_search()
         self.refresh()
 
     def next_month(self):
@@ -213,7 +783,10 @@ class Controller:
         else:
             w.current_month += 1
         w.update_month_label()
+        self._clear_search()
         self.refresh()
 
     def run(self):
         self.window.show()
+        if self.profile is not None:
+            self.profile.mark("window shown")
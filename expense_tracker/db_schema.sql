@@ -3,18 +3,149 @@
 
 CREATE TABLE IF NOT EXISTS categories (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL UNIQUE
+    name TEXT NOT NULL UNIQUE,
+    -- stable id for sync (schema version 11)
+    uuid BLOB
 );
 
 CREATE TABLE IF NOT EXISTS transactions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     date TEXT NOT NULL,
-    amount REAL NOT NULL,
+    -- minor units (cents) since schema version 7; REAL before
+    amount INTEGER NOT NULL,
     category_id INTEGER,
     type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
     description TEXT,
+    content_hash INTEGER,
+    -- stable id for sync (schema version 11)
+    uuid BLOB,
     FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
 );
 
 -- Insert default category
 INSERT OR IGNORE INTO categories (id, name) VALUES (1, 'Uncategorized');
+
+-- Indexes for the hot query paths (schema version 2)
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_date_amount ON transactions(type, date, amount);
+
+-- Filtering and sorting (schema version 6). The (category_id, ...) indexes
+-- replace the single-column category index.
+CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions(amount);
+CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions(category_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_category_amount ON transactions(category_id, amount);
+CREATE INDEX IF NOT EXISTS idx_transactions_description ON transactions(IFNULL(description, ''));
+
+-- Per month x type x category aggregates (schema version 3). Kept current by
+-- the trg_monthly_totals_* triggers defined in migrations.py.
+CREATE TABLE IF NOT EXISTS monthly_totals (
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category_id INTEGER NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, type, category_id)
+) WITHOUT ROWID;
+
+-- Duplicate detection for statement imports and deferrable triggers (schema version 4)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_content_hash ON transactions(content_hash) WHERE content_hash IS NOT NULL;
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+-- Decimals of the stored minor units (schema version 7)
+INSERT OR REPLACE INTO settings (key, value) VALUES ('currency_exponent', 2);
+
+-- Full-text index over descriptions (schema version 5). Kept in sync by the
+-- trg_transactions_fts_* triggers defined in migrations.py.
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    description,
+    content='transactions',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='1 2 3'
+);
+
+-- Opening balance per month for the running balance (schema version 8).
+-- Filled lazily; the trg_balance_checkpoints_* triggers defined in
+-- migrations.py drop the months after each write.
+CREATE TABLE IF NOT EXISTS balance_checkpoints (
+    month TEXT PRIMARY KEY,
+    opening INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Years moved out to archive/<name>-<year>.db files (schema version 9). The
+-- archives hold their rows in a transactions table of the same shape;
+-- monthly_totals and balance_checkpoints still cover archived years.
+CREATE TABLE IF NOT EXISTS archives (
+    year INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Spending limits per category (schema version 10); month is 'YYYY-MM', or
+-- '*' for every month without a limit of its own. Spending is read from
+-- monthly_totals.
+CREATE TABLE IF NOT EXISTS budgets (
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    month TEXT NOT NULL,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    PRIMARY KEY (category_id, month)
+) WITHOUT ROWID;
+
+-- Sync (schema version 11). The trg_*_journal_* triggers defined in
+-- migrations.py keep one change_log row per changed row, its latest change.
+-- entity is 'c' (categories) or 't' (transactions); stamp is a hybrid clock
+-- in ms kept in settings.sync_clock; origin is the sync_devices.id of the
+-- device that made the change, 0 for this one.
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid BLOB NOT NULL UNIQUE,
+    entity TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    stamp INTEGER NOT NULL,
+    origin INTEGER NOT NULL DEFAULT 0
+);
+
+-- This database (id 0) and the devices it has seen in sync files: the
+-- highest seq of theirs applied here and of ours they acknowledged.
+CREATE TABLE IF NOT EXISTS sync_devices (
+    id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL UNIQUE,
+    received INTEGER,
+    acked INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_uuid ON categories(uuid);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_uuid ON transactions(uuid);
+INSERT OR REPLACE INTO settings (key, value) VALUES ('sync_clock', 0);
+
+-- Recurring transactions (schema version 12), expanded on read by
+-- recurrence.py. A rule occurs every interval_months months on `day` (the
+-- last day of shorter months) from start_date until end_date, inclusive.
+-- recurring_amounts: amount changes, each from its start_date on.
+-- recurring_done: occurrences confirmed into a transaction, or skipped
+-- (transaction_id NULL); the rest are planned.
+CREATE TABLE IF NOT EXISTS recurring_rules (
+    id INTEGER PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    interval_months INTEGER NOT NULL DEFAULT 1 CHECK (interval_months > 0),
+    day INTEGER NOT NULL CHECK (day BETWEEN 1 AND 31),
+    end_date TEXT,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    category_id INTEGER REFERENCES categories(id) ON DELETE SET NULL,
+    type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS recurring_amounts (
+    rule_id INTEGER NOT NULL REFERENCES recurring_rules(id) ON DELETE CASCADE,
+    start_date TEXT NOT NULL,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    PRIMARY KEY (rule_id, start_date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS recurring_done (
+    date TEXT NOT NULL,
+    rule_id INTEGER NOT NULL REFERENCES recurring_rules(id) ON DELETE CASCADE,
+    transaction_id INTEGER,
+    PRIMARY KEY (date, rule_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_recurring_done_rule ON recurring_done(rule_id);
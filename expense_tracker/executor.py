@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from .cache import QueryCache
+from .models import Database
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    # Runs Database work off the caller's thread. All writes go through one
+    # dedicated writer thread (SQLite allows a single writer anyway), reads
+    # go to a small pool of read-only connections so a slow query never
+    # queues behind, or in front of, a write.
+    def __init__(self, db_path: Optional[str] = None, readers: int = 2):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Database] = []
+        # One result cache for every connection: a write on the writer thread
+        # invalidates what the readers cached, and a page read by one reader
+        # is a hit for the next.
+        self.cache = QueryCache()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finly-db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="finly-db-reader")
+        # The writer opens (and migrates) the database first; readers connect
+        # lazily after that has finished.
+        self._opened = self._writer.submit(self._open, db_path, False)
+        self.db_path: Optional[str] = None
+        self._closed = False
+
+    def _open(self, db_path: Optional[str], readonly: bool) -> str:
+        db = Database(db_path, readonly=readonly, cache=self.cache)
+        self._local.db = db
+        with self._lock:
+            self._connections.append(db)
+        return db.db_path
+
+    def _call(self, fn: Callable[[Database], T], readonly: bool) -> T:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            self._open(self.wait_ready(), readonly)
+            db = self._local.db
+        return fn(db)
+
+    def wait_ready(self) -> str:
+        if self.db_path is None:
+            self.db_path = self._opened.result()
+        return self.db_path
+
+    def read(self, fn: Callable[[Database], T]) -> "Future[T]":
+        return self._readers.submit(self._call, fn, True)
+
+    def write(self, fn: Callable[[Database], T]) -> "Future[T]":
+        return self._writer.submit(self._call, fn, False)
+
+    def shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._readers.shutdown(wait=True, cancel_futures=True)
+        # The writer connection must be closed on its own thread.
+        self._writer.submit(lambda: self._local.db.close() if getattr(self._local, "db", None) else None)
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            for db in self._connections:
+                if db.readonly:
+                    db.close()
+            self._connections = []
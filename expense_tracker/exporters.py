@@ -0,0 +1,158 @@
+import csv
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+from . import money
+
+COLUMNS = ["id", "date", "amount", "type", "category", "description"]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _records(chunk, amount=lambda minor: minor) -> List[list]:
+    # amount converts the stored minor units for the output format.
+    return [[r["id"], r["date"], amount(r["amount"]), r["type"], r["category"], r["description"]] for r in chunk]
+
+
+def _write_csv(path: str, chunks: Iterable):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for chunk in chunks:
+            writer.writerows(_records(chunk, money.format_minor))
+
+
+def _write_jsonl(path: str, chunks: Iterable):
+    # JSON numbers: the shortest float repr of cents / 100 is the exact
+    # decimal text (12.34), which is what JSON readers parse.
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    scale = money.SCALE
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.writelines(encode(dict(zip(COLUMNS, rec))) + "\n" for rec in _records(chunk, lambda m: m / scale))
+
+
+def _arrow_batches(chunks: Iterable, dictionary: bool):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Parquet dictionary-encodes per row group; the IPC file format only
+    # allows one dictionary per field, so it gets plain strings instead.
+    low_card = pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("date", pa.date32()),
+            ("amount", pa.decimal128(18, money.EXPONENT)),
+            ("type", low_card),
+            ("category", low_card),
+            ("description", pa.string()),
+        ]
+    )
+
+    # Exact decimals, scaled from the stored minor units in one vectorized step.
+    unit = pa.scalar(money.from_minor(1))
+
+    def batches():
+        for chunk in chunks:
+            cols = list(zip(*_records(chunk)))
+            arrays = [
+                pa.array(cols[0], pa.int64()),
+                pa.array(cols[1], pa.string()).cast(pa.date32()),
+                pc.multiply(pa.array(cols[2], pa.int64()).cast(pa.decimal128(19, 0)), unit).cast(schema.field("amount").type),
+                pa.array(cols[3], pa.string()),
+                pa.array(cols[4], pa.string()),
+                pa.array(cols[5], pa.string()),
+            ]
+            if dictionary:
+                arrays[3] = arrays[3].dictionary_encode()
+                arrays[4] = arrays[4].dictionary_encode()
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    return schema, batches()
+
+
+def _write_parquet(path: str, chunks: Iterable):
+    import pyarrow.parquet as pq
+
+    schema, batches = _arrow_batches(chunks, dictionary=True)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def _write_arrow(path: str, chunks: Iterable):
+    import pyarrow as pa
+
+    schema, batches = _arrow_batches(chunks, dictionary=False)
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+# name -> (file extension, label, writer, needs pyarrow)
+FORMATS: Dict[str, tuple] = {
+    "csv": (".csv", "CSV", _write_csv, False),
+    "jsonl": (".jsonl", "JSON Lines", _write_jsonl, False),
+    "parquet": (".parquet", "Parquet", _write_parquet, True),
+    "arrow": (".arrow", "Arrow IPC", _write_arrow, True),
+}
+
+
+def available_formats() -> List[str]:
+    try:
+        import pyarrow  # noqa: F401
+
+        has_arrow = True
+    except ImportError:
+        has_arrow = False
+    return [name for name, spec in FORMATS.items() if has_arrow or not spec[3]]
+
+
+def format_for_path(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for name, spec in FORMATS.items():
+        if spec[0] == ext:
+            return name
+    return "csv"
+
+
+def export_transactions(
+    db,
+    path: str,
+    fmt: Optional[str] = None,
+    chunk_size: int = 5000,
+    progress: Optional[Callable[[int, int], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None,
+) -> int:
+    fmt = fmt or format_for_path(path)
+    if fmt not in available_formats():
+        raise ValueError(f"Export format '{fmt}' is not available (Parquet and Arrow need pyarrow installed)")
+    total = db.count_transactions() if progress else 0
+    written = 0
+
+    def chunks():
+        nonlocal written
+        for chunk in db.iter_transactions(chunk_size):
+            if is_cancelled and is_cancelled():
+                raise ExportCancelled()
+            yield chunk
+            written += len(chunk)
+            if progress:
+                progress(written, total)
+
+    # Write next to the target and rename at the end so a cancelled or
+    # failed export never leaves a truncated file behind.
+    tmp_path = path + ".part"
+    try:
+        FORMATS[fmt][2](tmp_path, chunks())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
@@ -0,0 +1,307 @@
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from . import money
+from .models import Database
+
+# One normalized statement line. amount is always positive, in minor units;
+# the sign lives in type. ref is the bank's own transaction id when the
+# format carries one, and account the statement's account (OFX bank and
+# account id, QIF account name) when it names one: refs are only unique
+# within an account.
+ImportRow = namedtuple(
+    "ImportRow", ["date", "amount", "type", "category", "description", "ref", "account"], defaults=(None,)
+)
+
+
+class ImportResult(namedtuple("ImportResult", ["read", "inserted", "skipped", "refused", "seconds"])):
+    # skipped: duplicates of rows already imported; refused: rows dated in
+    # an archived year, which cannot take new transactions.
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        text = f"{self.inserted} imported, {self.skipped} duplicates skipped"
+        if self.refused:
+            text += f", {self.refused} refused (dated in an archived year)"
+        return text
+
+
+class StatementError(ValueError):
+    pass
+
+
+_DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d.%m.%Y", "%m/%d/%y", "%Y%m%d"]
+
+_CSV_COLUMNS = {
+    "date": ["date", "posted", "posting date", "transaction date", "booking date", "value date"],
+    "amount": ["amount", "value", "transaction amount"],
+    "debit": ["debit", "withdrawal", "money out", "paid out"],
+    "credit": ["credit", "deposit", "money in", "paid in"],
+    "type": ["type", "transaction type"],
+    "category": ["category"],
+    "description": ["description", "memo", "payee", "narrative", "details", "name"],
+}
+
+
+class _DateParser:
+    # Statements repeat the same few dates thousands of times, so parsed
+    # values are memoized instead of calling strptime per row.
+    def __init__(self, date_format: Optional[str] = None):
+        self.date_format = date_format
+        self._cache: Dict[str, str] = {}
+
+    def __call__(self, text: str) -> str:
+        text = text.strip()
+        value = self._cache.get(text)
+        if value is not None:
+            return value
+        if self.date_format is None and len(text) == 10 and text[4] == "-" and text[7] == "-":
+            value = text
+        else:
+            formats = [self.date_format] if self.date_format else _DATE_FORMATS
+            for fmt in formats:
+                try:
+                    value = datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+                    break
+                except ValueError:
+                    continue
+            if value is None:
+                raise StatementError(f"Unrecognized date: {text!r}")
+        self._cache[text] = value
+        return value
+
+
+def _parse_amount(text: str) -> int:
+    # Straight from the statement text to minor units, never through float.
+    text = text.strip()
+    negative = text.startswith("(") and text.endswith(")")
+    text = re.sub(r"[^0-9.\-]", "", text)
+    if not text or text in ("-", "."):
+        raise StatementError("Missing amount")
+    value = money.to_minor(text)
+    return -value if negative else value
+
+
+def _signed_row(date: str, amount: int, category, description, ref=None, t_type=None, account=None) -> ImportRow:
+    if t_type:
+        t_type = "Income" if t_type.strip().lower() in ("income", "credit", "cr", "deposit") else "Expense"
+    else:
+        t_type = "Income" if amount > 0 else "Expense"
+    return ImportRow(date, abs(amount), t_type, category or None, (description or "").strip() or None, ref, account)
+
+
+def parse_csv(path: str, date_format: Optional[str] = None, encoding: str = "utf-8-sig") -> Iterator[ImportRow]:
+    parse_date = _DateParser(date_format)
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        cols = {}
+        for field, aliases in _CSV_COLUMNS.items():
+            for alias in aliases:
+                if alias in header:
+                    cols[field] = header.index(alias)
+                    break
+        if "date" not in cols or not ("amount" in cols or "debit" in cols or "credit" in cols):
+            raise StatementError("CSV needs a date column and an amount (or debit/credit) column")
+        date_i = cols["date"]
+        amount_i = cols.get("amount")
+        debit_i = cols.get("debit")
+        credit_i = cols.get("credit")
+        type_i = cols.get("type")
+        cat_i = cols.get("category")
+        desc_i = cols.get("description")
+        for line_no, rec in enumerate(reader, start=2):
+            if not rec or not any(rec):
+                continue
+            try:
+                if amount_i is not None and rec[amount_i].strip():
+                    amount = _parse_amount(rec[amount_i])
+                else:
+                    debit = rec[debit_i].strip() if debit_i is not None else ""
+                    amount = -abs(_parse_amount(debit)) if debit else abs(_parse_amount(rec[credit_i]))
+                yield _signed_row(
+                    parse_date(rec[date_i]),
+                    amount,
+                    rec[cat_i].strip() if cat_i is not None else None,
+                    rec[desc_i] if desc_i is not None else None,
+                    t_type=rec[type_i] if type_i is not None else None,
+                )
+            except (StatementError, IndexError, ValueError) as e:
+                raise StatementError(f"{os.path.basename(path)}, line {line_no}: {e}") from e
+
+
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def parse_ofx(path: str, encoding: str = "latin-1") -> Iterator[ImportRow]:
+    # Handles both SGML (OFX 1.x, unclosed leaf tags) and XML (OFX 2.x)
+    # files by scanning STMTTRN blocks line by line. The account comes from
+    # the BANKACCTFROM/CCACCTFROM ahead of a statement's transactions.
+    block = None
+    ids: Dict[str, str] = {}
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            upper = line.upper()
+            if "<STMTRS>" in upper or "<CCSTMTRS>" in upper:
+                ids = {}
+            if block is None and "<STMTTRN>" not in upper:
+                for tag, value in _OFX_FIELD.findall(line):
+                    if tag.upper() in ("BANKID", "ACCTID") and value.strip():
+                        ids[tag.upper()] = value.strip()
+            if "<STMTTRN>" in upper:
+                block = {}
+            if block is not None:
+                for tag, value in _OFX_FIELD.findall(line):
+                    if value.strip():
+                        block[tag.upper()] = value.strip()
+            if "</STMTTRN>" in upper and block is not None:
+                try:
+                    posted = block["DTPOSTED"][:8]
+                    date = f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}"
+                    amount = _parse_amount(block["TRNAMT"])
+                except KeyError as e:
+                    raise StatementError(f"{os.path.basename(path)}: STMTTRN without {e.args[0]}") from e
+                description = block.get("NAME") or block.get("PAYEE") or ""
+                memo = block.get("MEMO")
+                if memo and memo != description:
+                    description = f"{description} {memo}".strip()
+                account = ":".join(ids[k] for k in ("BANKID", "ACCTID") if k in ids) or None
+                yield _signed_row(date, amount, None, description, ref=block.get("FITID"), account=account)
+                block = None
+
+
+def parse_qif(path: str, date_format: Optional[str] = None, encoding: str = "utf-8") -> Iterator[ImportRow]:
+    parse_date = _DateParser(date_format)
+    record: Dict[str, str] = {}
+    # Multi-account exports name each account in a !Account record ahead of
+    # its transactions.
+    account = None
+    in_account = False
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.startswith("!"):
+                in_account = line.strip().upper() == "!ACCOUNT"
+                continue
+            if not line:
+                continue
+            code, value = line[0], line[1:].strip()
+            if code != "^":
+                record.setdefault(code, value)
+                continue
+            if in_account:
+                account = record.get("N") or None
+                in_account = False
+            elif "D" in record and ("T" in record or "U" in record):
+                # Quicken writes 1/2'24 for 2024 and pads with spaces.
+                date_text = record["D"].replace("'", "/").replace(" ", "0")
+                category = record.get("L")
+                if category and category.startswith("["):
+                    category = None  # transfer to another account
+                description = record.get("P") or ""
+                if record.get("M") and record["M"] != description:
+                    description = f"{description} {record['M']}".strip()
+                yield _signed_row(
+                    parse_date(date_text),
+                    _parse_amount(record.get("T") or record["U"]),
+                    category.split(":")[0] if category else None,
+                    description,
+                    ref=record.get("N"),
+                    account=account,
+                )
+            record = {}
+
+
+PARSERS = {
+    "csv": parse_csv,
+    "ofx": parse_ofx,
+    "qfx": parse_ofx,
+    "qif": parse_qif,
+}
+
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext not in PARSERS:
+        raise StatementError(f"Unsupported statement format: .{ext}")
+    return ext
+
+
+def with_content_hashes(rows: Iterable[ImportRow], source: str = "", account: Optional[str] = None) -> Iterator[tuple]:
+    # Two identical coffees on the same day are two transactions, so the
+    # fingerprint includes how many times the same line was already seen in
+    # this file. Re-importing the same statement then yields the same hashes.
+    # Bank refs are only unique per account, so they are keyed by the
+    # statement's account, or the caller's for formats that do not name one.
+    seen: Dict[str, int] = {}
+    blake2b = hashlib.blake2b
+    for r in rows:
+        if r.ref:
+            acct = r.account or account
+            key = f"{source}|{acct}|ref|{r.ref}" if acct else f"{source}|ref|{r.ref}"
+        else:
+            # Same text as when amounts were floats formatted with :.2f, so
+            # statements imported before v7 are still recognized.
+            key = f"{r.date}|{money.format_minor(r.amount)}|{r.type}|{r.description or ''}"
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        digest = blake2b(f"{key}|{n}".encode("utf-8"), digest_size=8).digest()
+        yield r.date, r.amount, r.category, r.type, r.description, int.from_bytes(digest, "big", signed=True)
+
+
+def import_file(
+    db: Database,
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 5000,
+    account: Optional[str] = None,
+    **parse_options,
+) -> ImportResult:
+    # account: which account the statement belongs to, for statements that
+    # do not say themselves; keeps bank refs of different accounts apart.
+    fmt = fmt or detect_format(path)
+    rows = PARSERS[fmt](path, **parse_options)
+    started = time.perf_counter()
+    hashed = with_content_hashes(rows, source=fmt, account=account)
+    read, inserted, refused = db.import_transactions(hashed, batch_size=batch_size)
+    return ImportResult(read, inserted, read - inserted - refused, refused, time.perf_counter() - started)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m expense_tracker.importers", description="Import bank statements into Finly")
+    parser.add_argument("files", nargs="+", help="CSV, OFX/QFX or QIF statement files")
+    parser.add_argument("--db", help="path to expenses.db (defaults to the app database)")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="override detection by file extension")
+    parser.add_argument("--date-format", help="strptime format for CSV/QIF dates, e.g. %%d/%%m/%%Y")
+    parser.add_argument("--account", help="account the statements belong to, if they do not name it")
+    args = parser.parse_args(argv)
+    db = Database(args.db)
+    try:
+        for path in args.files:
+            options = {"date_format": args.date_format} if (args.format or detect_format(path)) in ("csv", "qif") else {}
+            try:
+                result = import_file(db, path, fmt=args.format, account=args.account, **options)
+            except (StatementError, OSError) as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                return 1
+            print(
+                f"{path}: {result.summary()} "
+                f"({result.read} rows in {result.seconds:.2f}s, {result.rows_per_second:,.0f} rows/s)"
+            )
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
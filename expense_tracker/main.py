@@ -1,11 +1,53 @@
 import sys
-from PySide6 import QtWidgets
-from .controllers import Controller
+import time
 
+# Before Qt and the app are imported, so --profile-startup includes them.
+STARTED = time.perf_counter()
 
-def main():
-    app = QtWidgets.QApplication(sys.argv)
-    ctrl = Controller(app)
+import argparse
+from . import startup, tracing
+from .executor import DatabaseExecutor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Finly desktop app")
+    parser.add_argument("--db", help="database file (default: expense_tracker/data/expenses.db)")
+    parser.add_argument("--trace", action="store_true", help="time queries and write a JSON trace report on exit")
+    parser.add_argument(startup.FLAG, action="store_true", help="print time to first paint and time to data")
+    parser.add_argument(startup.QUIT_FLAG, action="store_true", help=argparse.SUPPRESS)
+    # Anything else is for Qt (-style, -platform, ...).
+    args, qt_args = parser.parse_known_args(argv)
+    profile = startup.StartupProfile(STARTED) if args.profile_startup else None
+    # Before any connection is opened, so all of them are traced.
+    tracer = tracing.enable() if args.trace or tracing.requested() else None
+    # Opening and migrating the database needs no Qt, so it starts on the
+    # writer thread now and overlaps importing Qt and building the window.
+    executor = DatabaseExecutor(args.db)
+    if profile is not None:
+        executor.write(lambda db: profile.mark("database open"))
+
+    from PySide6 import QtCore, QtWidgets
+    from .controllers import Controller
+
+    if profile is not None:
+        profile.mark("imports")
+
+        def done(p):
+            p.print_report()
+            if args.quit_after_startup:
+                # Queued: quitting shuts the executor down at once, and the
+                # mark that got here may run inside a signal whose later
+                # slots still use it.
+                QtCore.QTimer.singleShot(0, QtWidgets.QApplication.quit)
+
+        profile.on_done = done
+    if tracer is not None:
+        from .views import TransactionTableModel
+
+        tracer.instrument(Controller)
+        tracer.instrument(TransactionTableModel, ["set_source", "_append_page", "apply_change"])
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    ctrl = Controller(app, profile=profile, executor=executor)
     ctrl.run()
     sys.exit(app.exec())
 
@@ -0,0 +1,44 @@
+import argparse
+import sys
+
+from .models import Database
+
+
+def rebuild_totals(db: Database) -> int:
+    count = db.rebuild_monthly_totals()
+    print(f"Rebuilt monthly_totals: {count} aggregate rows")
+    return 0
+
+
+def verify_totals(db: Database) -> int:
+    mismatches = db.verify_monthly_totals()
+    if not mismatches:
+        print("monthly_totals is consistent with transactions")
+        return 0
+    print(f"{len(mismatches)} mismatched aggregate rows (month, type, category_id, stored, actual):")
+    for m in mismatches:
+        print("  " + ", ".join("-" if v is None else str(v) for v in m))
+    print("Run 'rebuild-totals' to repair.")
+    return 1
+
+
+COMMANDS = {
+    "rebuild-totals": rebuild_totals,
+    "verify-totals": verify_totals,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m expense_tracker.maintenance", description="Finly database maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--db", help="path to expenses.db (defaults to the app database)")
+    args = parser.parse_args(argv)
+    db = Database(args.db)
+    try:
+        return COMMANDS[args.command](db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,560 @@
+import sqlite3
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from . import money
+
+
+def _v1_base_schema(cur: sqlite3.Cursor):
+    # Databases created before versioning already have these tables, so the
+    # statements stay idempotent and an unversioned file is adopted as-is.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category_id INTEGER,
+            type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
+            description TEXT,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+        )
+        """
+    )
+    cur.execute("INSERT OR IGNORE INTO categories (id, name) VALUES (1, 'Uncategorized')")
+
+
+def _v2_transaction_indexes(cur: sqlite3.Cursor):
+    # date: month pages and keyset pagination (the rowid rides along as the tiebreaker)
+    # type, date, amount: covering index for the monthly income/expense sums
+    # category_id: the "is this category still used" check in delete_category
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date_amount ON transactions(type, date, amount)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category_id)")
+    cur.execute("ANALYZE")
+
+
+# {table} is transactions, or an archived year's table (see v9).
+MONTHLY_TOTALS_AGGREGATE_TEMPLATE = """
+    SELECT substr(date, 1, 7), type, IFNULL(category_id, 0), SUM(amount), COUNT(*)
+    FROM {table}
+    GROUP BY 1, 2, 3
+"""
+
+MONTHLY_TOTALS_AGGREGATE_SQL = MONTHLY_TOTALS_AGGREGATE_TEMPLATE.format(table="transactions")
+
+MONTHLY_TOTALS_REBUILD_SQL = (
+    "INSERT INTO monthly_totals (month, type, category_id, total, tx_count)" + MONTHLY_TOTALS_AGGREGATE_SQL
+)
+
+
+_MONTHLY_TOTALS_ADD_NEW = """
+    INSERT INTO monthly_totals (month, type, category_id, total, tx_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, IFNULL(NEW.category_id, 0), NEW.amount, 1)
+    ON CONFLICT (month, type, category_id)
+    DO UPDATE SET total = total + excluded.total, tx_count = tx_count + 1;
+"""
+
+_MONTHLY_TOTALS_REMOVE_OLD = """
+    UPDATE monthly_totals SET total = total - OLD.amount, tx_count = tx_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category_id = IFNULL(OLD.category_id, 0);
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category_id = IFNULL(OLD.category_id, 0)
+      AND tx_count <= 0;
+"""
+
+# Folds every transaction with id > ? into monthly_totals in one pass. Bulk
+# loads use it instead of the per-row triggers (see DEFER_MONTHLY_TOTALS).
+MONTHLY_TOTALS_APPLY_SQL = """
+    INSERT INTO monthly_totals (month, type, category_id, total, tx_count)
+    SELECT substr(date, 1, 7), type, IFNULL(category_id, 0), SUM(amount), COUNT(*)
+    FROM transactions
+    WHERE id > ?
+    GROUP BY 1, 2, 3
+    ON CONFLICT (month, type, category_id)
+    DO UPDATE SET total = total + excluded.total, tx_count = tx_count + excluded.tx_count
+"""
+
+# While a settings row with this key exists, the monthly_totals triggers and
+# the balance checkpoint triggers that follow them are skipped. It is only
+# ever written inside a transaction, so no other connection can observe it.
+DEFER_MONTHLY_TOTALS = "defer_monthly_totals"
+_UNLESS_DEFERRED = f"WHEN NOT EXISTS (SELECT 1 FROM settings WHERE key = '{DEFER_MONTHLY_TOTALS}')"
+
+
+def _create_monthly_totals_triggers(cur: sqlite3.Cursor, when: str = ""):
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_insert AFTER INSERT ON transactions {when} "
+        f"BEGIN {_MONTHLY_TOTALS_ADD_NEW} END"
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_delete AFTER DELETE ON transactions {when} "
+        f"BEGIN {_MONTHLY_TOTALS_REMOVE_OLD} END"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_monthly_totals_update "
+        f"AFTER UPDATE OF date, amount, type, category_id ON transactions {when} "
+        f"BEGIN {_MONTHLY_TOTALS_REMOVE_OLD} {_MONTHLY_TOTALS_ADD_NEW} END"
+    )
+
+
+def _v3_monthly_totals(cur: sqlite3.Cursor):
+    # One row per month x type x category, kept current by triggers so every
+    # write path (including ones added later) maintains it. Uncategorized rows
+    # are stored under category_id 0 because NULLs never collide in a key.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type, category_id)
+        ) WITHOUT ROWID
+        """
+    )
+    _create_monthly_totals_triggers(cur)
+    cur.execute("DELETE FROM monthly_totals")
+    cur.execute(MONTHLY_TOTALS_REBUILD_SQL)
+
+
+def _v4_bulk_import(cur: sqlite3.Cursor):
+    # Fingerprint of imported statement lines (64-bit, see
+    # importers.with_content_hashes); NULL for rows entered by hand, so only
+    # imports take part in duplicate detection.
+    cur.execute("ALTER TABLE transactions ADD COLUMN content_hash INTEGER")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_content_hash "
+        "ON transactions(content_hash) WHERE content_hash IS NOT NULL"
+    )
+    cur.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    for name in ("insert", "delete", "update"):
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_monthly_totals_{name}")
+    _create_monthly_totals_triggers(cur, when=_UNLESS_DEFERRED)
+
+
+# Same mechanism as DEFER_MONTHLY_TOTALS for the full-text index: bulk
+# loads index their new rows with one INSERT ... SELECT instead.
+DEFER_SEARCH_INDEX = "defer_search_index"
+
+SEARCH_INDEX_APPLY_SQL = "INSERT INTO transactions_fts (rowid, description) SELECT id, description FROM transactions WHERE id > ?"
+
+
+def _v5_search_index(cur: sqlite3.Cursor):
+    # External-content FTS5 index over descriptions: it stores only the
+    # inverted index and reads the text back from transactions.
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            description,
+            content='transactions',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='1 2 3'
+        )
+        """
+    )
+    _create_search_index_triggers(cur)
+    cur.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def _create_search_index_triggers(cur: sqlite3.Cursor):
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert AFTER INSERT ON transactions "
+        f"WHEN NOT EXISTS (SELECT 1 FROM settings WHERE key = '{DEFER_SEARCH_INDEX}') "
+        "BEGIN INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description); END"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+        "INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description); "
+        "END"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN "
+        "INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description); "
+        "INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description); "
+        "END"
+    )
+
+
+def _v6_filter_indexes(cur: sqlite3.Cursor):
+    # amount: sorting by amount and amount-range filters
+    # category_id, date / amount: category filters sorted by date or amount,
+    # and the per-category walk of the category sort. They also serve the
+    # "is this category still used" check, so the single-column index from
+    # v2 is dropped.
+    # IFNULL(description, ''): sorting by description, matching the sort
+    # key expression in models.SORT_KEYS exactly.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions(amount)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions(category_id, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category_amount ON transactions(category_id, amount)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_description ON transactions(IFNULL(description, ''))")
+    cur.execute("DROP INDEX IF EXISTS idx_transactions_category")
+    cur.execute("ANALYZE")
+
+
+CURRENCY_EXPONENT_KEY = "currency_exponent"
+
+
+def _v7_integer_amounts(cur: sqlite3.Cursor):
+    # REAL amounts become INTEGER minor units (money.EXPONENT decimals), so
+    # sums are exact and run on SQLite's integer path. A column's type can
+    # only change by rebuilding the table; ids, and with them the search
+    # index rowids, are kept as they are.
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'")
+    row = cur.fetchone()
+    seq = row[0] if row else None
+    cur.execute(
+        """
+        CREATE TABLE transactions_v7 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            category_id INTEGER,
+            type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
+            description TEXT,
+            content_hash INTEGER,
+            FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        INSERT INTO transactions_v7 (id, date, amount, category_id, type, description, content_hash)
+        SELECT id, date, CAST(ROUND(amount * {money.SCALE:d}) AS INTEGER), category_id, type, description, content_hash
+        FROM transactions
+        ORDER BY id
+        """
+    )
+    # Dropping the table drops its indexes and triggers too.
+    cur.execute("DROP TABLE transactions")
+    cur.execute("ALTER TABLE transactions_v7 RENAME TO transactions")
+    if seq is not None:
+        # Ids of deleted rows stay retired.
+        cur.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'", (seq,))
+    for sql in (
+        "CREATE INDEX idx_transactions_date ON transactions(date)",
+        "CREATE INDEX idx_transactions_type_date_amount ON transactions(type, date, amount)",
+        "CREATE UNIQUE INDEX idx_transactions_content_hash ON transactions(content_hash) WHERE content_hash IS NOT NULL",
+        "CREATE INDEX idx_transactions_amount ON transactions(amount)",
+        "CREATE INDEX idx_transactions_category_date ON transactions(category_id, date)",
+        "CREATE INDEX idx_transactions_category_amount ON transactions(category_id, amount)",
+        "CREATE INDEX idx_transactions_description ON transactions(IFNULL(description, ''))",
+    ):
+        cur.execute(sql)
+    _create_monthly_totals_triggers(cur, when=_UNLESS_DEFERRED)
+    _create_search_index_triggers(cur)
+
+    cur.execute("DROP TABLE monthly_totals")
+    cur.execute(
+        """
+        CREATE TABLE monthly_totals (
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type, category_id)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(MONTHLY_TOTALS_REBUILD_SQL)
+    cur.execute(
+        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (CURRENCY_EXPONENT_KEY, money.EXPONENT)
+    )
+    cur.execute("ANALYZE")
+
+
+# Opening balance (income minus expenses of every earlier month) per month,
+# filled in lazily by Database.balance_before. A write only changes the
+# openings of the months after it, so the triggers drop those and keep the
+# rest; the deferred bulk path does the same with this statement.
+BALANCE_CHECKPOINTS_APPLY_SQL = """
+    DELETE FROM balance_checkpoints
+    WHERE month > (SELECT substr(MIN(date), 1, 7) FROM transactions WHERE id > ?)
+"""
+
+
+def _v8_balance_checkpoints(cur: sqlite3.Cursor):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            month TEXT PRIMARY KEY,
+            opening INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_insert AFTER INSERT ON transactions {_UNLESS_DEFERRED} "
+        "BEGIN DELETE FROM balance_checkpoints WHERE month > substr(NEW.date, 1, 7); END"
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_delete AFTER DELETE ON transactions {_UNLESS_DEFERRED} "
+        "BEGIN DELETE FROM balance_checkpoints WHERE month > substr(OLD.date, 1, 7); END"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_update "
+        f"AFTER UPDATE OF date, amount, type ON transactions {_UNLESS_DEFERRED} "
+        "BEGIN DELETE FROM balance_checkpoints WHERE month > MIN(substr(OLD.date, 1, 7), substr(NEW.date, 1, 7)); END"
+    )
+
+
+def _v9_archives(cur: sqlite3.Cursor):
+    # Closed years moved out to their own files by Database.archive_year.
+    # monthly_totals and balance_checkpoints keep covering archived years,
+    # so summaries, trends and balances never open an archive. path is
+    # relative to the directory of the main database.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+
+# budgets.month value of a category's standing limit, used for every month
+# that has no limit of its own.
+EVERY_MONTH = "*"
+
+
+def _v10_budgets(cur: sqlite3.Cursor):
+    # Spending limits per category and month ('YYYY-MM' or EVERY_MONTH).
+    # Spending itself is not stored here: monthly_totals already has every
+    # category's expense total per month, kept current by its triggers, so
+    # budget status is one primary-key lookup per budgeted category.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS budgets (
+            category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+            month TEXT NOT NULL,
+            amount INTEGER NOT NULL CHECK (amount > 0),
+            PRIMARY KEY (category_id, month)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+# Change journal for sync.py. Every insert, update and delete of a
+# transaction or category leaves one change_log row per uuid (the latest
+# change replaces earlier ones), stamped with a hybrid clock: milliseconds
+# since the epoch, bumped past the last stamp so local stamps never repeat.
+# seq orders this device's journal; sync files carry the changes after the
+# seq the other side has acknowledged. Bulk writes switch the triggers off
+# with DEFER_CHANGE_LOG and journal their rows with one statement instead.
+# uuids are 16-byte BLOBs (hex in sync files); entity is the key of
+# JOURNAL_ENTITIES.
+DEFER_CHANGE_LOG = "defer_change_log"
+SYNC_CLOCK_KEY = "sync_clock"
+# sync_devices.id of this database; other ids are devices seen in sync files.
+THIS_DEVICE = 0
+
+JOURNAL_ENTITIES = {"c": "categories", "t": "transactions"}
+
+NEW_UUID_SQL = "randomblob(16)"
+
+_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Advances the clock for one stamp (as MAX(value + 1, now)). Parameters:
+# the new stamp floor, so the Python side can pass a remote stamp too.
+SYNC_CLOCK_TICK_SQL = f"UPDATE settings SET value = MAX(value + 1, {_NOW_MS}, ?) WHERE key = '{SYNC_CLOCK_KEY}'"
+
+# Journals every row of {table} ({entity}) with id > ? as inserted by this
+# device, at one stamp (tick the clock first).
+CHANGE_LOG_APPLY_TEMPLATE = f"""
+    INSERT OR REPLACE INTO change_log (uuid, entity, deleted, stamp, origin)
+    SELECT uuid, '{{entity}}', 0, (SELECT value FROM settings WHERE key = '{SYNC_CLOCK_KEY}'), {THIS_DEVICE}
+    FROM {{table}}
+    WHERE id > ?
+"""
+
+
+def _journal_sql(entity: str, uuid: str, deleted: int) -> str:
+    return f"""
+        UPDATE settings SET value = MAX(value + 1, {_NOW_MS}) WHERE key = '{SYNC_CLOCK_KEY}';
+        INSERT OR REPLACE INTO change_log (uuid, entity, deleted, stamp, origin)
+        SELECT {uuid}, '{entity}', {deleted}, value, {THIS_DEVICE} FROM settings WHERE key = '{SYNC_CLOCK_KEY}';
+    """
+
+
+_ROW_UUID_NAMESPACE = uuid.UUID("a2303751-2805-470f-993b-8a10579eea7a")
+
+
+def _row_uuid(*values) -> bytes:
+    return uuid.uuid5(_ROW_UUID_NAMESPACE, "\x1f".join(str(v) for v in values)).bytes
+
+
+def _v11_change_journal(cur: sqlite3.Cursor):
+    # Existing rows get uuids derived from their id and contents, so two
+    # databases that started as copies of one file agree on the rows they
+    # still share and the first sync between them does not duplicate them.
+    # Rows added later get random ones.
+    cur.connection.create_function("finly_row_uuid", -1, _row_uuid, deterministic=True)
+    for entity, columns in (("c", "name"), ("t", "date, amount, category_id, type, description")):
+        table = JOURNAL_ENTITIES[entity]
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN uuid BLOB")
+        cur.execute(f"UPDATE {table} SET uuid = finly_row_uuid('{table}', id, {columns})")
+        cur.execute(f"CREATE UNIQUE INDEX idx_{table}_uuid ON {table}(uuid)")
+        when = f"WHEN NOT EXISTS (SELECT 1 FROM settings WHERE key = '{DEFER_CHANGE_LOG}')"
+        # Rows inserted without a uuid get one here; the app passes its own.
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_journal_insert AFTER INSERT ON {table} {when} BEGIN "
+            f"UPDATE {table} SET uuid = {NEW_UUID_SQL} WHERE id = NEW.id AND NEW.uuid IS NULL; "
+            + _journal_sql(entity, f"IFNULL(NEW.uuid, (SELECT uuid FROM {table} WHERE id = NEW.id))", 0)
+            + "END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_journal_update AFTER UPDATE OF {columns} ON {table} {when} BEGIN "
+            + _journal_sql(entity, "NEW.uuid", 0)
+            + "END"
+        )
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_journal_delete AFTER DELETE ON {table} {when} BEGIN "
+            + _journal_sql(entity, "OLD.uuid", 1)
+            + "END"
+        )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            uuid BLOB NOT NULL UNIQUE,
+            entity TEXT NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            stamp INTEGER NOT NULL,
+            origin INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # received: the highest seq of that device's journal applied here, NULL
+    # for devices only seen as the origin of changes relayed by another;
+    # acked: the highest seq of ours it reported having applied, NULL until
+    # it has applied a file of ours.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_devices (
+            id INTEGER PRIMARY KEY,
+            device TEXT NOT NULL UNIQUE,
+            received INTEGER,
+            acked INTEGER
+        )
+        """
+    )
+    cur.execute(f"INSERT INTO sync_devices (id, device) VALUES ({THIS_DEVICE}, lower(hex({NEW_UUID_SQL})))")
+    cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, 0)", (SYNC_CLOCK_KEY,))
+
+
+def _v12_recurring(cur: sqlite3.Cursor):
+    # Recurring transactions as rules, expanded on read for the dates asked
+    # about (see recurrence.py) instead of stored as years of future rows.
+    # A rule occurs every interval_months months on `day`, or on the last day
+    # of shorter months, from start_date up to end_date (inclusive; NULL
+    # never ends). recurring_amounts holds amount changes, each from its
+    # start_date on. recurring_done marks the occurrences that no longer
+    # show as planned: confirmed into a transaction, or skipped
+    # (transaction_id NULL).
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recurring_rules (
+            id INTEGER PRIMARY KEY,
+            start_date TEXT NOT NULL,
+            interval_months INTEGER NOT NULL DEFAULT 1 CHECK (interval_months > 0),
+            day INTEGER NOT NULL CHECK (day BETWEEN 1 AND 31),
+            end_date TEXT,
+            amount INTEGER NOT NULL CHECK (amount > 0),
+            category_id INTEGER REFERENCES categories(id) ON DELETE SET NULL,
+            type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
+            description TEXT
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recurring_amounts (
+            rule_id INTEGER NOT NULL REFERENCES recurring_rules(id) ON DELETE CASCADE,
+            start_date TEXT NOT NULL,
+            amount INTEGER NOT NULL CHECK (amount > 0),
+            PRIMARY KEY (rule_id, start_date)
+        ) WITHOUT ROWID
+        """
+    )
+    # Keyed by date first: reads ask for the occurrences of a date range.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recurring_done (
+            date TEXT NOT NULL,
+            rule_id INTEGER NOT NULL REFERENCES recurring_rules(id) ON DELETE CASCADE,
+            transaction_id INTEGER,
+            PRIMARY KEY (date, rule_id)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recurring_done_rule ON recurring_done(rule_id)")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "base schema", _v1_base_schema),
+    (2, "indexes on transactions(date), (type, date, amount) and (category_id)", _v2_transaction_indexes),
+    (3, "monthly_totals aggregate maintained by triggers", _v3_monthly_totals),
+    (4, "content_hash column and deferrable monthly_totals triggers for bulk imports", _v4_bulk_import),
+    (5, "FTS5 search index over transaction descriptions", _v5_search_index),
+    (6, "indexes for filtering and sorting by amount, category and description", _v6_filter_indexes),
+    (7, "amounts as INTEGER minor units; integer monthly_totals", _v7_integer_amounts),
+    (8, "per-month opening balance checkpoints for the running balance", _v8_balance_checkpoints),
+    (9, "registry of years archived to separate files", _v9_archives),
+    (10, "per-category monthly budgets", _v10_budgets),
+    (11, "uuids on transactions and categories and a change journal for sync", _v11_change_journal),
+    (12, "recurring transaction rules", _v12_recurring),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    # Each migration runs in its own transaction together with the
+    # user_version bump, so an interrupted upgrade leaves the file at the
+    # last fully applied version.
+    if target is None:
+        target = LATEST_VERSION
+    version = get_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this version of Finly supports ({LATEST_VERSION})."
+        )
+    for number, _name, apply in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            apply(cur)
+            cur.execute(f"PRAGMA user_version = {number:d}")
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = number
+    if version >= 7:
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (CURRENCY_EXPONENT_KEY,)).fetchone()
+        if row is not None and row[0] != money.EXPONENT:
+            raise RuntimeError(
+                f"Database amounts have {row[0]} decimals but this version of Finly uses {money.EXPONENT}."
+            )
+    return version
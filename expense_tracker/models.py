@@ -1,11 +1,111 @@
-import csv
+import datetime
+import heapq
+import itertools
 import os
+import re
 import sqlite3
-from typing import List, Optional, Tuple
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .cache import QueryCache, cached
+from .migrations import (
+    BALANCE_CHECKPOINTS_APPLY_SQL,
+    CHANGE_LOG_APPLY_TEMPLATE,
+    DEFER_CHANGE_LOG,
+    DEFER_MONTHLY_TOTALS,
+    DEFER_SEARCH_INDEX,
+    EVERY_MONTH,
+    MONTHLY_TOTALS_AGGREGATE_SQL,
+    MONTHLY_TOTALS_AGGREGATE_TEMPLATE,
+    MONTHLY_TOTALS_APPLY_SQL,
+    MONTHLY_TOTALS_REBUILD_SQL,
+    NEW_UUID_SQL,
+    SEARCH_INDEX_APPLY_SQL,
+    SYNC_CLOCK_TICK_SQL,
+    migrate,
+)
+from .recurrence import PlannedTransaction, Rule, expand, merge
+
+
+# Connection settings per durability profile. "balanced" is the default:
+# with WAL, synchronous=NORMAL can lose the last commits on power loss but
+# never corrupts the database, and readers no longer block the writer.
+DURABILITY_PROFILES: Dict[str, Dict[str, object]] = {
+    "safe": {"journal_mode": "DELETE", "synchronous": "FULL", "mmap_size": 0, "cache_size": -2000},
+    "balanced": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 256 * 1024 * 1024, "cache_size": -32000},
+    "fast": {"journal_mode": "WAL", "synchronous": "OFF", "mmap_size": 1024 * 1024 * 1024, "cache_size": -128000},
+}
+
+DEFAULT_DURABILITY = "balanced"
+
+
+class TransactionFilter(
+    namedtuple(
+        "TransactionFilter",
+        ["start_date", "end_date", "category_ids", "t_type", "min_amount", "max_amount", "text"],
+        defaults=(None, None, None, None, None, None, None),
+    )
+):
+    # Criteria for Database.query_page; None leaves a criterion out. Dates
+    # are inclusive ISO strings, amounts minor units (see money), category_ids
+    # a tuple so filters can be cache keys, text is matched word by word like
+    # search().
+    def is_empty(self) -> bool:
+        return all(v is None for v in self)
+
+
+class BudgetStatus(namedtuple("BudgetStatus", ["category_id", "category", "limit", "spent", "count"])):
+    # One budgeted category in one month: limit and spent in minor units,
+    # count the expenses behind spent.
+    def remaining(self) -> int:
+        return self.limit - self.spent
+
+    def utilization(self) -> float:
+        return self.spent / self.limit
+
+    def over(self) -> bool:
+        return self.spent > self.limit
+
+
+# Sort keys of query_page, most significant first; the row id breaks ties.
+# Each sort is served by an index in that order (see migrations v2 and v6).
+# Nullable columns sort through IFNULL so the keyset never meets a NULL.
+SORT_KEYS: Dict[str, Tuple[str, ...]] = {
+    "date": ("t.date",),
+    "amount": ("t.amount",),
+    "type": ("t.type", "t.date", "t.amount"),
+    "description": ("IFNULL(t.description, '')",),
+    "category": ("IFNULL(c.name, '')", "t.date"),
+}
+
+# Sorts with a (category_id, sort key) index, used for category filters.
+CATEGORY_SORTS = ("date", "amount")
+
+
+def signed_amount(row) -> int:
+    # What a transaction adds to the running balance.
+    return row["amount"] if row["type"] == "Income" else -row["amount"]
+
+
+def new_uuid() -> bytes:
+    # 16 bytes for a new row's uuid column: milliseconds since the epoch,
+    # then random bytes. Time first keeps inserts into the uuid indexes
+    # appending at their end instead of landing on random pages.
+    return int(time.time() * 1000).to_bytes(6, "big") + os.urandom(10)
 
 
 class Database:
-    def __init__(self, db_path: Optional[str] = None):
+    # Amounts go in and come out as integers in minor units (cents); see
+    # money.py for converting to and from Decimal and display strings.
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        readonly: bool = False,
+        durability: Optional[str] = None,
+        cache: Optional[QueryCache] = None,
+    ):
         base = os.path.dirname(__file__)
         data_dir = os.path.join(base, "data")
         os.makedirs(data_dir, exist_ok=True)
@@ -13,41 +113,121 @@ class Database:
             db_path = os.path.join(data_dir, "expenses.db")
 
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self._init_schema()
+        self.readonly = readonly
+        self.durability = durability or os.environ.get("FINLY_DURABILITY") or DEFAULT_DURABILITY
+        if self.durability not in DURABILITY_PROFILES:
+            raise ValueError(f"Unknown durability profile: {self.durability}")
+        self._tx_depth = 0
+        # Connections to the same file (see DatabaseExecutor) share one cache;
+        # tables written in the open transaction are invalidated on commit.
+        self.cache = cache if cache is not None else QueryCache()
+        self._dirty: Set[str] = set()
+        self._data_version: Optional[int] = None
+        self._commit_seq = 0
+        # Archived years attached to this connection, least recently used
+        # first: year -> schema name.
+        self._attached: "OrderedDict[int, str]" = OrderedDict()
+        if readonly:
+            # Read-only connections live in a reader pool and may be closed
+            # from the thread that shuts the pool down. They never migrate:
+            # the writer connection has already done that.
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            self._apply_profile()
+            self.conn.execute("PRAGMA query_only = ON;")
+        else:
+            self.conn = sqlite3.connect(self.db_path)
+            self.conn.row_factory = sqlite3.Row
+            self._apply_profile()
+            self._init_schema()
 
-    def _init_schema(self):
+    def _apply_profile(self):
+        profile = DURABILITY_PROFILES[self.durability]
         cur = self.conn.cursor()
-        cur.execute("PRAGMA foreign_keys = ON;")
-        
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-            """
-        )
+        if not self.readonly:
+            # journal_mode is stored in the file; the rest is per connection.
+            cur.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        cur.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        cur.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        cur.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        cur.execute("PRAGMA temp_store = MEMORY")
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                amount REAL NOT NULL,
-                category_id INTEGER,
-                type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
-                description TEXT,
-                FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
-            )
-            """
-        )
+    def _init_schema(self):
+        self.conn.execute("PRAGMA foreign_keys = ON;")
+        migrate(self.conn)
 
-        cur.execute("INSERT OR IGNORE INTO categories (id, name) VALUES (1, 'Uncategorized')")
+    @contextmanager
+    def transaction(self):
+        # Unit of work: every mutation inside the block is committed once at
+        # the end (one fsync) or rolled back together if it raises. Nested
+        # blocks become savepoints, so an inner failure that the caller
+        # handles only undoes the inner block.
+        depth = self._tx_depth
+        if depth == 0:
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute("BEGIN")
+        else:
+            self.conn.execute(f"SAVEPOINT uow_{depth}")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if depth == 0:
+                self.conn.rollback()
+                self._dirty.clear()
+            else:
+                self.conn.execute(f"ROLLBACK TO uow_{depth}")
+                self.conn.execute(f"RELEASE uow_{depth}")
+            raise
+        self._tx_depth -= 1
+        if depth == 0:
+            self.conn.commit()
+            self._invalidate()
+        else:
+            self.conn.execute(f"RELEASE uow_{depth}")
 
-        self.conn.commit()
+    @property
+    def in_unit_of_work(self) -> bool:
+        return self._tx_depth > 0
 
+    def _commit(self):
+        # Single-call mutators commit immediately unless they run inside
+        # transaction(), in which case the outermost block commits.
+        if self._tx_depth == 0:
+            self.conn.commit()
+            self._invalidate()
+
+    def _touch(self, *tables: str):
+        self._dirty.update(tables)
+
+    def _invalidate(self):
+        # Bumped after the commit, never before: a reader that fills the
+        # cache in between would otherwise store pre-commit rows under the
+        # new generation.
+        if self._dirty and self.cache is not None:
+            self.cache.bump(self._dirty)
+            self._commit_seq = self.cache.commit_seq
+        self._dirty.clear()
+
+    def _check_external_writes(self):
+        # PRAGMA data_version changes when another connection commits. Writes
+        # made through a Database sharing this cache have already bumped
+        # their tables (commit_seq moved on too); anything else, such as the
+        # importer CLI running against the same file, drops every entry.
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        seq = self.cache.commit_seq
+        if self._data_version is not None and version != self._data_version and seq == self._commit_seq:
+            self.cache.bump_all()
+            seq = self.cache.commit_seq
+        self._data_version = version
+        self._commit_seq = seq
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.cache.stats() if self.cache is not None else {}
+
+    @cached("categories")
     def get_categories(self) -> List[sqlite3.Row]:
         cur = self.conn.cursor()
         cur.execute("SELECT id, name FROM categories ORDER BY name")
@@ -55,36 +235,326 @@ class Database:
 
     def add_category(self, name: str) -> int:
         cur = self.conn.cursor()
-        cur.execute("INSERT INTO categories (name) VALUES (?)", (name.strip(),))
-        self.conn.commit()
+        cur.execute("INSERT INTO categories (name, uuid) VALUES (?, ?)", (name.strip(), new_uuid()))
+        self._touch("categories")
+        self._commit()
         return cur.lastrowid
 
     def update_category(self, category_id: int, name: str):
         cur = self.conn.cursor()
         cur.execute("UPDATE categories SET name = ? WHERE id = ?", (name.strip(), category_id))
-        self.conn.commit()
+        self._touch("categories")
+        self._commit()
+
+    def category_in_use(self, category_id: int) -> bool:
+        cur = self.conn.cursor()
+        cur.execute("SELECT EXISTS (SELECT 1 FROM transactions WHERE category_id = ?) as used", (category_id,))
+        if cur.fetchone()["used"]:
+            return True
+        cur.execute("SELECT EXISTS (SELECT 1 FROM recurring_rules WHERE category_id = ?) as used", (category_id,))
+        if cur.fetchone()["used"]:
+            return True
+        if not self.get_archives():
+            return False
+        # Archived rows still count, through the totals they left behind.
+        cur.execute("SELECT EXISTS (SELECT 1 FROM monthly_totals WHERE category_id = ?) as used", (category_id,))
+        return bool(cur.fetchone()["used"])
 
     def delete_category(self, category_id: int) -> bool:
         if category_id == 1:
             return False
-        cur = self.conn.cursor()
-        cur.execute("SELECT COUNT(*) as cnt FROM transactions WHERE category_id = ?", (category_id,))
-        if cur.fetchone()["cnt"] > 0:
+        if self.category_in_use(category_id):
             return False
+        cur = self.conn.cursor()
         cur.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-        self.conn.commit()
+        self._touch("categories")
+        self._commit()
         return cur.rowcount > 0
 
-    def add_transaction(self, date: str, amount: float, category_id: Optional[int], t_type: str, description: Optional[str]) -> int:
+    @cached("budgets")
+    def get_budgets(self, year: int, month: int) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+        # category_id -> (standing limit, limit of year-month only) for every
+        # category with either.
         cur = self.conn.cursor()
         cur.execute(
-            "INSERT INTO transactions (date, amount, category_id, type, description) VALUES (?, ?, ?, ?, ?)",
-            (date, amount, category_id, t_type, description),
+            "SELECT category_id, month, amount FROM budgets WHERE month IN (?, ?)",
+            (EVERY_MONTH, f"{year:04d}-{month:02d}"),
         )
-        self.conn.commit()
+        budgets: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+        for r in cur.fetchall():
+            every, own = budgets.get(r["category_id"], (None, None))
+            if r["month"] == EVERY_MONTH:
+                every = r["amount"]
+            else:
+                own = r["amount"]
+            budgets[r["category_id"]] = (every, own)
+        return budgets
+
+    def set_budget(self, category_id: int, amount: Optional[int], year: Optional[int] = None, month: Optional[int] = None):
+        # Limit for year-month only, or the standing one without a month;
+        # None removes it.
+        key = f"{year:04d}-{month:02d}" if year and month else EVERY_MONTH
+        cur = self.conn.cursor()
+        if amount is None:
+            cur.execute("DELETE FROM budgets WHERE category_id = ? AND month = ?", (category_id, key))
+        else:
+            cur.execute(
+                "INSERT OR REPLACE INTO budgets (category_id, month, amount) VALUES (?, ?, ?)", (category_id, key, amount)
+            )
+        self._touch("budgets")
+        self._commit()
+
+    @cached("transactions", "categories", "budgets")
+    def get_budget_status(self, year: int, month: int) -> List[BudgetStatus]:
+        # Limit and spending of every budgeted category in year-month, in one
+        # query: a month's own limit wins over the standing one, and spending
+        # is the category's expense row in monthly_totals, which the triggers
+        # move by each write's amount delta. Most used first.
+        key = f"{year:04d}-{month:02d}"
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT b.category_id, c.name, b.amount, IFNULL(m.total, 0), IFNULL(m.tx_count, 0)
+            FROM budgets b
+            JOIN categories c ON c.id = b.category_id
+            LEFT JOIN monthly_totals m ON m.month = ? AND m.type = 'Expense' AND m.category_id = b.category_id
+            WHERE b.month = ?
+               OR (b.month = ? AND NOT EXISTS (
+                   SELECT 1 FROM budgets o WHERE o.category_id = b.category_id AND o.month = ?))
+            """,
+            (key, key, EVERY_MONTH, key),
+        )
+        rows = [BudgetStatus(*r) for r in cur.fetchall()]
+        rows.sort(key=lambda b: (-b.utilization(), b.category))
+        return rows
+
+    @cached("recurring")
+    def get_recurring_rules(self) -> List[Rule]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT rule_id, start_date, amount FROM recurring_amounts ORDER BY rule_id, start_date")
+        changes: Dict[int, List[Tuple[str, int]]] = {}
+        for r in cur.fetchall():
+            changes.setdefault(r["rule_id"], []).append((r["start_date"], r["amount"]))
+        cur.execute(
+            """
+            SELECT id, start_date, interval_months, day, end_date, amount, category_id, type, description
+            FROM recurring_rules ORDER BY id
+            """
+        )
+        return [Rule(*r, tuple(changes.get(r["id"], ()))) for r in cur.fetchall()]
+
+    def _rule(self, rule_id: int) -> Rule:
+        rule = next((r for r in self.get_recurring_rules() if r.id == rule_id), None)
+        if rule is None:
+            raise ValueError(f"No recurring transaction {rule_id}")
+        return rule
+
+    def add_recurring_rule(
+        self,
+        start_date: str,
+        amount: int,
+        category_id: Optional[int],
+        t_type: str,
+        description: Optional[str],
+        interval_months: int = 1,
+        day: Optional[int] = None,
+        end_date: Optional[str] = None,
+    ) -> int:
+        # Every interval_months months from start_date on `day` (default: the
+        # day of start_date), until end_date if given.
+        if end_date is not None and end_date < start_date:
+            raise ValueError(f"A recurring transaction cannot end ({end_date}) before it starts ({start_date})")
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO recurring_rules (start_date, interval_months, day, end_date, amount, category_id, type, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (start_date, interval_months, day or int(start_date[8:10]), end_date, amount, category_id, t_type, description),
+        )
+        self._touch("recurring")
+        self._commit()
         return cur.lastrowid
 
-    def update_transaction(self, tx_id: int, date: str, amount: float, category_id: Optional[int], t_type: str, description: Optional[str]):
+    def change_recurring_amount(self, rule_id: int, start_date: str, amount: int):
+        # The amount of every occurrence from start_date on.
+        self._rule(rule_id)
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT OR REPLACE INTO recurring_amounts (rule_id, start_date, amount) VALUES (?, ?, ?)",
+            (rule_id, start_date, amount),
+        )
+        self._touch("recurring")
+        self._commit()
+
+    def end_recurring_rule(self, rule_id: int, end_date: Optional[str]):
+        # Last possible occurrence, inclusive; None lets the rule run on.
+        cur = self.conn.cursor()
+        cur.execute("UPDATE recurring_rules SET end_date = ? WHERE id = ?", (end_date, rule_id))
+        if cur.rowcount == 0:
+            raise ValueError(f"No recurring transaction {rule_id}")
+        self._touch("recurring")
+        self._commit()
+
+    def delete_recurring_rule(self, rule_id: int):
+        # Transactions confirmed from the rule stay.
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM recurring_rules WHERE id = ?", (rule_id,))
+        if cur.rowcount == 0:
+            raise ValueError(f"No recurring transaction {rule_id}")
+        self._touch("recurring")
+        self._commit()
+
+    def planned_transactions(self, start: str, end: str, reverse: bool = True) -> Iterator[PlannedTransaction]:
+        # Occurrences in [start, end) that are neither confirmed nor
+        # skipped, newest first unless reverse is False, expanded as the
+        # iterator is consumed. Archived years have none: nothing can be
+        # booked there.
+        rules = self.get_recurring_rules()
+        if not rules:
+            return iter(())
+        cur = self.conn.cursor()
+        cur.execute("SELECT rule_id, date FROM recurring_done WHERE date >= ? AND date < ?", (start, end))
+        done = {(r["rule_id"], r["date"]) for r in cur.fetchall()}
+        categories = {c["id"]: c["name"] for c in self.get_categories()}
+        planned = expand(rules, start, end, done, categories, reverse)
+        archived = self.archived_years()
+        if archived:
+            planned = (p for p in planned if int(p.date[:4]) not in archived)
+        return planned
+
+    @cached("transactions", "categories", "recurring")
+    def get_planned(self, year: int, month: int) -> List[PlannedTransaction]:
+        # The month's planned_transactions, oldest first.
+        return list(self.planned_transactions(*self._month_range(year, month), reverse=False))
+
+    def confirm_occurrence(self, rule_id: int, occurrence: str, edited: Optional[dict] = None) -> int:
+        # Books the occurrence of a rule on date `occurrence` as a
+        # transaction and returns its id. edited overrides the rule's values
+        # (keys as in TransactionDialog.get_data: date, amount, type,
+        # category_id, description).
+        rule = self._rule(rule_id)
+        if not rule.occurs_on(occurrence):
+            raise ValueError(f"Recurring transaction {rule_id} does not occur on {occurrence}")
+        values = {
+            "date": occurrence,
+            "amount": rule.amount_on(occurrence),
+            "category_id": rule.category_id,
+            "type": rule.type,
+            "description": rule.description,
+        }
+        values.update(edited or {})
+        with self.transaction():
+            tx_id = self.add_transaction(
+                values["date"], values["amount"], values["category_id"], values["type"], values["description"]
+            )
+            self._resolve_occurrence(rule_id, occurrence, tx_id)
+        return tx_id
+
+    def skip_occurrence(self, rule_id: int, occurrence: str):
+        if not self._rule(rule_id).occurs_on(occurrence):
+            raise ValueError(f"Recurring transaction {rule_id} does not occur on {occurrence}")
+        self._resolve_occurrence(rule_id, occurrence, None)
+        self._commit()
+
+    def _resolve_occurrence(self, rule_id: int, occurrence: str, tx_id: Optional[int]):
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT OR IGNORE INTO recurring_done (date, rule_id, transaction_id) VALUES (?, ?, ?)",
+            (occurrence, rule_id, tx_id),
+        )
+        if cur.rowcount == 0:
+            raise ValueError(f"The {occurrence} occurrence of recurring transaction {rule_id} is already confirmed or skipped")
+        self._touch("recurring")
+
+    def add_transaction(self, date: str, amount: int, category_id: Optional[int], t_type: str, description: Optional[str]) -> int:
+        self._check_not_archived(date)
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT INTO transactions (date, amount, category_id, type, description, uuid) VALUES (?, ?, ?, ?, ?, ?)",
+            (date, amount, category_id, t_type, description, new_uuid()),
+        )
+        self._touch("transactions")
+        self._commit()
+        return cur.lastrowid
+
+    def import_transactions(self, rows: Iterable[Tuple[str, int, Optional[str], str, Optional[str], int]], batch_size: int = 5000) -> Tuple[int, int, int]:
+        # Bulk insert of (date, amount, category name, type, description,
+        # content_hash) tuples in one transaction. Rows whose content_hash is
+        # already present are skipped, and rows dated in an archived year are
+        # refused. Returns (read, inserted, refused).
+        archived = self.archived_years()
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, name FROM categories")
+        category_ids: Dict[str, int] = {r["name"].casefold(): r["id"] for r in cur.fetchall()}
+        read = 0
+        refused = 0
+        with self.transaction():
+            self._touch("transactions", "categories")
+            # Per-row aggregate, search-index and journal triggers would
+            # dominate the load, so they are switched off for this
+            # transaction and the new rows are folded in with one statement
+            # each at the end.
+            cur.execute("SELECT IFNULL(MAX(id), 0) FROM transactions")
+            last_id = cur.fetchone()[0]
+            cur.execute("SELECT IFNULL(MAX(id), 0) FROM categories")
+            last_category_id = cur.fetchone()[0]
+            cur.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, 1)",
+                [(DEFER_MONTHLY_TOTALS,), (DEFER_SEARCH_INDEX,), (DEFER_CHANGE_LOG,)],
+            )
+            # Rows are staged in an index-free temp table and moved over with
+            # one INSERT ... SELECT: binding and stepping an INSERT per row
+            # through executemany costs about as much as the indexes do.
+            cur.execute(
+                "CREATE TEMP TABLE import_staging (date, amount, category_id, type, description, content_hash, uuid)"
+            )
+            stage = "INSERT INTO temp.import_staging VALUES (?, ?, ?, ?, ?, ?, ?)"
+            batch = []
+            for date, amount, category, t_type, description, content_hash in rows:
+                if archived and int(date[:4]) in archived:
+                    read += 1
+                    refused += 1
+                    continue
+                category_id = 1
+                if category:
+                    key = category.strip().casefold()
+                    category_id = category_ids.get(key)
+                    if category_id is None:
+                        cur.execute(
+                            "INSERT INTO categories (name, uuid) VALUES (?, ?)", (category.strip(), new_uuid())
+                        )
+                        category_id = category_ids[key] = cur.lastrowid
+                batch.append((date, amount, category_id, t_type, description, content_hash, new_uuid()))
+                if len(batch) >= batch_size:
+                    cur.executemany(stage, batch)
+                    read += len(batch)
+                    batch = []
+            cur.executemany(stage, batch)
+            read += len(batch)
+            # Date order keeps the date index inserts mostly sequential.
+            cur.execute(
+                """
+                INSERT OR IGNORE INTO transactions (date, amount, category_id, type, description, content_hash, uuid)
+                SELECT date, amount, category_id, type, description, content_hash, uuid
+                FROM temp.import_staging ORDER BY date
+                """
+            )
+            inserted = cur.rowcount
+            cur.execute("DROP TABLE temp.import_staging")
+            cur.execute(
+                "DELETE FROM settings WHERE key IN (?, ?, ?)", (DEFER_MONTHLY_TOTALS, DEFER_SEARCH_INDEX, DEFER_CHANGE_LOG)
+            )
+            cur.execute(MONTHLY_TOTALS_APPLY_SQL, (last_id,))
+            cur.execute(BALANCE_CHECKPOINTS_APPLY_SQL, (last_id,))
+            cur.execute(SEARCH_INDEX_APPLY_SQL, (last_id,))
+            cur.execute(SYNC_CLOCK_TICK_SQL, (0,))
+            cur.execute(CHANGE_LOG_APPLY_TEMPLATE.format(table="categories", entity="c"), (last_category_id,))
+            cur.execute(CHANGE_LOG_APPLY_TEMPLATE.format(table="transactions", entity="t"), (last_id,))
+        return read, inserted, refused
+
+    def update_transaction(self, tx_id: int, date: str, amount: int, category_id: Optional[int], t_type: str, description: Optional[str]):
+        self._check_not_archived(date)
         cur = self.conn.cursor()
         cur.execute(
             """
@@ -94,75 +564,813 @@ class Database:
             """,
             (date, amount, category_id, t_type, description, tx_id),
         )
-        self.conn.commit()
+        self._check_found(cur.rowcount, tx_id)
+        self._touch("transactions")
+        self._commit()
 
     def delete_transaction(self, tx_id: int):
         cur = self.conn.cursor()
         cur.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
-        self.conn.commit()
+        self._check_found(cur.rowcount, tx_id)
+        self._touch("transactions")
+        self._commit()
 
-    def get_transactions(self, year: Optional[int] = None, month: Optional[int] = None) -> List[sqlite3.Row]:
+    @staticmethod
+    def _month_range(year: int, month: int) -> Tuple[str, str]:
+        start = f"{year:04d}-{month:02d}-01"
+        if month == 12:
+            end = f"{year+1:04d}-01-01"
+        else:
+            end = f"{year:04d}-{month+1:02d}-01"
+        return start, end
+
+    @staticmethod
+    def _tomorrow() -> str:
+        return (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+
+    def get_transaction(self, tx_id: int) -> Optional[sqlite3.Row]:
         cur = self.conn.cursor()
-        if year and month:
-            start = f"{year:04d}-{month:02d}-01"
-            if month == 12:
-                end = f"{year+1:04d}-01-01"
-            else:
-                end = f"{year:04d}-{month+1:02d}-01"
+        sql = """
+            SELECT t.id, t.date, t.amount, t.type, t.description, t.category_id, c.name as category
+            FROM {table} t
+            LEFT JOIN categories c ON t.category_id = c.id
+            WHERE t.id = ?
+        """
+        cur.execute(sql.format(table="transactions"), (tx_id,))
+        row = cur.fetchone()
+        # Archives cannot be attached inside a transaction; writes never
+        # reach archived rows anyway.
+        if row is None and not self.conn.in_transaction:
+            for year in sorted(self.archived_years(), reverse=True):
+                cur.execute(sql.format(table=self._table(year)), (tx_id,))
+                row = cur.fetchone()
+                if row is not None:
+                    break
+        return row
+
+    def _month_part(self, year: int, month: int) -> Tuple[Optional[int], str, str]:
+        # The one segment (see _segments) holding year-month.
+        start, end = self._month_range(year, month)
+        return (year if year in self.archived_years() else None), start, end
+
+    def get_transactions(self, year: Optional[int] = None, month: Optional[int] = None, planned: bool = False) -> list:
+        # With planned, the occurrences of recurring rules that are still
+        # to be confirmed are merged in as PlannedTransaction rows: those of
+        # the month, or over all history those due by today.
+        if planned:
+            start, end = self._month_range(year, month) if year and month else ("", self._tomorrow())
+            rows = self.get_transactions(year, month)
+            return list(merge(rows, self.planned_transactions(start, end)))
+        cur = self.conn.cursor()
+        parts = [self._month_part(year, month)] if year and month else self._segments()
+        rows = []
+        for part, lo, hi in parts:
+            where, params = self._range_sql(lo, hi)
             cur.execute(
-                """
+                f"""
                 SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category
-                FROM transactions t
+                FROM {self._table(part)} t
                 LEFT JOIN categories c ON t.category_id = c.id
-                WHERE date >= ? AND date < ?
+                {"WHERE " + " AND ".join(where) if where else ""}
                 ORDER BY date DESC
                 """,
-                (start, end),
+                params,
             )
+            rows += cur.fetchall()
+        return rows
+
+    def balance_before(self, year: Optional[int] = None, month: Optional[int] = None) -> int:
+        # Income minus expenses of every month before year-month, or of all
+        # months without one. Starts from the nearest stored checkpoint and
+        # adds up monthly_totals from there. Read-only: the writer stores the
+        # openings passed on the way (store_balance_checkpoints).
+        return self.opening_balances(year, month)[0]
+
+    def opening_balances(self, year: Optional[int] = None, month: Optional[int] = None) -> Tuple[int, List[Tuple[str, int]]]:
+        # balance_before, and the (month, opening) pairs of the months it
+        # added up that have no checkpoint yet.
+        key = f"{year:04d}-{month:02d}" if year and month else None
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        if key is None:
+            cur.execute("SELECT month, opening FROM balance_checkpoints ORDER BY month DESC LIMIT 1")
         else:
             cur.execute(
-                """
-                SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category
-                FROM transactions t
+                "SELECT month, opening FROM balance_checkpoints WHERE month <= ? ORDER BY month DESC LIMIT 1", (key,)
+            )
+        row = cur.fetchone()
+        if row is not None and row[0] == key:
+            return row[1], []
+        since, balance = row if row is not None else ("", 0)
+        sql = """
+            SELECT month, SUM(CASE WHEN type = 'Income' THEN total ELSE -total END)
+            FROM monthly_totals
+            WHERE month >= ?
+        """
+        params = [since]
+        if key is not None:
+            sql += " AND month < ?"
+            params.append(key)
+        cur.execute(sql + " GROUP BY month ORDER BY month", params)
+        openings = []
+        for m, net in cur.fetchall():
+            if m != since:
+                openings.append((m, balance))
+            balance += net
+        return balance, openings
+
+    def store_balance_checkpoints(self) -> int:
+        # Stores the opening balance of every month after the last
+        # checkpoint, so later balance_before calls start close to their
+        # month. Run on the writer after writes have dropped checkpoints.
+        _balance, openings = self.opening_balances()
+        if openings:
+            self.conn.executemany("INSERT OR REPLACE INTO balance_checkpoints (month, opening) VALUES (?, ?)", openings)
+            self._touch("balance_checkpoints")
+            self._commit()
+        return len(openings)
+
+    @cached("transactions", "categories")
+    def get_transactions_page(
+        self,
+        year: Optional[int] = None,
+        month: Optional[int] = None,
+        after: Optional[Tuple[str, int, int]] = None,
+        limit: int = 200,
+    ) -> Tuple[List[sqlite3.Row], Optional[Tuple[str, int, int]]]:
+        # Keyset pagination on (date, id) so every page is an index range
+        # scan, however deep into the month the view has scrolled. Rows carry
+        # the running balance after them. The first page is anchored at the
+        # balance at the end of the month; the cursor carries the balance
+        # below its last row, so later pages never look at rows before it.
+        # Over all history the segments are read newest first until the page
+        # is full, carrying the balance across.
+        parts = [self._month_part(year, month)] if year and month else self._segments()
+        if after is not None:
+            anchor = after[2]
+        elif year and month:
+            anchor = self.balance_before(year + 1, 1) if month == 12 else self.balance_before(year, month + 1)
+        else:
+            anchor = self.balance_before()
+        cur = self.conn.cursor()
+        rows: List[sqlite3.Row] = []
+        for part, lo, hi in parts:
+            if after is not None and lo is not None and lo > after[0]:
+                continue  # entirely above the cursor
+            where, params = self._range_sql(lo, hi)
+            if after is not None:
+                # The leading bound keeps deep pages a range scan of the date index.
+                where.append("t.date <= ? AND (t.date < ? OR (t.date = ? AND t.id < ?))")
+                params += [after[0], after[0], after[0], after[1]]
+            sql = f"""
+                SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category,
+                       ? - SUM(CASE WHEN t.type = 'Income' THEN t.amount ELSE -t.amount END)
+                           OVER (ORDER BY t.date DESC, t.id DESC ROWS UNBOUNDED PRECEDING)
+                         + CASE WHEN t.type = 'Income' THEN t.amount ELSE -t.amount END as balance
+                FROM {self._table(part)} t
                 LEFT JOIN categories c ON t.category_id = c.id
-                ORDER BY date DESC
-                """
+            """
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY t.date DESC, t.id DESC LIMIT ?"
+            cur.execute(sql, [anchor] + params + [limit - len(rows)])
+            page = cur.fetchall()
+            rows += page
+            if len(rows) >= limit:
+                break
+            if page:
+                anchor = page[-1]["balance"] - signed_amount(page[-1])
+        if len(rows) < limit:
+            return rows, None
+        last = rows[-1]
+        return rows, (last["date"], last["id"], last["balance"] - signed_amount(last))
+
+    # Up to this many description matches the text filter is driven by the
+    # search index; more than that, walking the sort order and probing the
+    # matches finds a page sooner.
+    FILTER_TEXT_DRIVE_LIMIT = 5000
+
+    def _filter_sql(self, flt: TransactionFilter, sort: str, part: Optional[int] = None) -> Tuple[List[str], list]:
+        where = []
+        params: list = []
+        if flt.start_date is not None:
+            where.append("t.date >= ?")
+            params.append(flt.start_date)
+        if flt.end_date is not None:
+            where.append("t.date <= ?")
+            params.append(flt.end_date)
+        if flt.category_ids is not None:
+            # Without a (category_id, sort key) index, walking the sort order
+            # beats sorting every row of the categories.
+            column = "t.category_id" if sort in CATEGORY_SORTS else "+t.category_id"
+            where.append(f"{column} IN ({', '.join('?' * len(flt.category_ids))})")
+            params += list(flt.category_ids)
+        if flt.t_type is not None:
+            where.append("t.type = ?")
+            params.append(flt.t_type)
+        if flt.min_amount is not None:
+            where.append("t.amount >= ?")
+            params.append(flt.min_amount)
+        if flt.max_amount is not None:
+            where.append("t.amount <= ?")
+            params.append(flt.max_amount)
+        expr = self._match_expression(flt.text) if flt.text else None
+        if expr is not None and part is not None:
+            # Archives have no search index: each word is looked for anywhere
+            # in the description, so it also matches inside longer words.
+            for term in re.findall(r"\w+", flt.text):
+                where.append("t.description LIKE ? ESCAPE '\\'")
+                params.append("%" + term.replace("_", "\\_") + "%")
+        elif expr is not None:
+            cur = self.conn.cursor()
+            cur.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM transactions_fts WHERE transactions_fts MATCH ? LIMIT ?)",
+                (expr, self.FILTER_TEXT_DRIVE_LIMIT + 1),
             )
-        return cur.fetchall()
+            # The unary + keeps the planner from looking rows up by id.
+            column = "t.id" if cur.fetchone()[0] <= self.FILTER_TEXT_DRIVE_LIMIT else "+t.id"
+            where.append(f"{column} IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+            params.append(expr)
+        return where, params
+
+    def _page_sql(
+        self,
+        where: List[str],
+        params: list,
+        keys: Tuple[str, ...],
+        descending: bool,
+        after: Optional[tuple],
+        limit: int,
+        table: str = "transactions",
+    ) -> Tuple[str, list]:
+        where = list(where)
+        params = list(params)
+        op = "<" if descending else ">"
+        if after is not None:
+            if len(keys) == 1:
+                # Expanded rather than a row value: the planner only uses an
+                # expression index (description) for the expanded form. The
+                # leading bound makes it a range even behind other index
+                # columns, e.g. (type, date) with a type filter.
+                where.append(f"{keys[0]} {op}= ? AND ({keys[0]} {op} ? OR ({keys[0]} = ? AND t.id {op} ?))")
+                params += [after[0], after[0], after[0], after[1]]
+            else:
+                where.append(f"({', '.join(keys)}, t.id) {op} ({', '.join('?' * (len(keys) + 1))})")
+                params += list(after)
+        order = "DESC" if descending else "ASC"
+        columns = "".join(f", {k} as sort_key{i}" for i, k in enumerate(keys))
+        sql = f"""
+            SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category{columns}
+            FROM {table} t
+            LEFT JOIN categories c ON t.category_id = c.id
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(f"{k} {order}" for k in keys + ("t.id",)) + " LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    @staticmethod
+    def _page_cursor(rows: List[sqlite3.Row], keys: Tuple[str, ...], limit: int) -> Optional[tuple]:
+        if len(rows) < limit:
+            return None
+        last = rows[-1]
+        return tuple(last[f"sort_key{i}"] for i in range(len(keys))) + (last["id"],)
+
+    def _filter_segments(
+        self, flt: TransactionFilter, descending: bool
+    ) -> List[Tuple[Optional[int], Optional[str], Optional[str]]]:
+        # The segments (see _segments) the filter's dates reach, in the
+        # page's date order.
+        segments = [
+            (part, lo, hi)
+            for part, lo, hi in self._segments()
+            if (flt.start_date is None or hi is None or flt.start_date < hi)
+            and (flt.end_date is None or lo is None or flt.end_date >= lo)
+        ]
+        return segments if descending else segments[::-1]
+
+    @staticmethod
+    def _passed(lo: Optional[str], hi: Optional[str], date: str, descending: bool) -> bool:
+        # Whether a segment lies wholly on the side of date a page has left behind.
+        return (lo is not None and lo > date) if descending else (hi is not None and hi <= date)
 
-    def get_monthly_summary(self, year: int, month: int) -> Tuple[float, float, float]:
+    def _segment_page(
+        self,
+        segment: Tuple[Optional[int], Optional[str], Optional[str]],
+        filters: List[TransactionFilter],
+        sort: str,
+        descending: bool,
+        after: Optional[tuple],
+        limit: int,
+    ) -> List[sqlite3.Row]:
+        # The first `limit` rows of one segment matching any of filters.
+        part, lo, hi = segment
+        table = self._table(part)
+        bounds, bound_params = self._range_sql(lo, hi)
+        keys = SORT_KEYS[sort]
+        parts, params = [], []
+        for flt in filters:
+            where, p = self._filter_sql(flt, sort, part)
+            sql, p = self._page_sql(where + bounds, p + bound_params, keys, descending, after, limit, table)
+            parts.append(sql)
+            params += p
         cur = self.conn.cursor()
-        start = f"{year:04d}-{month:02d}-01"
-        if month == 12:
-            end = f"{year+1:04d}-01-01"
+        if len(parts) == 1:
+            cur.execute(parts[0], params)
         else:
-            end = f"{year:04d}-{month+1:02d}-01"
+            order = "DESC" if descending else "ASC"
+            cur.execute(
+                " UNION ALL ".join(f"SELECT * FROM ({sql})" for sql in parts)
+                + f" ORDER BY sort_key0 {order}, id {order} LIMIT ?",
+                params + [limit],
+            )
+        return cur.fetchall()
+
+    @cached("transactions", "categories")
+    def query_page(
+        self,
+        flt: TransactionFilter,
+        sort: str = "date",
+        descending: bool = True,
+        after: Optional[tuple] = None,
+        limit: int = 200,
+    ) -> Tuple[List[sqlite3.Row], Optional[tuple]]:
+        # Filtered transactions in `sort` order, keyset paged like
+        # get_transactions_page: the cursor is the last row's sort key
+        # values and id, so every page is an index range scan however deep
+        # into all of history the view has scrolled. Archived years are
+        # read segment by segment like there.
+        if sort == "category":
+            return self._query_page_by_category(flt, descending, after, limit)
+        keys = SORT_KEYS[sort]
+        if sort in CATEGORY_SORTS and flt.category_ids is not None and len(flt.category_ids) > 1:
+            # One (category_id, sort key) range scan per category, merged; an
+            # IN list would have to sort every matching row for each page.
+            filters = [flt._replace(category_ids=(category_id,)) for category_id in flt.category_ids]
+        else:
+            filters = [flt]
+        segments = self._filter_segments(flt, descending)
+        rows: List[sqlite3.Row] = []
+        if sort == "date":
+            # Segments hold disjoint date ranges, so they fill the page in turn.
+            for segment in segments:
+                if after is not None and self._passed(segment[1], segment[2], after[0], descending):
+                    continue
+                rows += self._segment_page(segment, filters, sort, descending, after, limit - len(rows))
+                if len(rows) >= limit:
+                    break
+        else:
+            # One at a time: an archive may be detached to attach the next.
+            pages = [self._segment_page(segment, filters, sort, descending, after, limit) for segment in segments]
+            if len(pages) == 1:
+                rows = pages[0]
+            else:
+                key = lambda r: tuple(r[f"sort_key{i}"] for i in range(len(keys))) + (r["id"],)
+                rows = list(itertools.islice(heapq.merge(*pages, key=key, reverse=descending), limit))
+        return rows, self._page_cursor(rows, keys, limit)
+
+    def _query_page_by_category(
+        self, flt: TransactionFilter, descending: bool, after: Optional[tuple], limit: int
+    ) -> Tuple[List[sqlite3.Row], Optional[tuple]]:
+        # Category names are not in the transactions indexes, so the page is
+        # filled one category at a time in name order, each a (category_id,
+        # date) range scan. Uncategorized rows sort as an empty name.
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, name FROM categories ORDER BY name")
+        groups = [(None, "")] + [(r["id"], r["name"]) for r in cur.fetchall()]
+        if flt.category_ids is not None:
+            groups = [g for g in groups if g[0] in flt.category_ids]
+        if descending:
+            groups.reverse()
+        segments = self._filter_segments(flt, descending)
+        base: Dict[Optional[int], Tuple[List[str], list]] = {}
+        rows: List[sqlite3.Row] = []
+        for category_id, name in groups:
+            if after is not None and (name > after[0] if descending else name < after[0]):
+                continue
+            resume = after[1:] if after is not None and name == after[0] else None
+            for part, lo, hi in segments:
+                if resume is not None and self._passed(lo, hi, resume[0], descending):
+                    continue
+                if part not in base:
+                    base[part] = self._filter_sql(flt._replace(category_ids=None), "category", part)
+                where, params = base[part]
+                bounds, bound_params = self._range_sql(lo, hi)
+                where = where + bounds + ["t.category_id IS NULL" if category_id is None else "t.category_id = ?"]
+                p = params + bound_params + ([] if category_id is None else [category_id])
+                table = self._table(part)
+                cur.execute(*self._page_sql(where, p, ("t.date",), descending, resume, limit - len(rows), table))
+                rows += cur.fetchall()
+                if len(rows) >= limit:
+                    break
+            if len(rows) >= limit:
+                break
+        if len(rows) < limit:
+            return rows, None
+        last = rows[-1]
+        return rows, (last["category"] or "", last["date"], last["id"])
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        # Every word must match. The word still being typed (no trailing
+        # space yet) matches as a prefix, which the FTS prefix indexes serve
+        # directly. Terms are quoted so FTS5 syntax in user input is inert.
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return None
+        expr = ['"' + t + '"' for t in terms]
+        if not query[-1].isspace():
+            expr[-1] += "*"
+        return " ".join(expr)
 
+    # Ranking every hit of a one-letter query over years of history costs far
+    # more than the 50 ms as-you-type budget, so only the most recent
+    # SEARCH_CANDIDATES hits are ranked and paged.
+    SEARCH_CANDIDATES = 2000
+
+    @cached("transactions", "categories")
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> Tuple[List[sqlite3.Row], Optional[int]]:
+        # bm25-ranked full-text search over descriptions, newest first among
+        # equally ranked rows. Paged by offset since rank has no stable key.
+        expr = self._match_expression(query)
+        if expr is None:
+            return [], None
+        cur = self.conn.cursor()
         cur.execute(
             """
-            SELECT type, SUM(amount) as total FROM transactions
-            WHERE date >= ? AND date < ?
-            GROUP BY type
+            WITH hits AS (
+                SELECT rowid, rank FROM transactions_fts
+                WHERE transactions_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            )
+            SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category
+            FROM hits
+            JOIN transactions t ON t.id = hits.rowid
+            LEFT JOIN categories c ON t.category_id = c.id
+            ORDER BY hits.rank, t.date DESC, t.id DESC
+            LIMIT ? OFFSET ?
             """,
-            (start, end),
+            (expr, self.SEARCH_CANDIDATES, limit, offset),
         )
-        income = 0.0
-        expense = 0.0
+        rows = cur.fetchall()
+        if len(rows) < limit:
+            return rows, None
+        return rows, offset + limit
+
+    @cached("transactions", "recurring")
+    def get_monthly_summary(self, year: int, month: int, planned: bool = False) -> Tuple[int, int, int]:
+        # With planned, the month's unconfirmed recurring occurrences count
+        # as if they were booked.
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT type, SUM(total) as total FROM monthly_totals WHERE month = ? GROUP BY type",
+            (f"{year:04d}-{month:02d}",),
+        )
+        income = 0
+        expense = 0
         for row in cur.fetchall():
             if row["type"] == "Income":
-                income = row["total"] or 0.0
+                income = row["total"] or 0
             else:
-                expense = row["total"] or 0.0
-        balance = (income or 0.0) - (expense or 0.0)
-        return float(income), float(expense), float(balance)
+                expense = row["total"] or 0
+        if planned:
+            for p in self.planned_transactions(*self._month_range(year, month)):
+                if p.type == "Income":
+                    income += p.amount
+                else:
+                    expense += p.amount
+        return income, expense, income - expense
+
+    def _get_trend(self, period_sql: str, start: str, end: str) -> List[Tuple[str, int, int, int]]:
+        cur = self.conn.cursor()
+        cur.execute(
+            f"""
+            SELECT {period_sql} as period,
+                   SUM(CASE WHEN type = 'Income' THEN total ELSE 0 END) as income,
+                   SUM(CASE WHEN type = 'Expense' THEN total ELSE 0 END) as expense
+            FROM monthly_totals
+            WHERE month >= ? AND month <= ?
+            GROUP BY period
+            ORDER BY period
+            """,
+            (start, end),
+        )
+        return [(r["period"], r["income"], r["expense"], r["income"] - r["expense"]) for r in cur.fetchall()]
+
+    @cached("transactions")
+    def get_monthly_trend(self, start_year: int, start_month: int, end_year: int, end_month: int) -> List[Tuple[str, int, int, int]]:
+        # (YYYY-MM, income, expense, balance) for every month in the inclusive
+        # range; months without transactions are filled with zeros.
+        totals = {
+            r[0]: r
+            for r in self._get_trend("month", f"{start_year:04d}-{start_month:02d}", f"{end_year:04d}-{end_month:02d}")
+        }
+        trend = []
+        year, month = start_year, start_month
+        while (year, month) <= (end_year, end_month):
+            key = f"{year:04d}-{month:02d}"
+            trend.append(totals.get(key, (key, 0, 0, 0)))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return trend
+
+    @cached("transactions")
+    def get_yearly_trend(self, start_year: int, end_year: int) -> List[Tuple[str, int, int, int]]:
+        totals = {r[0]: r for r in self._get_trend("substr(month, 1, 4)", f"{start_year:04d}-01", f"{end_year:04d}-12")}
+        return [totals.get(f"{y:04d}", (f"{y:04d}", 0, 0, 0)) for y in range(start_year, end_year + 1)]
+
+    def _archived_aggregates(self) -> List[tuple]:
+        # MONTHLY_TOTALS_AGGREGATE_SQL over every archive. Run before any
+        # write: archives cannot be attached inside a transaction.
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        rows = []
+        for year in sorted(self.archived_years()):
+            cur.execute(MONTHLY_TOTALS_AGGREGATE_TEMPLATE.format(table=self._table(year)))
+            rows += cur.fetchall()
+        return rows
+
+    def rebuild_monthly_totals(self) -> int:
+        archived = self._archived_aggregates()
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM monthly_totals")
+        cur.execute(MONTHLY_TOTALS_REBUILD_SQL)
+        cur.executemany(
+            "INSERT INTO monthly_totals (month, type, category_id, total, tx_count) VALUES (?, ?, ?, ?, ?)", archived
+        )
+        # Checkpoints were summed from the old totals.
+        cur.execute("DELETE FROM balance_checkpoints")
+        self._touch("transactions")
+        self._commit()
+        cur.execute("SELECT COUNT(*) FROM monthly_totals")
+        return cur.fetchone()[0]
+
+    def verify_monthly_totals(self) -> List[Tuple[str, str, int, Optional[int], Optional[int]]]:
+        # Returns (month, type, category_id, stored_total, actual_total) for
+        # every aggregate that disagrees with the raw transactions, archived
+        # ones included.
+        cur = self.conn.cursor()
+        cur.execute("SELECT month, type, category_id, total, tx_count FROM monthly_totals")
+        stored = {(r[0], r[1], r[2]): (r[3], r[4]) for r in cur.fetchall()}
+        cur.execute(MONTHLY_TOTALS_AGGREGATE_SQL)
+        actual = {(r[0], r[1], r[2]): (r[3], r[4]) for r in cur.fetchall() + self._archived_aggregates()}
+        mismatches = []
+        for key in sorted(set(stored) | set(actual)):
+            s_total, s_count = stored.get(key, (None, None))
+            a_total, a_count = actual.get(key, (None, None))
+            if s_count != a_count or s_total != a_total:
+                mismatches.append((key[0], key[1], key[2], s_total, a_total))
+        return mismatches
+
+    # SQLite attaches at most 10 databases to a connection; one is left
+    # free for archive_year().
+    MAX_ATTACHED_ARCHIVES = 9
+
+    @cached("archives")
+    def get_archives(self) -> List[sqlite3.Row]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT year, path, row_count, archived_at FROM archives ORDER BY year")
+        return cur.fetchall()
+
+    def archived_years(self) -> Set[int]:
+        return {r["year"] for r in self.get_archives()}
+
+    def _archive_dir(self) -> str:
+        return os.path.dirname(os.path.abspath(self.db_path))
+
+    def _check_not_archived(self, date: str):
+        if self.get_archives() and int(date[:4]) in self.archived_years():
+            raise ValueError(f"{date[:4]} is archived; unarchive it to change its transactions")
+
+    def _check_found(self, rowcount: int, tx_id: int):
+        # A row missing from the main file may be an archived one, which a
+        # write must not silently skip. (Looking it up would need an ATTACH,
+        # which the open transaction does not allow.)
+        if rowcount == 0 and self.get_archives():
+            raise ValueError(f"Transaction {tx_id} is not in the main database; if its year is archived, unarchive it first")
+
+    def _attach(self, year: int) -> str:
+        # Schema name of the archived year, attaching its file on first use.
+        # The least recently used archive makes room when all slots are
+        # taken; archives unarchived by another connection are dropped.
+        paths = {r["year"]: r["path"] for r in self.get_archives()}
+        for stale in [y for y in self._attached if y not in paths]:
+            self.conn.execute(f"DETACH DATABASE {self._attached.pop(stale)}")
+        schema = self._attached.get(year)
+        if schema is not None:
+            self._attached.move_to_end(year)
+            return schema
+        if year not in paths:
+            raise ValueError(f"{year} is not archived")
+        # ATTACH would create an empty file in place of a missing one.
+        path = os.path.join(self._archive_dir(), paths[year])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Archive of {year} is missing: {path}")
+        while len(self._attached) >= self.MAX_ATTACHED_ARCHIVES:
+            _year, oldest = self._attached.popitem(last=False)
+            self.conn.execute(f"DETACH DATABASE {oldest}")
+        schema = f"archive_{year}"
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._attached[year] = schema
+        return schema
+
+    def _table(self, year: Optional[int]) -> str:
+        # The transactions table of a segment: the main one for None.
+        return "transactions" if year is None else f"{self._attach(year)}.transactions"
+
+    def _segments(self) -> List[Tuple[Optional[int], Optional[str], Optional[str]]]:
+        # All of history as (archived year, or None for the main table,
+        # first date, end date) ranges, newest first, so a date range only
+        # touches the files that can hold it. Open ends are None; without
+        # archives this is the whole main table.
+        segments: List[Tuple[Optional[int], Optional[str], Optional[str]]] = []
+        upper = None
+        for year in sorted(self.archived_years(), reverse=True):
+            start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+            if upper != end:
+                segments.append((None, end, upper))
+            segments.append((year, start, end))
+            upper = start
+        segments.append((None, None, upper))
+        return segments
+
+    @staticmethod
+    def _range_sql(lo: Optional[str], hi: Optional[str]) -> Tuple[List[str], list]:
+        where, params = [], []
+        if lo is not None:
+            where.append("t.date >= ?")
+            params.append(lo)
+        if hi is not None:
+            where.append("t.date < ?")
+            params.append(hi)
+        return where, params
+
+    def archive_year(self, year: int) -> int:
+        # Moves every transaction of a closed year into archive/<name>-<year>.db
+        # next to the database and registers it; returns the rows moved.
+        # monthly_totals and the balance checkpoints are left as they are, so
+        # summaries and balances stay correct without opening the archive.
+        # The copy is committed to the archive before the rows leave the main
+        # file: an interruption can leave a stray archive file, which the
+        # next attempt overwrites, but never loses rows.
+        if year >= datetime.date.today().year:
+            raise ValueError(f"Only past years can be archived, not {year}")
+        if year in self.archived_years():
+            raise ValueError(f"{year} is already archived")
+        if self._tx_depth:
+            raise RuntimeError("archive_year() cannot run inside transaction()")
+        start, end = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM transactions WHERE date >= ? AND date < ?", (start, end))
+        count = cur.fetchone()[0]
+        if not count:
+            raise ValueError(f"No transactions in {year}")
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        relative = os.path.join("archive", f"{stem}-{year}.db")
+        path = os.path.join(self._archive_dir(), relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        if self.conn.in_transaction:
+            self.conn.commit()
+        schema = f"archive_{year}"
+        cur.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        try:
+            with self.transaction():
+                # Same columns as the main table. Ids stay as they were, so
+                # the rows keep their place in the (date, id) order.
+                cur.execute(
+                    f"""
+                    CREATE TABLE {schema}.transactions (
+                        id INTEGER PRIMARY KEY,
+                        date TEXT NOT NULL,
+                        amount INTEGER NOT NULL,
+                        category_id INTEGER,
+                        type TEXT NOT NULL,
+                        description TEXT,
+                        content_hash INTEGER,
+                        uuid BLOB
+                    )
+                    """
+                )
+                cur.execute(f"CREATE INDEX {schema}.idx_transactions_date ON transactions(date)")
+                cur.execute(
+                    f"""
+                    INSERT INTO {schema}.transactions
+                    SELECT id, date, amount, category_id, type, description, content_hash, uuid
+                    FROM main.transactions WHERE date >= ? AND date < ? ORDER BY id
+                    """,
+                    (start, end),
+                )
+                moved = cur.rowcount
+            with self.transaction():
+                self._touch("transactions", "archives")
+                # Moving rows is not a change to sync: the journal keeps
+                # their entries and records no deletes.
+                cur.executemany(
+                    "INSERT INTO settings (key, value) VALUES (?, 1)", [(DEFER_MONTHLY_TOTALS,), (DEFER_CHANGE_LOG,)]
+                )
+                cur.execute("DELETE FROM main.transactions WHERE date >= ? AND date < ?", (start, end))
+                if cur.rowcount != moved:
+                    raise RuntimeError(f"Transactions of {year} changed while archiving; nothing was moved")
+                cur.execute("DELETE FROM settings WHERE key IN (?, ?)", (DEFER_MONTHLY_TOTALS, DEFER_CHANGE_LOG))
+                cur.execute("INSERT INTO archives (year, path, row_count) VALUES (?, ?, ?)", (year, relative, moved))
+        finally:
+            cur.execute(f"DETACH DATABASE {schema}")
+        return moved
+
+    def unarchive_year(self, year: int) -> int:
+        # Moves an archived year back into the main file and deletes the
+        # archive; returns the rows restored.
+        if self._tx_depth:
+            raise RuntimeError("unarchive_year() cannot run inside transaction()")
+        if self.conn.in_transaction:
+            self.conn.commit()
+        paths = {r["year"]: r["path"] for r in self.get_archives()}
+        schema = self._attach(year)
+        path = os.path.join(self._archive_dir(), paths[year])
+        cur = self.conn.cursor()
+        # Archives written before schema version 11 have no uuids.
+        cur.execute(f"PRAGMA {schema}.table_info(transactions)")
+        has_uuid = any(r["name"] == "uuid" for r in cur.fetchall())
+        with self.transaction():
+            self._touch("transactions", "archives")
+            # The year is still in monthly_totals and the checkpoints, and its
+            # rows in the change journal.
+            cur.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, 1)",
+                [(DEFER_MONTHLY_TOTALS,), (DEFER_SEARCH_INDEX,), (DEFER_CHANGE_LOG,)],
+            )
+            cur.execute(
+                f"""
+                INSERT INTO transactions (id, date, amount, category_id, type, description, content_hash, uuid)
+                SELECT id, date, amount, category_id, type, description, content_hash,
+                       {"IFNULL(uuid, " + NEW_UUID_SQL + ")" if has_uuid else NEW_UUID_SQL}
+                FROM {schema}.transactions
+                """
+            )
+            restored = cur.rowcount
+            cur.execute(
+                f"INSERT INTO transactions_fts (rowid, description) SELECT id, description FROM {schema}.transactions"
+            )
+            cur.execute(
+                "DELETE FROM settings WHERE key IN (?, ?, ?)", (DEFER_MONTHLY_TOTALS, DEFER_SEARCH_INDEX, DEFER_CHANGE_LOG)
+            )
+            cur.execute("DELETE FROM archives WHERE year = ?", (year,))
+        self.conn.execute(f"DETACH DATABASE {self._attached.pop(year)}")
+        os.remove(path)
+        return restored
+
+    def vacuum(self):
+        # Gives the space freed by archive_year() back to the file system.
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.conn.execute("VACUUM")
+
+    def count_transactions(self) -> int:
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM transactions")
+        return cur.fetchone()[0] + sum(r["row_count"] for r in self.get_archives())
+
+    def iter_transactions(self, chunk_size: int = 5000) -> Iterator[List[sqlite3.Row]]:
+        # Streams the whole ledger, archives included, in fixed-size chunks
+        # straight off the cursor, so callers never hold more than one chunk
+        # in memory.
+        cur = self.conn.cursor()
+        try:
+            for part, lo, hi in self._segments():
+                where, params = self._range_sql(lo, hi)
+                cur.execute(
+                    f"""
+                    SELECT t.id, t.date, t.amount, t.type, t.description, c.id as category_id, c.name as category
+                    FROM {self._table(part)} t
+                    LEFT JOIN categories c ON t.category_id = c.id
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    ORDER BY t.date DESC, t.id DESC
+                    """,
+                    params,
+                )
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            # An open statement would keep its archive from being detached.
+            cur.close()
+
+    def transaction_tables(self) -> Iterator[str]:
+        # Every table holding transactions: the main one, then each archive.
+        # Archives are attached as the iteration reaches them.
+        yield "transactions"
+        for year in sorted(self.archived_years(), reverse=True):
+            yield self._table(year)
 
     def export_csv(self, csv_path: str) -> None:
-        rows = self.get_transactions()
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["id", "date", "amount", "type", "category", "description"])
-            for r in rows:
-                writer.writerow([r["id"], r["date"], r["amount"], r["type"], r["category"], r["description"]])
+        from .exporters import export_transactions
+
+        export_transactions(self, csv_path, "csv")
 
     def close(self):
         self.conn.close()
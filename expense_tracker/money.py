@@ -0,0 +1,45 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Union
+
+# Amounts are stored and passed around as integers in minor units: one unit
+# of the currency is 10 ** EXPONENT minor units (cents for EXPONENT = 2).
+# The exponent a database was written with is recorded in its settings
+# table (see migrations._v7_integer_amounts).
+EXPONENT = 2
+SCALE = 10 ** EXPONENT
+
+Amount = Union[int, float, str, Decimal]
+
+
+def parse(value: Amount) -> Decimal:
+    # Exact for int, str and Decimal. Floats go through their shortest repr,
+    # so 19.99 is Decimal("19.99") rather than the binary approximation.
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    try:
+        return Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}") from None
+
+
+def to_minor(value: Amount) -> int:
+    # Rounds half away from zero to a whole number of minor units.
+    d = parse(value)
+    if not d.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    return int(d.scaleb(EXPONENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(minor: int) -> Decimal:
+    return Decimal(minor).scaleb(-EXPONENT)
+
+
+def format_minor(minor: int) -> str:
+    # "1234.50" for 123450, without going through Decimal; the table calls
+    # this for every visible cell.
+    if EXPONENT == 0:
+        return str(minor)
+    units, fraction = divmod(abs(minor), SCALE)
+    return f"{'-' if minor < 0 else ''}{units}.{fraction:0{EXPONENT}d}"
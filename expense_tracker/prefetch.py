@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from .executor import DatabaseExecutor
+from .models import Database
+
+Month = Tuple[int, int]
+
+# Tables a warm month was read from (see _load and cache.cached).
+_DEPS = tuple(dict.fromkeys(Database.get_transactions_page.tables + Database.get_monthly_summary.tables))
+
+
+def adjacent_months(year: int, month: int, radius: int = 1):
+    # Nearest first, alternating previous and next: N-1, N+1, N-2, N+2, ...
+    index = year * 12 + month - 1
+    for step in range(1, radius + 1):
+        for i in (index - step, index + step):
+            y, m = divmod(i, 12)
+            yield y, m + 1
+
+
+class MonthPrefetcher:
+    # Speculatively loads the first table page and the summary of the months
+    # around the one on screen, so stepping to them can render without a
+    # round trip to a reader thread. Warm months carry the write generation
+    # they were read at and are ignored once a commit has touched their
+    # tables. At most `keep` months are held, least recently used first out.
+    def __init__(self, executor: DatabaseExecutor, page_size: int, keep: int = 6, radius: int = 1):
+        self.executor = executor
+        self.page_size = page_size
+        self.keep = keep
+        self.radius = radius
+        # Reentrant: cancel() and add_done_callback() on a finished future
+        # run _store synchronously while the lock is held.
+        self._lock = threading.RLock()
+        self._warm: "OrderedDict[Month, tuple]" = OrderedDict()
+        self._pending: Dict[Month, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, db, year: int, month: int):
+        # Same arguments as Controller.refresh_table and refresh_summary use,
+        # so this also warms the shared query cache for those calls.
+        page = db.get_transactions_page(year=year, month=month, after=None, limit=self.page_size)
+        return page, db.get_monthly_summary(year, month)
+
+    def take(self, year: int, month: int) -> Optional[tuple]:
+        # ((rows, next_cursor), summary) if the month is warm and still current.
+        key = (year, month)
+        generations = self.executor.cache.generations(_DEPS)
+        with self._lock:
+            entry = self._warm.get(key)
+            if entry is not None and entry[0] == generations:
+                self._warm.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._warm.pop(key, None)
+            self.misses += 1
+            return None
+
+    def prefetch_around(self, year: int, month: int):
+        # The month on screen is included so stepping back to it is warm too;
+        # its load is normally a query-cache hit.
+        targets = [(year, month)] + list(adjacent_months(year, month, self.radius))
+        generations = self.executor.cache.generations(_DEPS)
+        with self._lock:
+            # Queued loads for months the user has scrubbed past would only
+            # delay the ones that matter now.
+            for key, future in list(self._pending.items()):
+                if key not in targets and future.cancel():
+                    self._pending.pop(key, None)
+            for key in targets:
+                entry = self._warm.get(key)
+                if key in self._pending or (entry is not None and entry[0] == generations):
+                    continue
+                future = self.executor.read(lambda db, y=key[0], m=key[1]: self._load(db, y, m))
+                self._pending[key] = future
+                future.add_done_callback(lambda f, key=key: self._store(key, generations, f))
+
+    def _store(self, key: Month, generations: tuple, future: Future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._warm[key] = (generations, future.result())
+            self._warm.move_to_end(key)
+            while len(self._warm) > self.keep:
+                self._warm.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            for future in list(self._pending.values()):
+                future.cancel()
+            self._pending.clear()
+            self._warm.clear()
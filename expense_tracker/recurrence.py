@@ -0,0 +1,108 @@
+import bisect
+import calendar
+import heapq
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+# Recurring transactions are stored as rules (see
+# migrations._v12_recurring) and only turned into rows for the dates a read
+# asks about. A rule's occurrences are numbered from its start month, so
+# the first one in a range is computed directly rather than stepped to
+# from the start: the cost of a month's planned rows does not grow with the
+# rule's age.
+
+
+def _month_index(iso: str) -> int:
+    return int(iso[:4]) * 12 + int(iso[5:7]) - 1
+
+
+class Rule(
+    namedtuple(
+        "Rule",
+        [
+            "id", "start_date", "interval_months", "day", "end_date",
+            "amount", "category_id", "type", "description", "changes",
+        ],
+    )
+):
+    # changes: ((start_date, amount), ...) in date order, each replacing
+    # amount from its date on.
+    def date_of(self, n: int) -> str:
+        # The n-th occurrence counting from the start month, whether or not
+        # it falls inside start_date..end_date.
+        year, month = divmod(_month_index(self.start_date) + n * self.interval_months, 12)
+        day = min(self.day, calendar.monthrange(year, month + 1)[1])
+        return f"{year:04d}-{month + 1:02d}-{day:02d}"
+
+    def occurrences(self, start: str, end: str, reverse: bool = False) -> Iterator[str]:
+        # Dates of the occurrences in [start, end), oldest first or, with
+        # reverse, newest first.
+        if self.end_date is not None and self.end_date < end:
+            end = max(start, self.end_date + "\x7f")  # end_date is inclusive
+        first = max(start, self.start_date)
+        if first >= end:
+            return
+        origin = _month_index(self.start_date)
+        lo = -(-(_month_index(first) - origin) // self.interval_months)
+        hi = (_month_index(end) - origin) // self.interval_months
+        for n in range(hi, lo - 1, -1) if reverse else range(lo, hi + 1):
+            d = self.date_of(n)
+            if first <= d < end:
+                yield d
+
+    def occurs_on(self, iso: str) -> bool:
+        return next(self.occurrences(iso, iso + "\x7f"), None) == iso
+
+    def amount_on(self, iso: str) -> int:
+        i = bisect.bisect_right(self.changes, (iso, float("inf")))
+        return self.changes[i - 1][1] if i else self.amount
+
+    def next_from(self, iso: str) -> Optional[str]:
+        # The first occurrence on or after iso, or None once the rule has ended.
+        return next(self.occurrences(iso, "9999-12-32"), None)
+
+
+class PlannedTransaction(
+    namedtuple(
+        "PlannedTransaction", ["id", "date", "amount", "type", "description", "category_id", "category", "rule_id"]
+    )
+):
+    # One occurrence of a rule that has not been confirmed or skipped. Shaped
+    # like the sqlite3.Row transactions are read as, so the two can be
+    # listed together: id is None, and fields can be looked up by name.
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    def keys(self):
+        return list(self._fields)
+
+
+def expand(
+    rules: Iterable[Rule],
+    start: str,
+    end: str,
+    done: Set[Tuple[int, str]],
+    categories: Dict[int, str],
+    reverse: bool = True,
+) -> Iterator[PlannedTransaction]:
+    # The planned transactions of every rule in [start, end), newest first
+    # unless reverse is False, leaving out (rule id, date) pairs in done.
+    # Each rule is expanded lazily and the rules are merged by date, so
+    # taking the first few rows expands only as much as they need.
+    def planned(rule: Rule) -> Iterator[PlannedTransaction]:
+        for d in rule.occurrences(start, end, reverse):
+            if (rule.id, d) not in done:
+                yield PlannedTransaction(
+                    None, d, rule.amount_on(d), rule.type, rule.description,
+                    rule.category_id, categories.get(rule.category_id), rule.id,
+                )
+
+    return heapq.merge(*(planned(r) for r in rules), key=lambda p: p.date, reverse=reverse)
+
+
+def merge(rows: Iterable, planned: Iterable[PlannedTransaction], reverse: bool = True) -> Iterator:
+    # Transactions and planned ones in one date order, both already sorted
+    # in it. On the same date real rows come first.
+    return heapq.merge(rows, planned, key=lambda r: r["date"], reverse=reverse)
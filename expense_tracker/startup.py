@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Imported by main before Qt, so it must stay free of Qt and of the rest of
+# the app at import time.
+
+FLAG = "--profile-startup"
+# With --profile-startup, quit once the first month is on screen (for
+# benchmarks.bench_gui_startup).
+QUIT_FLAG = "--quit-after-startup"
+
+# Milestones that complete a start, all reached on the GUI thread.
+DONE = ("first paint", "first page", "summary")
+
+
+def process_age() -> Optional[float]:
+    # Seconds since this process was created, or None where that is not
+    # available. Covers interpreter start-up and, in the packaged app, the
+    # PyInstaller bootloader; resolution is one clock tick (10 ms).
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after ')'.
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - started / os.sysconf("SC_CLK_TCK")
+
+
+class StartupProfile:
+    # Times of the milestones of one app start, in seconds after `started`
+    # (a perf_counter() value taken before Qt was imported). Only the first
+    # occurrence of each milestone counts.
+    def __init__(self, started: float, on_done: Optional[Callable[["StartupProfile"], None]] = None):
+        self.started = started
+        self.before = process_age()
+        if self.before is not None:
+            self.before -= time.perf_counter() - started
+        self.marks: List[Tuple[str, float]] = []
+        self.on_done = on_done
+        self._filter = None
+
+    def mark(self, name: str):
+        if any(n == name for n, _t in self.marks):
+            return
+        self.marks.append((name, time.perf_counter() - self.started))
+        if self.on_done is not None and all(any(n == d for n, _t in self.marks) for d in DONE):
+            on_done, self.on_done = self.on_done, None
+            on_done(self)
+
+    def elapsed(self, name: str) -> Optional[float]:
+        return next((t for n, t in self.marks if n == name), None)
+
+    def watch_paint(self, widget):
+        # Marks "first paint" on the first paint event of widget.
+        from PySide6 import QtCore
+
+        profile = self
+
+        class PaintFilter(QtCore.QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QtCore.QEvent.Type.Paint:
+                    profile.mark("first paint")
+                    obj.removeEventFilter(self)
+                return False
+
+        self._filter = PaintFilter(widget)
+        widget.installEventFilter(self._filter)
+
+    def report(self) -> str:
+        lines = ["Startup profile (ms since Finly's code started running):"]
+        if self.before is not None:
+            lines.append(f"  {'before (interpreter, bootloader)':34} {self.before * 1000:8.1f}")
+        for name, t in sorted(self.marks, key=lambda m: m[1]):
+            lines.append(f"  {name:34} {t * 1000:8.1f}")
+        paint, data = self.elapsed("first paint"), max(self.elapsed(n) or 0.0 for n in DONE[1:])
+        if paint is not None:
+            lines.append(f"time to first paint: {paint * 1000:.1f} ms, time to data: {data * 1000:.1f} ms")
+        return "\n".join(lines)
+
+    def print_report(self):
+        print(self.report(), file=sys.stderr, flush=True)
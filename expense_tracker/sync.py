@@ -0,0 +1,445 @@
+import gzip
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from . import money
+from .migrations import DEFER_CHANGE_LOG, SYNC_CLOCK_TICK_SQL, THIS_DEVICE
+from .models import Database
+
+# Merging two ledgers through files. Each database journals its own changes
+# (see migrations._v11_change_journal); a sync file carries the rows changed
+# since the other side last reported in, and applying it keeps, per row,
+# whichever change has the higher (stamp, device id). Both sides therefore
+# end up with the same rows whichever order files are applied in.
+#
+# A file is gzipped JSON lines: a header, then one record per changed
+# category, then per changed transaction. Amounts are integer minor units.
+
+FORMAT = 1
+
+ExportResult = namedtuple("ExportResult", ["path", "peer", "since", "seq", "changes", "size", "seconds"])
+
+# applied: records written here; superseded: records this database already
+# had or has a later change for; skipped: records that could not be applied
+# (their year is archived here, an imported duplicate, a category still in
+# use or a name already taken).
+ApplyResult = namedtuple("ApplyResult", ["device", "changes", "applied", "superseded", "skipped", "seconds"])
+
+PeerInfo = namedtuple("PeerInfo", ["device", "received", "acked", "pending"])
+
+
+class SyncError(Exception):
+    pass
+
+
+def device_id(db: Database) -> str:
+    return db.conn.execute("SELECT device FROM sync_devices WHERE id = ?", (THIS_DEVICE,)).fetchone()[0]
+
+
+def new_device_id(db: Database) -> str:
+    # For a database that was copied from another one after schema version
+    # 11: both would otherwise sync under the same identity. The journal
+    # entries made before the copy stay with the original device.
+    device = uuid.uuid4().hex
+    original = device_id(db)
+    cur = db.conn.cursor()
+    with db.transaction():
+        cur.execute("UPDATE sync_devices SET device = ? WHERE id = ?", (device, THIS_DEVICE))
+        cur.execute("INSERT INTO sync_devices (device) VALUES (?)", (original,))
+        cur.execute("UPDATE change_log SET origin = ? WHERE origin = ?", (cur.lastrowid, THIS_DEVICE))
+    return device
+
+
+def peers(db: Database) -> List[PeerInfo]:
+    # Devices this database has applied a file from, with the number of
+    # local changes they have not acknowledged yet.
+    rows = db.conn.execute(
+        """
+        SELECT d.device, d.received, d.acked,
+               (SELECT COUNT(*) FROM change_log l WHERE l.seq > IFNULL(d.acked, 0) AND l.origin != d.id) AS pending
+        FROM sync_devices d
+        WHERE d.id != ? AND d.received IS NOT NULL
+        ORDER BY d.device
+        """,
+        (THIS_DEVICE,),
+    ).fetchall()
+    return [PeerInfo(r["device"], r["received"], r["acked"], r["pending"]) for r in rows]
+
+
+def _find_peer(db: Database, peer: Optional[str]) -> Optional[sqlite3.Row]:
+    rows = db.conn.execute(
+        "SELECT id, device, received, acked FROM sync_devices WHERE id != ? AND received IS NOT NULL",
+        (THIS_DEVICE,),
+    ).fetchall()
+    if peer is not None:
+        rows = [r for r in rows if r["device"].startswith(peer.lower())]
+        if not rows:
+            raise SyncError(f"No device {peer} has synced with this database; export everything with --full")
+    if len(rows) > 1:
+        raise SyncError("Several devices sync with this database; choose one of " + ", ".join(r["device"] for r in rows))
+    return rows[0] if rows else None
+
+
+_TRANSACTION_COLUMNS = """
+    t.date, t.amount, t.type, t.description, t.content_hash, c.uuid AS category_uuid, c.name AS category
+"""
+
+
+def _queries(full: bool) -> List[Tuple[str, str]]:
+    # (entity code, SQL) pairs producing the records of a file, categories first
+    # so transactions can refer to them. Named parameters: me (this
+    # device), since and peer (its sync_devices.id).
+    if full:
+        # Every current row, journaled or not (rows from before the journal
+        # have no entry and go out at stamp 0), and every tombstone.
+        upserts = """
+            SELECT {key}.uuid, 0 AS deleted, IFNULL(l.stamp, 0) AS stamp, IFNULL(d.device, :me) AS device, {columns}
+            FROM {table} {key} {joins}
+            LEFT JOIN change_log l ON l.uuid = {key}.uuid
+            LEFT JOIN sync_devices d ON d.id = l.origin
+        """
+        deletes = """
+            SELECT l.uuid, 1, l.stamp, d.device, {nulls}
+            FROM change_log l JOIN sync_devices d ON d.id = l.origin
+            WHERE l.entity = '{entity}' AND l.deleted
+        """
+        template = upserts + " UNION ALL " + deletes
+    else:
+        # The journal since the peer's acknowledgement, less what came from
+        # the peer itself. Entries whose row is no longer in the main file
+        # (an archived year) are left out.
+        template = """
+            SELECT l.uuid, l.deleted, l.stamp, d.device, {columns}
+            FROM change_log l
+            JOIN sync_devices d ON d.id = l.origin
+            LEFT JOIN {table} {key} ON {key}.uuid = l.uuid {joins}
+            WHERE l.entity = '{entity}' AND l.seq > :since AND l.origin != :peer
+              AND (l.deleted OR {key}.id IS NOT NULL)
+            ORDER BY l.seq
+        """
+    return [
+        ("c", template.format(entity="c", table="categories", key="c", joins="", columns="c.name", nulls="NULL")),
+        (
+            "t",
+            template.format(
+                entity="t",
+                table="transactions",
+                key="t",
+                joins="LEFT JOIN categories c ON c.id = t.category_id",
+                columns=_TRANSACTION_COLUMNS,
+                nulls=", ".join(["NULL"] * 7),
+            ),
+        ),
+    ]
+
+
+def _record(entity: str, row: sqlite3.Row) -> dict:
+    rec = {"k": entity, "u": row[0].hex(), "s": row["stamp"], "o": row["device"]}
+    if row["deleted"]:
+        rec["d"] = 1
+    elif entity == "c":
+        rec["name"] = row[4]
+    else:
+        rec.update(
+            date=row[4],
+            amount=row[5],
+            type=row[6],
+            description=row[7],
+            hash=row[8],
+            cu=row[9].hex() if row[9] is not None else None,
+            category=row[10],
+        )
+    return rec
+
+
+def export_changes(db: Database, path: str, peer: Optional[str] = None, full: bool = False) -> ExportResult:
+    # Writes the changes the peer (a device id or a prefix of one; by
+    # default the only device this database syncs with) has not
+    # acknowledged yet. Without a peer, or with full, the file holds the
+    # whole ledger, which is what the first sync between two databases
+    # needs. Archived years are not synced.
+    t0 = time.perf_counter()
+    target = _find_peer(db, peer)
+    # Until the peer has acknowledged a file, it may lack rows from before
+    # the journal, which only a full export carries.
+    full = full or target is None or target["acked"] is None
+    since = 0 if full else target["acked"]
+    me = device_id(db)
+    part = path + ".part"
+    changes = 0
+    cur = db.conn.cursor()
+    try:
+        # One read transaction, so the header's seq matches the records.
+        with db.transaction(), gzip.open(part, "wt", encoding="utf-8") as f:
+            cur.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log")
+            seq = cur.fetchone()[0]
+            cur.execute("SELECT device, received FROM sync_devices WHERE id != ? AND received IS NOT NULL", (THIS_DEVICE,))
+            acks = {r["device"]: r["received"] for r in cur.fetchall()}
+            header = {
+                "finly_sync": FORMAT,
+                "device": me,
+                "since": since,
+                "seq": seq,
+                "full": full,
+                "exponent": money.EXPONENT,
+                "acks": acks,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+            f.write(encode(header) + "\n")
+            params = {"me": me, "since": since, "peer": target["id"] if target is not None else -1}
+            for entity, sql in _queries(full):
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(5000)
+                    if not rows:
+                        break
+                    f.writelines(encode(_record(entity, r)) + "\n" for r in rows)
+                    changes += len(rows)
+        os.replace(part, path)
+    finally:
+        cur.close()
+        if os.path.exists(part):
+            os.remove(part)
+    return ExportResult(
+        path,
+        target["device"] if target is not None else None,
+        since,
+        seq,
+        changes,
+        os.path.getsize(path),
+        time.perf_counter() - t0,
+    )
+
+
+def _header(path: str, f) -> dict:
+    try:
+        header = json.loads(f.readline() or "null")
+    except (OSError, EOFError, ValueError) as e:
+        raise SyncError(f"{path}: not a Finly sync file ({e})") from None
+    if not isinstance(header, dict) or "finly_sync" not in header:
+        raise SyncError(f"{path}: not a Finly sync file")
+    if header["finly_sync"] > FORMAT:
+        raise SyncError(f"{path}: written by a newer version of Finly (format {header['finly_sync']})")
+    return header
+
+
+class _Applier:
+    # Applies the records of one file inside the caller's transaction.
+    def __init__(self, db: Database, devices: Dict[str, int]):
+        self.db = db
+        self.cur = db.conn.cursor()
+        self.devices = devices
+        self.archived = db.archived_years()
+        self.cur.execute("SELECT id, name, uuid FROM categories")
+        rows = self.cur.fetchall()
+        self.category_ids: Dict[bytes, int] = {r["uuid"]: r["id"] for r in rows}
+        self.category_names: Dict[str, int] = {r["name"].casefold(): r["id"] for r in rows}
+        self.applied = self.superseded = self.skipped = 0
+        self.stamp = 0
+
+    def _device(self, device: str) -> int:
+        origin = self.devices.get(device)
+        if origin is None:
+            self.cur.execute("INSERT INTO sync_devices (device) VALUES (?)", (device,))
+            origin = self.devices[device] = self.cur.lastrowid
+        return origin
+
+    def _newer(self, rec: dict) -> Tuple[bool, Optional[sqlite3.Row]]:
+        # Last writer wins: the higher stamp, then the higher device id. A
+        # row this database has no journal entry for predates the journal
+        # and loses to any change.
+        self.cur.execute(
+            """
+            SELECT l.deleted, l.stamp, d.device FROM change_log l JOIN sync_devices d ON d.id = l.origin
+            WHERE l.uuid = ?
+            """,
+            (rec["u"],),
+        )
+        local = self.cur.fetchone()
+        return local is None or (rec["s"], rec["o"]) > (local["stamp"], local["device"]), local
+
+    def _journal(self, entity: str, rec: dict):
+        # A row from before the other side's journal (stamp 0) stays
+        # unjournaled here too; full exports still carry it.
+        if rec["s"]:
+            self.cur.execute(
+                "INSERT OR REPLACE INTO change_log (uuid, entity, deleted, stamp, origin) VALUES (?, ?, ?, ?, ?)",
+                (rec["u"], entity, rec.get("d", 0), rec["s"], self._device(rec["o"])),
+            )
+        self.stamp = max(self.stamp, rec["s"])
+        self.applied += 1
+
+    def _category_id(self, rec: dict) -> Optional[int]:
+        if rec.get("category") is None:
+            return None
+        category_id = self.category_ids.get(rec["cu"]) or self.category_names.get(rec["category"].casefold())
+        if category_id is None:
+            self.cur.execute("INSERT INTO categories (name, uuid) VALUES (?, ?)", (rec["category"], rec["cu"]))
+            category_id = self.category_ids[rec["cu"]] = self.category_names[rec["category"].casefold()] = self.cur.lastrowid
+        return category_id
+
+    def category(self, rec: dict):
+        newer, _local = self._newer(rec)
+        if not newer:
+            self.superseded += 1
+            return
+        category_id = self.category_ids.get(rec["u"])
+        if rec.get("d"):
+            if category_id is not None:
+                if category_id == 1 or self.db.category_in_use(category_id):
+                    self.skipped += 1
+                    return
+                self.cur.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+                del self.category_ids[rec["u"]]
+                self.category_names = {k: v for k, v in self.category_names.items() if v != category_id}
+            self._journal("c", rec)
+            return
+        key = rec["name"].casefold()
+        same_name = self.category_names.get(key)
+        if category_id is None and same_name is not None:
+            # Created on both sides under the same name: one category, and
+            # both end up with the smaller uuid of the two.
+            self.cur.execute("SELECT uuid FROM categories WHERE id = ?", (same_name,))
+            current = self.cur.fetchone()[0]
+            self.category_ids[rec["u"]] = same_name
+            if rec["u"] < current:
+                self.cur.execute("UPDATE categories SET uuid = ? WHERE id = ?", (rec["u"], same_name))
+                self._journal("c", rec)
+            else:
+                self.superseded += 1
+            return
+        if category_id is None:
+            self.cur.execute("INSERT INTO categories (name, uuid) VALUES (?, ?)", (rec["name"], rec["u"]))
+            self.category_ids[rec["u"]] = self.category_names[key] = self.cur.lastrowid
+        elif same_name is not None and same_name != category_id:
+            # Renamed to a name another category has here.
+            self.skipped += 1
+            return
+        else:
+            if not rec["s"] and same_name == category_id:
+                self.cur.execute("SELECT name FROM categories WHERE id = ?", (category_id,))
+                if self.cur.fetchone()[0] == rec["name"]:
+                    # Unjournaled on the other side and already the same here.
+                    self.superseded += 1
+                    return
+            self.cur.execute("UPDATE categories SET name = ? WHERE id = ?", (rec["name"], category_id))
+            self.category_names = {k: v for k, v in self.category_names.items() if v != category_id}
+            self.category_names[key] = category_id
+        self._journal("c", rec)
+
+    def transaction(self, rec: dict):
+        newer, local = self._newer(rec)
+        if not newer:
+            self.superseded += 1
+            return
+        if rec.get("d"):
+            self.cur.execute("DELETE FROM transactions WHERE uuid = ?", (rec["u"],))
+            self._journal("t", rec)
+            return
+        if self.archived and int(rec["date"][:4]) in self.archived:
+            self.skipped += 1
+            return
+        values = (rec["date"], rec["amount"], self._category_id(rec), rec["type"], rec["description"])
+        self.cur.execute(
+            "SELECT id, date, amount, category_id, type, description FROM transactions WHERE uuid = ?", (rec["u"],)
+        )
+        row = self.cur.fetchone()
+        if row is not None:
+            # Unchanged rows (a full file, mostly) are left alone rather than
+            # rewritten through the totals and search index triggers.
+            if tuple(row)[1:] == values and not rec["s"]:
+                # Nothing to write or to journal.
+                self.superseded += 1
+                return
+            if tuple(row)[1:] != values:
+                self.cur.execute(
+                    "UPDATE transactions SET date = ?, amount = ?, category_id = ?, type = ?, description = ? WHERE id = ?",
+                    values + (row["id"],),
+                )
+        else:
+            if local is not None and not local["deleted"]:
+                # Journaled here but not in the main file: its year is archived.
+                self.skipped += 1
+                return
+            self.cur.execute(
+                """
+                INSERT OR IGNORE INTO transactions (date, amount, category_id, type, description, content_hash, uuid)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                values + (rec["hash"], rec["u"]),
+            )
+            if not self.cur.rowcount:
+                # The same statement line was imported on both sides.
+                self.skipped += 1
+                return
+        self._journal("t", rec)
+
+
+def apply_changes(db: Database, path: str) -> ApplyResult:
+    # Applies a file written by export_changes on another database, all or
+    # nothing. Files can be applied more than once and in any order; a
+    # delta that starts after what this database has received from its
+    # device is refused, since the changes in between would be missing.
+    t0 = time.perf_counter()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = _header(path, f)
+        me = device_id(db)
+        if header["device"] == me:
+            raise SyncError(
+                f"{path} was exported from this database, or from a copy of it; "
+                "give a copied database its own identity with `finly sync-status --new-device`"
+            )
+        if header["exponent"] != money.EXPONENT:
+            raise SyncError(f"{path} has amounts with {header['exponent']} decimals, this database {money.EXPONENT}")
+        if db.in_unit_of_work:
+            raise RuntimeError("apply_changes() cannot run inside transaction()")
+        cur = db.conn.cursor()
+        with db.transaction():
+            db._touch("transactions", "categories", "budgets")
+            cur.execute("SELECT id, device, received FROM sync_devices")
+            rows = cur.fetchall()
+            devices = {r["device"]: r["id"] for r in rows}
+            received = next((r["received"] for r in rows if r["device"] == header["device"]), None)
+            if not header["full"] and header["since"] > (received or 0):
+                raise SyncError(
+                    f"{path} holds changes after #{header['since']} but this database has only received up to "
+                    f"#{received or 0} from {header['device']}; apply the earlier file or export with --full"
+                )
+            # The journal entries are written below with the changes' own
+            # stamps and origins.
+            cur.execute("INSERT INTO settings (key, value) VALUES (?, 1)", (DEFER_CHANGE_LOG,))
+            applier = _Applier(db, devices)
+            changes = 0
+            for line in f:
+                rec = json.loads(line)
+                changes += 1
+                rec["u"] = bytes.fromhex(rec["u"])
+                if rec.get("cu") is not None:
+                    rec["cu"] = bytes.fromhex(rec["cu"])
+                if rec["k"] == "c":
+                    applier.category(rec)
+                else:
+                    applier.transaction(rec)
+            cur.execute("DELETE FROM settings WHERE key = ?", (DEFER_CHANGE_LOG,))
+            # Local stamps from now on sort after everything seen.
+            cur.execute(SYNC_CLOCK_TICK_SQL, (applier.stamp,))
+            peer = applier._device(header["device"])
+            cur.execute(
+                """
+                UPDATE sync_devices
+                SET received = MAX(IFNULL(received, 0), :seq),
+                    acked = CASE WHEN :acked IS NULL THEN acked ELSE MAX(IFNULL(acked, 0), :acked) END
+                WHERE id = :peer
+                """,
+                {"seq": header["seq"], "acked": header["acks"].get(me), "peer": peer},
+            )
+    return ApplyResult(
+        header["device"], changes, applier.applied, applier.superseded, applier.skipped, time.perf_counter() - t0
+    )
@@ -0,0 +1,252 @@
+import atexit
+import bisect
+import functools
+import heapq
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+ENV_VAR = "FINLY_TRACE"
+OUT_ENV_VAR = "FINLY_TRACE_OUT"
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open.
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+def requested(argv: Optional[List[str]] = None) -> bool:
+    if argv is not None and "--trace" in argv:
+        return True
+    return os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p: float) -> float:
+        # Upper bound of the bucket holding the p-th percentile (the max for
+        # the open bucket), which is as precise as a bucketed histogram gets.
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+            "buckets_ms": {str(b): n for b, n in zip(BUCKETS_MS + ["inf"], self.counts) if n},
+        }
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql: str) -> str:
+    # Statement shape with literals folded, so executions group by query.
+    return " ".join(_LITERALS.sub("?", sql).split())
+
+
+class Tracer:
+    # Collects per-operation latency histograms (timed method calls) and
+    # per-statement timings from sqlite3 trace callbacks. A statement's time
+    # runs from its trace event to the next statement or the end of the
+    # operation, so it includes stepping through and fetching the rows.
+    def __init__(self, slowest: int = 25):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.operations: Dict[str, Histogram] = {}
+        self.queries: Dict[str, Histogram] = {}
+        self.slowest_kept = slowest
+        self._slowest: List[tuple] = []  # min-heap of (ms, seq, op, sql, db_path)
+        self._seq = 0
+        self.started = time.time()
+        self.out_path: Optional[str] = None
+
+    # -- statements ------------------------------------------------------
+
+    def attach(self, conn: sqlite3.Connection, db_path: str):
+        conn.set_trace_callback(lambda sql: self._statement(sql, db_path))
+
+    def _state(self):
+        local = self._local
+        if not hasattr(local, "ops"):
+            local.ops = []
+            local.current = None
+        return local
+
+    def _statement(self, sql: str, db_path: str):
+        if sql.startswith("--"):
+            return  # statements run by triggers belong to their parent
+        now = time.perf_counter()
+        local = self._state()
+        self._close_statement(local, now)
+        local.current = (sql, now, local.ops[-1] if local.ops else "(no operation)", db_path)
+
+    def _close_statement(self, local, now: float):
+        if local.current is None:
+            return
+        sql, started, op, db_path = local.current
+        local.current = None
+        ms = (now - started) * 1000
+        key = normalize_sql(sql)
+        with self._lock:
+            hist = self.queries.get(key)
+            if hist is None:
+                hist = self.queries[key] = Histogram()
+            hist.add(ms)
+            self._seq += 1
+            entry = (ms, self._seq, op, sql, db_path)
+            if len(self._slowest) < self.slowest_kept:
+                heapq.heappush(self._slowest, entry)
+            elif ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    # -- operations ------------------------------------------------------
+
+    def timed(self, name: str, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            local = self._state()
+            local.ops.append(name)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                now = time.perf_counter()
+                local.ops.pop()
+                if not local.ops:
+                    self._close_statement(local, now)
+                self.record(name, (now - t0) * 1000)
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            hist = self.operations.get(name)
+            if hist is None:
+                hist = self.operations[name] = Histogram()
+            hist.add(ms)
+
+    def instrument(self, cls, names: Optional[List[str]] = None):
+        # Wraps the named methods of cls, or every method defined on it.
+        # Generators are left alone since timing them would only measure
+        # creating the generator.
+        for name, attr in list(vars(cls).items()):
+            if not inspect.isfunction(attr) or getattr(attr, "__traced__", False):
+                continue
+            if names is not None and name not in names:
+                continue
+            if name.startswith("__") and name != "__init__":
+                continue
+            if inspect.isgeneratorfunction(attr):
+                continue
+            setattr(cls, name, self.timed(f"{cls.__name__}.{name}", attr))
+
+    # -- reporting -------------------------------------------------------
+
+    def slowest(self) -> List[dict]:
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [{"ms": round(ms, 3), "operation": op, "sql": sql, "db_path": path} for ms, _seq, op, sql, path in entries]
+
+    @staticmethod
+    def explain(sql: str, db_path: str) -> List[str]:
+        # Runs on a separate read-only connection: EXPLAIN cannot be issued
+        # from inside the trace callback of the connection being traced.
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+            return []
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            return [f"(no plan: {e})"]
+
+    def report(self, with_plans: bool = True) -> dict:
+        with self._lock:
+            operations = {name: h.to_dict() for name, h in sorted(self.operations.items())}
+            queries = sorted(
+                ({"sql": sql, **h.to_dict()} for sql, h in self.queries.items()),
+                key=lambda q: q["total_ms"],
+                reverse=True,
+            )
+        slowest = self.slowest()
+        if with_plans:
+            for entry in slowest:
+                entry["plan"] = self.explain(entry["sql"], entry["db_path"])
+        return {
+            "started": self.started,
+            "duration_s": round(time.time() - self.started, 3),
+            "operations": operations,
+            "queries": queries,
+            "slowest": slowest,
+        }
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def enable(out_path: Optional[str] = None) -> Tracer:
+    # Instruments Database and dumps the report as JSON at exit; callers add
+    # their own classes with Tracer.instrument(). Safe to call more than once.
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    from .models import Database
+
+    tracer = _tracer = Tracer()
+    original_init = Database.__init__
+
+    @functools.wraps(original_init)
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        tracer.attach(self.conn, self.db_path)
+
+    Database.__init__ = init
+    tracer.instrument(Database)
+
+    if out_path is None:
+        out_path = os.environ.get(OUT_ENV_VAR) or os.path.join(
+            os.path.dirname(__file__), "data", f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+    tracer.out_path = out_path
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    atexit.register(tracer.dump, out_path)
+    return tracer
@@ -1,6 +1,11 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtCore import Qt, QDate
+import bisect
 import typing
+from decimal import Decimal
+
+from . import money
+from .models import signed_amount
 
 
 class TransactionDialog(QtWidgets.QDialog):
@@ -9,10 +14,6 @@ class TransactionDialog(QtWidgets.QDialog):
         self.setWindowTitle("Transaction")
         self.resize(400, 250)
 
-        if categories is None:
-            categories = []
-        self.categories = categories
-
         layout = QtWidgets.QVBoxLayout(self)
 
         form = QtWidgets.QFormLayout()
@@ -23,8 +24,8 @@ class TransactionDialog(QtWidgets.QDialog):
         form.addRow("Date:", self.date_edit)
 
         self.amount_spin = QtWidgets.QDoubleSpinBox()
-        self.amount_spin.setRange(0.01, 1_000_000_000)
-        self.amount_spin.setDecimals(2)
+        self.amount_spin.setDecimals(money.EXPONENT)
+        self.amount_spin.setRange(1 / money.SCALE, 1_000_000_000)
         form.addRow("Amount:", self.amount_spin)
 
         self.type_combo = QtWidgets.QComboBox()
@@ -32,12 +33,11 @@ class TransactionDialog(QtWidgets.QDialog):
         form.addRow("Type:", self.type_combo)
 
         self.category_combo = QtWidgets.QComboBox()
-        for cid, name in self.categories:
-            self.category_combo.addItem(name, cid)
         form.addRow("Category:", self.category_combo)
 
         self.desc_edit = QtWidgets.QLineEdit()
         form.addRow("Description:", self.desc_edit)
+        self._add_fields(form)
 
         layout.addLayout(form)
 
@@ -46,31 +46,459 @@ class TransactionDialog(QtWidgets.QDialog):
         btns.rejected.connect(self.reject)
         layout.addWidget(btns)
 
-        if data:
-            d = QDate.fromString(data.get("date"), "yyyy-MM-dd")
-            if d.isValid():
-                self.date_edit.setDate(d)
-            self.amount_spin.setValue(float(data.get("amount", 0)))
-            t = data.get("type", "Expense")
-            idx = self.type_combo.findText(t)
-            if idx >= 0:
-                self.type_combo.setCurrentIndex(idx)
-            cat_id = data.get("category_id")
-            if cat_id is not None:
-                i = self.category_combo.findData(cat_id)
-                if i >= 0:
-                    self.category_combo.setCurrentIndex(i)
-            self.desc_edit.setText(data.get("description") or "")
+        self.load(categories or [], data)
+
+    def _add_fields(self, form: QtWidgets.QFormLayout):
+        # For subclasses with more to ask; runs before the first load().
+        pass
+
+    def load(self, categories: typing.List[typing.Tuple[int, str]], data: dict = None):
+        # Resets the form, so one dialog can be reused for every add and edit.
+        self.categories = categories
+        self.category_combo.clear()
+        for cid, name in self.categories:
+            self.category_combo.addItem(name, cid)
+        data = data or {}
+        d = QDate.fromString(data.get("date") or "", "yyyy-MM-dd")
+        self.date_edit.setDate(d if d.isValid() else QDate.currentDate())
+        self.amount_spin.setValue(float(money.from_minor(data.get("amount", 0))))
+        idx = self.type_combo.findText(data.get("type", "Expense"))
+        self.type_combo.setCurrentIndex(max(idx, 0))
+        cat_id = data.get("category_id")
+        if cat_id is not None:
+            i = self.category_combo.findData(cat_id)
+            if i >= 0:
+                self.category_combo.setCurrentIndex(i)
+        self.desc_edit.setText(data.get("description") or "")
+        self.date_edit.setFocus()
 
     def get_data(self):
         date = self.date_edit.date().toString("yyyy-MM-dd")
-        amount = self.amount_spin.value()
+        # The spin box rounds to money.EXPONENT decimals, so its shortest
+        # repr converts exactly.
+        amount = money.to_minor(self.amount_spin.value())
         t_type = self.type_combo.currentText()
         cat_id = self.category_combo.currentData()
         desc = self.desc_edit.text().strip()
         return {"date": date, "amount": amount, "type": t_type, "category_id": cat_id, "description": desc}
 
 
+class RecurringRuleDialog(TransactionDialog):
+    # A new recurring transaction: the transaction's fields, dated on its
+    # first occurrence, and how it repeats.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Recurring transaction")
+        self.resize(400, 320)
+
+    def _add_fields(self, form: QtWidgets.QFormLayout):
+        self.every_spin = QtWidgets.QSpinBox()
+        self.every_spin.setRange(1, 120)
+        self.every_spin.setSuffix(" month(s)")
+        form.addRow("Every:", self.every_spin)
+        self.day_spin = QtWidgets.QSpinBox()
+        self.day_spin.setRange(1, 31)
+        self.day_spin.setToolTip("Months without this day use their last day")
+        form.addRow("On day:", self.day_spin)
+        self.until_check = QtWidgets.QCheckBox("Ends on")
+        self.until_edit = QtWidgets.QDateEdit()
+        self.until_edit.setCalendarPopup(True)
+        self.until_check.toggled.connect(self.until_edit.setEnabled)
+        form.addRow(self.until_check, self.until_edit)
+        self.date_edit.dateChanged.connect(lambda d: self.day_spin.setValue(d.day()))
+
+    def load(self, categories: typing.List[typing.Tuple[int, str]], data: dict = None):
+        super().load(categories, data)
+        self.every_spin.setValue(1)
+        self.day_spin.setValue(self.date_edit.date().day())
+        self.until_check.setChecked(False)
+        self.until_edit.setEnabled(False)
+        self.until_edit.setDate(self.date_edit.date().addYears(1))
+
+    def get_data(self):
+        data = super().get_data()
+        data["interval_months"] = self.every_spin.value()
+        data["day"] = self.day_spin.value()
+        data["end_date"] = self.until_edit.date().toString("yyyy-MM-dd") if self.until_check.isChecked() else None
+        return data
+
+
+class RuleChangeDialog(QtWidgets.QDialog):
+    # A date, and an amount unless load() is given none: when a recurring
+    # transaction's new amount starts, or its last date.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.resize(300, 120)
+        layout = QtWidgets.QVBoxLayout(self)
+        self.form = QtWidgets.QFormLayout()
+        self.date_edit = QtWidgets.QDateEdit()
+        self.date_edit.setCalendarPopup(True)
+        self.form.addRow("Date:", self.date_edit)
+        self.amount_spin = QtWidgets.QDoubleSpinBox()
+        self.amount_spin.setDecimals(money.EXPONENT)
+        self.amount_spin.setRange(1 / money.SCALE, 1_000_000_000)
+        self.form.addRow("Amount:", self.amount_spin)
+        layout.addLayout(self.form)
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+
+    def load(self, title: str, date: QDate, amount: typing.Optional[int] = None):
+        self.setWindowTitle(title)
+        self.date_edit.setDate(date)
+        self.form.setRowVisible(self.amount_spin, amount is not None)
+        if amount is not None:
+            self.amount_spin.setValue(float(money.from_minor(amount)))
+
+    def get_data(self) -> typing.Tuple[str, int]:
+        return self.date_edit.date().toString("yyyy-MM-dd"), money.to_minor(self.amount_spin.value())
+
+
+class RecurringDialog(QtWidgets.QDialog):
+    # The planned occurrences of the month on screen, to confirm (possibly
+    # edited) or skip, and the recurring transactions behind them. The
+    # controller connects the buttons and reloads the dialog after each
+    # change.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Recurring — Finly")
+        self.resize(680, 520)
+        self.planned = []
+        self.rules = []
+        self.categories: typing.List[typing.Tuple[int, str]] = []
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.planned_label = QtWidgets.QLabel()
+        layout.addWidget(self.planned_label)
+        self.planned_table = self._table(["Date", "Amount", "Type", "Category", "Description"])
+        layout.addWidget(self.planned_table)
+        btn_h = QtWidgets.QHBoxLayout()
+        self.confirm_btn = QtWidgets.QPushButton("Confirm")
+        self.edit_btn = QtWidgets.QPushButton("Edit and Confirm…")
+        self.skip_btn = QtWidgets.QPushButton("Skip")
+        for btn in (self.confirm_btn, self.edit_btn, self.skip_btn):
+            btn_h.addWidget(btn)
+        btn_h.addStretch()
+        layout.addLayout(btn_h)
+
+        layout.addWidget(QtWidgets.QLabel("Recurring transactions"))
+        self.rules_table = self._table(["Description", "Amount", "Type", "Category", "Repeats", "Next"])
+        layout.addWidget(self.rules_table)
+        btn_h = QtWidgets.QHBoxLayout()
+        self.add_btn = QtWidgets.QPushButton("Add…")
+        self.amount_btn = QtWidgets.QPushButton("Change Amount…")
+        self.end_btn = QtWidgets.QPushButton("End…")
+        self.delete_btn = QtWidgets.QPushButton("Delete")
+        for btn in (self.add_btn, self.amount_btn, self.end_btn, self.delete_btn):
+            btn_h.addWidget(btn)
+        btn_h.addStretch()
+        layout.addLayout(btn_h)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+
+    @staticmethod
+    def _table(headers):
+        table = QtWidgets.QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().hide()
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, text in enumerate(row):
+                item = QtWidgets.QTableWidgetItem(text)
+                if j == 1:
+                    item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+                table.setItem(i, j, item)
+
+    def load(self, month_label: str, planned, rules, categories: typing.List[typing.Tuple[int, str]]):
+        # planned: recurrence.PlannedTransaction rows of the month; rules:
+        # recurrence.Rule, as Database.get_planned and get_recurring_rules
+        # return them.
+        self.planned, self.rules, self.categories = list(planned), list(rules), categories
+        names = dict(categories)
+        self.planned_label.setText(f"Planned for {month_label}" if planned else f"Nothing planned for {month_label}")
+        self._fill(
+            self.planned_table,
+            [
+                (p.date, money.format_minor(p.amount), p.type, p.category or "Uncategorized", p.description or "")
+                for p in self.planned
+            ],
+        )
+        today = QDate.currentDate().toString("yyyy-MM-dd")
+        rows = []
+        for r in self.rules:
+            repeats = "Monthly" if r.interval_months == 1 else f"Every {r.interval_months} months"
+            repeats += f" on day {r.day}" + (f" until {r.end_date}" if r.end_date else "")
+            upcoming = r.next_from(today)
+            rows.append((
+                r.description or "",
+                money.format_minor(r.amount_on(upcoming or today)),
+                r.type,
+                names.get(r.category_id, "Uncategorized"),
+                repeats,
+                upcoming or "Ended",
+            ))
+        self._fill(self.rules_table, rows)
+
+    @staticmethod
+    def _selected(table, items):
+        rows = table.selectionModel().selectedRows()
+        if not rows or rows[0].row() >= len(items):
+            return None
+        return items[rows[0].row()]
+
+    def selected_planned(self):
+        return self._selected(self.planned_table, self.planned)
+
+    def selected_rule(self):
+        return self._selected(self.rules_table, self.rules)
+
+
+class TransactionTableModel(QtCore.QAbstractTableModel):
+    HEADERS = ["ID", "Date", "Amount", "Type", "Category", "Description", "Balance"]
+    # Sort key (models.SORT_KEYS) per column; None is not sortable.
+    SORT_KEYS = [None, "date", "amount", "type", "category", "description", None]
+    BALANCE_COLUMN = 6
+
+    page_loaded = QtCore.Signal()
+    # (sort key, descending) for a header click. Sorting happens in the
+    # query, so the owner of the source has to reload it.
+    sort_requested = QtCore.Signal(str, bool)
+
+    def __init__(self, parent=None, page_size: int = 200):
+        super().__init__(parent)
+        self.page_size = page_size
+        self._rows = []
+        # Running balance after each row, for sources whose rows carry one
+        # (Database.get_transactions_page); other views leave the column empty.
+        # Edits do not rewrite them: each one that moves the balances of the
+        # rows after it is recorded as (key, delta) in _shift_keys /
+        # _shift_deltas, sorted by key, and added when a row is displayed
+        # (see _balance).
+        self._balances = []
+        self._shift_keys = []
+        self._shift_deltas = []
+        self._running = False
+        self._fetch_page = None
+        self._cursor = None
+        self._exhausted = True
+        self._loading = False
+        self._generation = 0
+
+    def set_source(self, fetch_page: typing.Callable):
+        # fetch_page(cursor, limit, deliver) loads a page, possibly on another
+        # thread, and calls deliver(rows, next_cursor) on the GUI thread. A
+        # next_cursor of None means there is nothing left to load. Pages that
+        # arrive for a previous source are dropped.
+        self.beginResetModel()
+        self._generation += 1
+        self._rows = []
+        self._balances = []
+        self._shift_keys = []
+        self._shift_deltas = []
+        self._running = False
+        self._fetch_page = fetch_page
+        self._cursor = None
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return str(r["id"])
+            if col == 1:
+                return r["date"]
+            if col == 2:
+                return money.format_minor(r["amount"])
+            if col == 3:
+                return r["type"]
+            if col == 4:
+                return r["category"] or "Uncategorized"
+            if col == 5:
+                return r["description"] or ""
+            if col == self.BALANCE_COLUMN:
+                balance = self._balance(index.row())
+                return money.format_minor(balance) if balance is not None else ""
+        elif role == Qt.TextAlignmentRole and col in (2, self.BALANCE_COLUMN):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if 0 <= column < len(self.SORT_KEYS) and self.SORT_KEYS[column] is not None:
+            self.sort_requested.emit(self.SORT_KEYS[column], order == Qt.DescendingOrder)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading or self._fetch_page is None:
+            return
+        self._loading = True
+        generation = self._generation
+        self._fetch_page(
+            self._cursor, self.page_size, lambda rows, cursor: self._append_page(generation, rows, cursor)
+        )
+
+    def _append_page(self, generation: int, rows, cursor):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self._cursor = cursor
+        self._exhausted = cursor is None
+        if rows:
+            if not self._rows:
+                self._running = "balance" in rows[0].keys()
+            first = len(self._rows)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            if self._running:
+                # Later pages arrive with current balances (the cursor carries
+                # the shifted one), so what _balance would add is taken off.
+                if self._shift_keys:
+                    self._balances.extend(r["balance"] - self._pending_shift(self._key(r)) for r in rows)
+                else:
+                    self._balances.extend(r["balance"] for r in rows)
+            else:
+                self._balances.extend([None] * len(rows))
+            self.endInsertRows()
+        self.page_loaded.emit()
+
+    @staticmethod
+    def _key(row) -> typing.Tuple[str, int]:
+        return row["date"], row["id"]
+
+    def _position(self, key: typing.Tuple[str, int]) -> int:
+        # Rows are ordered by (date, id) descending; returns the first index
+        # whose key is <= key.
+        lo, hi = 0, len(self._rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(self._rows[mid]) > key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _pending_shift(self, key: typing.Tuple[str, int]) -> int:
+        # What the recorded shifts add to the balance of a row at key: those
+        # of the transactions before it.
+        return sum(self._shift_deltas[: bisect.bisect_left(self._shift_keys, key)])
+
+    def _balance(self, row: int) -> typing.Optional[int]:
+        balance = self._balances[row]
+        if balance is None:
+            return None
+        return balance + self._pending_shift(self._key(self._rows[row]))
+
+    def _shift_balances(self, key: typing.Tuple[str, int], delta: int):
+        # A transaction at key changed the running balance of every row after
+        # it, which is every row above it here, and, if it lies below the
+        # loaded rows, the balance the cursor carries into the next page.
+        if not self._running or not delta:
+            return
+        i = bisect.bisect_right(self._shift_keys, key)
+        self._shift_keys.insert(i, key)
+        self._shift_deltas.insert(i, delta)
+        end = self._position(key)
+        if end:
+            self.dataChanged.emit(self.index(0, self.BALANCE_COLUMN), self.index(end - 1, self.BALANCE_COLUMN))
+        if self._cursor is not None and key < tuple(self._cursor[:2]):
+            self._cursor = (self._cursor[0], self._cursor[1], self._cursor[2] + delta)
+
+    def shift_balances(self, delta: int):
+        # For a change in an earlier month, which moves every running balance.
+        self._shift_balances(("", 0), delta)
+
+    def apply_change(self, old, new) -> bool:
+        # Patches one transaction in place: old is the row as it was (None
+        # for an insert), new the row as it is now (None for a delete). Pass
+        # None for whichever side does not belong to this view. Returns False
+        # when a page is still loading, since it may carry the old version,
+        # or when a running balance cannot be placed; the caller should
+        # reload instead.
+        if self._loading:
+            return False
+        if old is not None:
+            key = self._key(old)
+            i = self._position(key)
+            if i < len(self._rows) and self._rows[i]["id"] == old["id"]:
+                if new is not None and self._key(new) == key:
+                    delta = signed_amount(new) - signed_amount(old)
+                    self._rows[i] = new
+                    if self._running:
+                        self._balances[i] += delta
+                    self.dataChanged.emit(self.index(i, 0), self.index(i, len(self.HEADERS) - 1))
+                    self._shift_balances(key, delta)
+                    return True
+                self.beginRemoveRows(QtCore.QModelIndex(), i, i)
+                del self._rows[i]
+                del self._balances[i]
+                self.endRemoveRows()
+            self._shift_balances(key, -signed_amount(old))
+        if new is not None:
+            key = self._key(new)
+            self._shift_balances(key, signed_amount(new))
+            # Rows past the last loaded one arrive with a later page.
+            if not self._exhausted and (self._cursor is None or key < tuple(self._cursor[:2])):
+                return True
+            if not self._rows:
+                # Nothing to take the running balance from.
+                return False
+            i = self._position(key)
+            balance = None
+            if self._running:
+                # From the row below, or, for the oldest row, from the one
+                # above, which already includes it.
+                if i < len(self._rows):
+                    balance = self._balance(i) + signed_amount(new)
+                else:
+                    balance = self._balance(i - 1) - signed_amount(self._rows[i - 1])
+                balance -= self._pending_shift(key)
+            self.beginInsertRows(QtCore.QModelIndex(), i, i)
+            self._rows.insert(i, new)
+            self._balances.insert(i, balance)
+            self.endInsertRows()
+        return True
+
+    def row_at(self, row: int):
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+
 class CategoryDialog(QtWidgets.QDialog):
     def __init__(self, parent=None, name: str = ""):
         super().__init__(parent)
@@ -80,7 +508,7 @@ class CategoryDialog(QtWidgets.QDialog):
         layout = QtWidgets.QVBoxLayout(self)
         form = QtWidgets.QFormLayout()
         self.name_edit = QtWidgets.QLineEdit()
-        self.name_edit.setText(name)
+        self.set_name(name)
         form.addRow("Name:", self.name_edit)
         layout.addLayout(form)
 
@@ -89,10 +517,267 @@ class CategoryDialog(QtWidgets.QDialog):
         btns.rejected.connect(self.reject)
         layout.addWidget(btns)
 
+    def set_name(self, name: str):
+        self.name_edit.setText(name)
+        self.name_edit.selectAll()
+        self.name_edit.setFocus()
+
     def get_name(self):
         return self.name_edit.text().strip()
 
 
+class BudgetDialog(QtWidgets.QDialog):
+    # Limits per category: the standing one for every month, and one for
+    # the month on screen only that replaces it there. A blank cell has no
+    # limit.
+    EVERY, OWN = 1, 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Budgets — Finly")
+        self.resize(480, 420)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.table = QtWidgets.QTableWidget(0, 3)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+        self._loaded: typing.Dict[typing.Tuple[int, int], typing.Optional[int]] = {}
+
+    def load(self, categories: typing.List[typing.Tuple[int, str]], budgets: dict, month_label: str):
+        # budgets: category_id -> (every month, this month), as returned by
+        # Database.get_budgets.
+        self.table.setHorizontalHeaderLabels(["Category", "Every month", month_label])
+        self.table.setRowCount(len(categories))
+        self._loaded = {}
+        for row, (cid, name) in enumerate(categories):
+            item = QtWidgets.QTableWidgetItem(name)
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            item.setData(Qt.UserRole, cid)
+            self.table.setItem(row, 0, item)
+            limits = budgets.get(cid, (None, None))
+            for column, amount in ((self.EVERY, limits[0]), (self.OWN, limits[1])):
+                cell = QtWidgets.QTableWidgetItem("" if amount is None else money.format_minor(amount))
+                cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, cell)
+                self._loaded[(cid, column)] = amount
+
+    def _limits(self) -> typing.Dict[typing.Tuple[int, int], typing.Optional[int]]:
+        # Raises ValueError for the first cell that is not a positive amount.
+        limits = {}
+        for row in range(self.table.rowCount()):
+            cid = self.table.item(row, 0).data(Qt.UserRole)
+            for column in (self.EVERY, self.OWN):
+                text = self.table.item(row, column).text().strip()
+                amount = money.to_minor(text) if text else None
+                if amount is not None and amount <= 0:
+                    raise ValueError(f"A budget must be greater than zero, not {text}")
+                limits[(cid, column)] = amount
+        return limits
+
+    def accept(self):
+        try:
+            self._limits()
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Budgets", str(e))
+            return
+        super().accept()
+
+    def changes(self) -> typing.List[typing.Tuple[int, bool, typing.Optional[int]]]:
+        # (category_id, for this month only, new limit or None to remove) for
+        # every cell that was edited.
+        return [
+            (cid, column == self.OWN, amount)
+            for (cid, column), amount in self._limits().items()
+            if amount != self._loaded.get((cid, column))
+        ]
+
+
+class BudgetStrip(QtWidgets.QWidget):
+    # One bar per budgeted category of the month on screen, fullest first;
+    # hidden while the month has no budgets.
+    WARN_AT = 0.8
+    COLORS = {"over": "#c0392b", "warn": "#e67e22"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._layout = QtWidgets.QHBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self.setVisible(False)
+
+    def set_status(self, budgets):
+        # budgets: models.BudgetStatus rows.
+        while self._layout.count():
+            self._layout.takeAt(0).widget().deleteLater()
+        for b in budgets:
+            bar = QtWidgets.QProgressBar()
+            bar.setRange(0, 1000)
+            bar.setValue(min(int(b.utilization() * 1000), 1000))
+            bar.setFormat(f"{b.category}: {money.format_minor(b.spent)} / {money.format_minor(b.limit)}")
+            if b.over():
+                bar.setToolTip(f"{b.category}: over budget by {money.format_minor(-b.remaining())}")
+                state = "over"
+            else:
+                bar.setToolTip(f"{b.category}: {money.format_minor(b.remaining())} left")
+                state = "warn" if b.utilization() >= self.WARN_AT else None
+            if state is not None:
+                bar.setStyleSheet(f"QProgressBar::chunk {{ background-color: {self.COLORS[state]}; }}")
+            self._layout.addWidget(bar)
+        self.setVisible(bool(budgets))
+
+
+class FilterBar(QtWidgets.QWidget):
+    SCOPES = ["This month", "All dates", "Date range"]
+    TYPES = ["Any type", "Expense", "Income"]
+
+    changed = QtCore.Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.scope_combo = QtWidgets.QComboBox()
+        self.scope_combo.addItems(self.SCOPES)
+        today = QDate.currentDate()
+        self.from_edit = QtWidgets.QDateEdit(QDate(today.year(), 1, 1))
+        self.to_edit = QtWidgets.QDateEdit(today)
+        for edit in (self.from_edit, self.to_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+            edit.setEnabled(False)
+
+        self.category_btn = QtWidgets.QToolButton()
+        self.category_btn.setPopupMode(QtWidgets.QToolButton.InstantPopup)
+        self.category_menu = QtWidgets.QMenu(self.category_btn)
+        self.category_btn.setMenu(self.category_menu)
+        self.category_btn.setText("All categories")
+
+        self.type_combo = QtWidgets.QComboBox()
+        self.type_combo.addItems(self.TYPES)
+
+        self.min_edit = QtWidgets.QLineEdit()
+        self.max_edit = QtWidgets.QLineEdit()
+        for edit, hint in ((self.min_edit, "Min amount"), (self.max_edit, "Max amount")):
+            edit.setPlaceholderText(hint)
+            edit.setValidator(QtGui.QDoubleValidator(0.0, 1e12, money.EXPONENT, edit))
+            edit.setMaximumWidth(100)
+
+        self.text_edit = QtWidgets.QLineEdit()
+        self.text_edit.setPlaceholderText("Description contains…")
+        self.text_edit.setClearButtonEnabled(True)
+        self.clear_btn = QtWidgets.QPushButton("Clear")
+
+        for widget in (
+            self.scope_combo, self.from_edit, self.to_edit, self.category_btn, self.type_combo,
+            self.min_edit, self.max_edit, self.text_edit, self.clear_btn,
+        ):
+            layout.addWidget(widget)
+        layout.setStretchFactor(self.text_edit, 1)
+
+        # Debounced like the search box, so typing issues one query.
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self.changed)
+        self.scope_combo.currentIndexChanged.connect(self._scope_changed)
+        self.from_edit.dateChanged.connect(lambda _: self.changed.emit())
+        self.to_edit.dateChanged.connect(lambda _: self.changed.emit())
+        self.type_combo.currentIndexChanged.connect(lambda _: self.changed.emit())
+        for edit in (self.min_edit, self.max_edit, self.text_edit):
+            edit.textChanged.connect(lambda _: self.timer.start())
+        self.clear_btn.clicked.connect(self.clear)
+
+    def _scope_changed(self, index):
+        ranged = self.SCOPES[index] == "Date range"
+        self.from_edit.setEnabled(ranged)
+        self.to_edit.setEnabled(ranged)
+        self.changed.emit()
+
+    def set_categories(self, categories: typing.List[typing.Tuple[int, str]]):
+        # Keeps the checked state of categories that still exist.
+        checked = set(self.category_ids() or ())
+        self.category_menu.clear()
+        for cid, name in categories:
+            action = self.category_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(cid in checked)
+            action.setData(cid)
+            action.toggled.connect(self._categories_changed)
+        self._update_category_text()
+
+    def _categories_changed(self, _checked):
+        self._update_category_text()
+        self.changed.emit()
+
+    def _update_category_text(self):
+        ids = self.category_ids()
+        if not ids:
+            self.category_btn.setText("All categories")
+        elif len(ids) == 1:
+            self.category_btn.setText(next(a.text() for a in self.category_menu.actions() if a.data() == ids[0]))
+        else:
+            self.category_btn.setText(f"{len(ids)} categories")
+
+    def category_ids(self) -> typing.Optional[typing.Tuple[int, ...]]:
+        ids = tuple(a.data() for a in self.category_menu.actions() if a.isChecked())
+        return ids or None
+
+    @staticmethod
+    def _amount(edit: QtWidgets.QLineEdit) -> typing.Optional[int]:
+        try:
+            return money.to_minor(edit.text())
+        except ValueError:
+            return None
+
+    def criteria(self) -> dict:
+        # What the bar asks for, with None for anything left open. scope is
+        # "month", "all" or "range"; start/end are only set for "range".
+        scope = ["month", "all", "range"][self.scope_combo.currentIndex()]
+        t_type = self.type_combo.currentText()
+        text = self.text_edit.text().strip()
+        return {
+            "scope": scope,
+            "start": self.from_edit.date().toString("yyyy-MM-dd") if scope == "range" else None,
+            "end": self.to_edit.date().toString("yyyy-MM-dd") if scope == "range" else None,
+            "category_ids": self.category_ids(),
+            "t_type": t_type if t_type in ("Expense", "Income") else None,
+            "min_amount": self._amount(self.min_edit),
+            "max_amount": self._amount(self.max_edit),
+            "text": text or None,
+        }
+
+    def active(self) -> bool:
+        # False when the bar shows the plain month view.
+        c = self.criteria()
+        return c["scope"] != "month" or any(c[k] is not None for k in ("category_ids", "t_type", "min_amount", "max_amount", "text"))
+
+    def clear(self):
+        # Resets every field and emits changed once.
+        for widget in (self.scope_combo, self.type_combo, self.min_edit, self.max_edit, self.text_edit):
+            widget.blockSignals(True)
+        self.scope_combo.setCurrentIndex(0)
+        self.from_edit.setEnabled(False)
+        self.to_edit.setEnabled(False)
+        self.type_combo.setCurrentIndex(0)
+        for edit in (self.min_edit, self.max_edit, self.text_edit):
+            edit.clear()
+        for action in self.category_menu.actions():
+            action.blockSignals(True)
+            action.setChecked(False)
+            action.blockSignals(False)
+        for widget in (self.scope_combo, self.type_combo, self.min_edit, self.max_edit, self.text_edit):
+            widget.blockSignals(False)
+        self.timer.stop()
+        self._update_category_text()
+        self.changed.emit()
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -115,21 +800,54 @@ class MainWindow(QtWidgets.QMainWindow):
         top_h.addWidget(self.next_month_btn)
         top_h.addStretch()
 
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText("Search descriptions…")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(220)
+        top_h.addWidget(self.search_edit)
+        self.filter_btn = QtWidgets.QPushButton("Filter")
+        self.filter_btn.setCheckable(True)
+        top_h.addWidget(self.filter_btn)
+        # Debounce so a burst of keystrokes issues one query.
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(60)
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+
         self.income_label = QtWidgets.QLabel("Income: 0.00")
         self.expense_label = QtWidgets.QLabel("Expenses: 0.00")
         self.balance_label = QtWidgets.QLabel("Balance: 0.00")
         top_h.addWidget(self.income_label)
         top_h.addWidget(self.expense_label)
         top_h.addWidget(self.balance_label)
+        # Recurring transactions of the month still to be confirmed.
+        self.planned_label = QtWidgets.QLabel()
+        self.planned_label.setVisible(False)
+        top_h.addWidget(self.planned_label)
 
         layout.addLayout(top_h)
 
-        self.table = QtWidgets.QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(["ID", "Date", "Amount", "Type", "Category", "Description"]) 
+        self.filter_bar = FilterBar()
+        self.filter_bar.setVisible(False)
+        self.filter_btn.toggled.connect(self.filter_bar.setVisible)
+        layout.addWidget(self.filter_bar)
+
+        self.budget_strip = BudgetStrip()
+        layout.addWidget(self.budget_strip)
+
+        self.table_model = TransactionTableModel(self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.table_model)
+        # Header clicks re-run the query in the new order (see
+        # TransactionTableModel.sort); newest first until then.
+        self.table.horizontalHeader().setSortIndicator(1, Qt.DescendingOrder)
+        self.table.setSortingEnabled(True)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.table.hideColumn(0)
+        self.table_model.page_loaded.connect(lambda: QtCore.QTimer.singleShot(0, self._fetch_if_room))
         layout.addWidget(self.table)
 
         btn_h = QtWidgets.QHBoxLayout()
@@ -137,13 +855,23 @@ class MainWindow(QtWidgets.QMainWindow):
         self.edit_btn = QtWidgets.QPushButton("Edit")
         self.delete_btn = QtWidgets.QPushButton("Delete")
         self.manage_cats_btn = QtWidgets.QPushButton("Manage Categories")
-        self.export_btn = QtWidgets.QPushButton("Export CSV")
+        self.budgets_btn = QtWidgets.QPushButton("Budgets")
+        self.recurring_btn = QtWidgets.QPushButton("Recurring")
+        self.reports_btn = QtWidgets.QPushButton("Reports")
+        self.import_btn = QtWidgets.QPushButton("Import")
+        self.export_btn = QtWidgets.QPushButton("Export")
+        self.backup_btn = QtWidgets.QPushButton("Back Up")
         btn_h.addWidget(self.add_btn)
         btn_h.addWidget(self.edit_btn)
         btn_h.addWidget(self.delete_btn)
         btn_h.addStretch()
         btn_h.addWidget(self.manage_cats_btn)
+        btn_h.addWidget(self.budgets_btn)
+        btn_h.addWidget(self.recurring_btn)
+        btn_h.addWidget(self.reports_btn)
+        btn_h.addWidget(self.import_btn)
         btn_h.addWidget(self.export_btn)
+        btn_h.addWidget(self.backup_btn)
         layout.addLayout(btn_h)
 
         self.status = self.statusBar()
@@ -158,11 +886,222 @@ class MainWindow(QtWidgets.QMainWindow):
         self.current_month = today.month()
         self.update_month_label()
 
+    def _fetch_if_room(self):
+        # Views only ask for more rows while scrolling. A page that arrives
+        # asynchronously may still leave the viewport short, so keep going
+        # until it is filled or the user is no longer at the bottom.
+        if not self.table_model.canFetchMore():
+            return
+        bar = self.table.verticalScrollBar()
+        if bar.maximum() == 0 or bar.value() == bar.maximum():
+            self.table_model.fetchMore()
+
+    def add_trace_panel(self, tracer) -> "TracePanel":
+        panel = TracePanel(tracer, self)
+        self.addDockWidget(Qt.RightDockWidgetArea, panel)
+        self.menuBar().addMenu("Debug").addAction(panel.toggleViewAction())
+        panel.refresh()
+        return panel
+
     def update_month_label(self):
         dt = QtCore.QDate(self.current_year, self.current_month, 1)
         self.month_label.setText(dt.toString("MMMM yyyy"))
 
 
+class ReportsDialog(QtWidgets.QDialog):
+    # Multi-year reports. The controller connects report_requested, computes
+    # the report off the GUI thread (analytics.build_report) and hands the
+    # result to show_report.
+    report_requested = QtCore.Signal(int, int, bool)
+
+    def __init__(self, parent=None, year: int = None):
+        super().__init__(parent)
+        self.setWindowTitle("Reports — Finly")
+        self.resize(760, 520)
+        year = year or QDate.currentDate().year()
+
+        layout = QtWidgets.QVBoxLayout(self)
+        controls = QtWidgets.QHBoxLayout()
+        self.start_spin = QtWidgets.QSpinBox()
+        self.start_spin.setRange(1900, 2999)
+        self.start_spin.setValue(year - 2)
+        self.end_spin = QtWidgets.QSpinBox()
+        self.end_spin.setRange(1900, 2999)
+        self.end_spin.setValue(year)
+        self.type_combo = QtWidgets.QComboBox()
+        self.type_combo.addItems(["Expense", "Income"])
+        controls.addWidget(QtWidgets.QLabel("From"))
+        controls.addWidget(self.start_spin)
+        controls.addWidget(QtWidgets.QLabel("to"))
+        controls.addWidget(self.end_spin)
+        controls.addWidget(self.type_combo)
+        controls.addStretch()
+        self.status_label = QtWidgets.QLabel()
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+        self.tabs = QtWidgets.QTabWidget()
+        self.categories_table = self._table(["Category", "Total", "Transactions", "Share"])
+        self.months_table = self._table(["Month", "Income", "Expenses", "3-month avg", "12-month avg", "vs. last year", "%"])
+        self.years_table = self._table(["Year", "Total", "vs. previous year", "%"])
+        self.merchants_table = self._table(["Description", "Total", "Transactions"])
+        self.tabs.addTab(self.categories_table, "Categories")
+        self.tabs.addTab(self.months_table, "Months")
+        self.tabs.addTab(self.years_table, "Years")
+        self.tabs.addTab(self.merchants_table, "Top descriptions")
+        layout.addWidget(self.tabs)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+
+        self.start_spin.valueChanged.connect(self.request)
+        self.end_spin.valueChanged.connect(self.request)
+        self.type_combo.currentIndexChanged.connect(self.request)
+
+    @staticmethod
+    def _table(headers):
+        table = QtWidgets.QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().hide()
+        return table
+
+    def request(self, *_):
+        start, end = self.start_spin.value(), self.end_spin.value()
+        if start > end:
+            self.status_label.setText("Start year is after end year")
+            return
+        self.status_label.setText("Calculating…")
+        self.report_requested.emit(start, end, self.type_combo.currentText() == "Income")
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                if isinstance(value, (float, Decimal)):
+                    text = "" if value != value else f"{value:,.{money.EXPONENT}f}"  # NaN: nothing to compare with
+                    item = QtWidgets.QTableWidgetItem(text)
+                    item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+                else:
+                    item = QtWidgets.QTableWidgetItem(str(value))
+                table.setItem(i, j, item)
+
+    @staticmethod
+    def _percent(value: float) -> str:
+        return "" if value != value else f"{value * 100:+.1f}%"
+
+    def show_report(self, report: dict):
+        if (report["start_year"], report["end_year"], report["income"]) != (
+            self.start_spin.value(),
+            self.end_spin.value(),
+            self.type_combo.currentText() == "Income",
+        ):
+            return  # superseded by a newer request
+        self._fill(self.categories_table, [(name, total, count, f"{share * 100:.1f}%") for name, total, count, share in report["categories"]])
+        self._fill(self.months_table, [row[:6] + (self._percent(row[6]),) for row in report["months"]])
+        self._fill(self.years_table, [(str(y), total, delta, self._percent(pct)) for y, total, delta, pct in report["years"]])
+        self._fill(self.merchants_table, report["merchants"])
+        self.status_label.setText(
+            f"{report['rows']:,} transactions · loaded in {report['load_seconds'] * 1000:.0f} ms, "
+            f"computed in {report['compute_seconds'] * 1000:.0f} ms"
+        )
+
+    def show_error(self, message: str):
+        self.status_label.setText(message)
+
+
+class TracePanel(QtWidgets.QDockWidget):
+    # Debug dock shown when tracing is enabled (see tracing.py): operation
+    # latencies, and the slowest statements with their query plans.
+    def __init__(self, tracer, parent=None):
+        super().__init__("Trace", parent)
+        self.setObjectName("trace_panel")
+        self.tracer = tracer
+        self._slowest = []
+
+        body = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(body)
+        layout.addWidget(QtWidgets.QLabel("Operations"))
+        self.ops_table = QtWidgets.QTableWidget(0, 5)
+        self.ops_table.setHorizontalHeaderLabels(["Operation", "Calls", "Mean ms", "p95 ms", "Max ms"])
+        self.ops_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.ops_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.ops_table.verticalHeader().hide()
+        layout.addWidget(self.ops_table)
+
+        layout.addWidget(QtWidgets.QLabel("Slowest statements"))
+        self.slow_table = QtWidgets.QTableWidget(0, 3)
+        self.slow_table.setHorizontalHeaderLabels(["ms", "Operation", "SQL"])
+        self.slow_table.horizontalHeader().setStretchLastSection(True)
+        self.slow_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.slow_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.slow_table.verticalHeader().hide()
+        self.slow_table.itemSelectionChanged.connect(self._show_plan)
+        layout.addWidget(self.slow_table)
+
+        self.plan_view = QtWidgets.QPlainTextEdit()
+        self.plan_view.setReadOnly(True)
+        self.plan_view.setPlaceholderText("Select a statement to see its EXPLAIN QUERY PLAN")
+        layout.addWidget(self.plan_view)
+
+        btn_h = QtWidgets.QHBoxLayout()
+        self.refresh_btn = QtWidgets.QPushButton("Refresh")
+        self.refresh_btn.clicked.connect(self.refresh)
+        self.dump_btn = QtWidgets.QPushButton("Save JSON…")
+        self.dump_btn.clicked.connect(self._save)
+        btn_h.addStretch()
+        btn_h.addWidget(self.refresh_btn)
+        btn_h.addWidget(self.dump_btn)
+        layout.addLayout(btn_h)
+        self.setWidget(body)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(lambda visible: self.timer.start() if visible else self.timer.stop())
+
+    @staticmethod
+    def _item(value, align_right=False):
+        item = QtWidgets.QTableWidgetItem(str(value))
+        if align_right:
+            item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+        return item
+
+    def refresh(self):
+        report = self.tracer.report(with_plans=False)
+        ops = sorted(report["operations"].items(), key=lambda kv: kv[1]["max_ms"], reverse=True)
+        self.ops_table.setRowCount(len(ops))
+        for i, (name, h) in enumerate(ops):
+            self.ops_table.setItem(i, 0, self._item(name))
+            self.ops_table.setItem(i, 1, self._item(h["count"], True))
+            self.ops_table.setItem(i, 2, self._item(f"{h['mean_ms']:.2f}", True))
+            self.ops_table.setItem(i, 3, self._item(f"{h['p95_ms']:.2f}", True))
+            self.ops_table.setItem(i, 4, self._item(f"{h['max_ms']:.2f}", True))
+        self._slowest = report["slowest"]
+        self.slow_table.setRowCount(len(self._slowest))
+        for i, entry in enumerate(self._slowest):
+            self.slow_table.setItem(i, 0, self._item(f"{entry['ms']:.2f}", True))
+            self.slow_table.setItem(i, 1, self._item(entry["operation"]))
+            self.slow_table.setItem(i, 2, self._item(" ".join(entry["sql"].split())))
+
+    def _show_plan(self):
+        rows = self.slow_table.selectionModel().selectedRows()
+        if not rows or rows[0].row() >= len(self._slowest):
+            self.plan_view.clear()
+            return
+        entry = self._slowest[rows[0].row()]
+        plan = self.tracer.explain(entry["sql"], entry["db_path"])
+        self.plan_view.setPlainText(entry["sql"].strip() + "\n\n" + ("\n".join(plan) or "(no plan for this statement)"))
+
+    def _save(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save trace", self.tracer.out_path or "trace.json", "JSON (*.json)")
+        if path:
+            self.tracer.dump(path)
+
+
 class AboutDialog(QtWidgets.QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -0,0 +1,110 @@
+import threading
+
+from PySide6 import QtCore
+
+from .models import Database
+
+# backup and exporters are imported by the workers themselves: the main
+# window imports this module for FutureWatcher and should not pay for them
+# at startup.
+
+
+class WorkerSignals(QtCore.QObject):
+    progress = QtCore.Signal(int, int)
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+
+class FutureWatcher(QtCore.QObject):
+    # Delivers results of concurrent.futures.Future objects on the thread
+    # this QObject lives in (the GUI thread). The signal is emitted from the
+    # worker thread, so Qt queues it onto the receiver's event loop.
+    _done = QtCore.Signal(object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._done.connect(self._deliver)
+
+    def watch(self, future, on_result, on_error=None):
+        future.add_done_callback(lambda f: self._done.emit(f, on_result, on_error))
+
+    def _deliver(self, future, on_result, on_error):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            if on_error is None:
+                raise exc
+            on_error(exc)
+            return
+        on_result(future.result())
+
+
+class ExportWorker(QtCore.QRunnable):
+    def __init__(self, db_path: str, path: str, fmt: str):
+        super().__init__()
+        self.db_path = db_path
+        self.path = path
+        self.fmt = fmt
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        from .exporters import ExportCancelled, export_transactions
+
+        # sqlite3 connections belong to the thread that opened them, so the
+        # export reads through its own connection. Read-only: the writer
+        # thread has migrated the file, and the export must never wait for
+        # or take the write lock.
+        db = None
+        try:
+            db = Database(self.db_path, readonly=True)
+            written = export_transactions(
+                db,
+                self.path,
+                self.fmt,
+                progress=self.signals.progress.emit,
+                is_cancelled=self._cancel.is_set,
+            )
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(written)
+        finally:
+            if db is not None:
+                db.close()
+
+
+class BackupWorker(QtCore.QRunnable):
+    # Snapshot plus pruning; the backup opens its own connections, so it
+    # runs beside the app's reader and writer threads without using them.
+    def __init__(self, db_path: str, dest_dir: str):
+        super().__init__()
+        self.db_path = db_path
+        self.dest_dir = dest_dir
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        from . import backup
+
+        try:
+            result = backup.create_backup(
+                self.db_path, self.dest_dir, progress=self.signals.progress.emit, is_cancelled=self._cancel.is_set
+            )
+            backup.prune(self.dest_dir)
+        except backup.BackupCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
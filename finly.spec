@@ -16,6 +16,8 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
+# No UPX: compressed Qt libraries are decompressed again on every start,
+# which costs more start-up time than the smaller download saves.
 exe = EXE(
     pyz,
     a.scripts,
@@ -25,7 +27,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -38,7 +40,7 @@ coll = COLLECT(
     a.binaries,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='finly',
 )
@@ -12,7 +12,8 @@ echo "Cleaning previous builds..."
 rm -rf build/ dist/ ${APP_NAME}.spec || true
 
 echo "Running PyInstaller..."
-pyinstaller --noconfirm --windowed --name ${APP_NAME} \
+# --noupx: UPX-compressed Qt libraries slow down every start of the app.
+pyinstaller --noconfirm --windowed --noupx --name ${APP_NAME} \
   --add-data "expense_tracker/data${PATHSEP:-:}expense_tracker/data" \
   ${ENTRY}
 
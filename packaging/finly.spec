@@ -18,4 +18,4 @@ a = Analysis(
     cipher=block_cipher,
 )
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-exe = EXE(pyz, a.scripts, [], name='finly', debug=False, bootloader_ignore_signals=False, strip=False, upx=True, console=False)
+exe = EXE(pyz, a.scripts, [], name='finly', debug=False, bootloader_ignore_signals=False, strip=False, upx=False, console=False)
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+# The views tests build Qt models without a display.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from expense_tracker.models import Database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "expenses.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
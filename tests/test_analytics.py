@@ -0,0 +1,94 @@
+import pytest
+
+from expense_tracker import analytics, money
+from expense_tracker.models import Database
+
+pytestmark = pytest.mark.skipif(not analytics.available(), reason="needs numpy")
+
+
+def test_snapshot_sees_writes_from_another_instance(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    first = Database(path)
+    assert len(analytics.snapshot(first)) == 0
+    second = Database(path)
+    second.add_transaction("2024-03-01", 1250, None, "Expense", "lunch")
+    third = Database(path)
+    try:
+        assert len(analytics.snapshot(third)) == 1
+        assert len(analytics.snapshot(first)) == 1
+    finally:
+        for db in (first, second, third):
+            db.close()
+
+
+def test_report_totals_are_exact(tmp_path):
+    db = Database(str(tmp_path / "expenses.db"))
+    big = 2 ** 53 + 1
+    try:
+        food = db.add_category("Food")
+        for day in (1, 2, 3):
+            db.add_transaction(f"2024-03-{day:02d}", big, food, "Expense", "market")
+        report = analytics.build_report(db, 2024, 2024)
+    finally:
+        db.close()
+    total = money.from_minor(3 * big)
+    assert report["categories"][0][:3] == ("Food", total, 3)
+    assert report["merchants"] == [("market", total, 3)]
+    assert report["months"][2][2] == total
+    assert report["years"][0][1:3] == (total, total)
+
+
+def test_breakdown_and_merchants_match_the_rows(db):
+    food = db.add_category("Food")
+    rent = db.add_category("Rent")
+    db.add_transaction("2024-01-05", 1000, food, "Expense", "market")
+    db.add_transaction("2024-02-05", 3000, food, "Expense", "bakery")
+    db.add_transaction("2024-02-01", 6000, rent, "Expense", "landlord")
+    db.add_transaction("2024-02-10", 500, None, "Expense", None)
+    db.add_transaction("2024-02-25", 9900, food, "Income", "refund")
+    db.add_transaction("2023-12-31", 7000, food, "Expense", "market")
+    snap = analytics.load_snapshot(db)
+    start, end = analytics.month_index(2024, 1), analytics.month_index(2024, 2)
+    rows = analytics.category_breakdown(snap, start, end)
+    assert [r[:3] for r in rows] == [
+        ("Rent", money.from_minor(6000), 1),
+        ("Food", money.from_minor(4000), 2),
+        ("Uncategorized", money.from_minor(500), 1),
+    ]
+    assert sum(r[3] for r in rows) == pytest.approx(1.0)
+    assert analytics.top_merchants(snap, start, end, n=2) == [
+        ("landlord", money.from_minor(6000), 1),
+        ("bakery", money.from_minor(3000), 1),
+    ]
+
+
+def test_rolling_mean_averages_what_is_available():
+    np = pytest.importorskip("numpy")
+    values = np.array([10, 20, 30, 40], dtype=np.int64)
+    assert analytics.rolling_mean(values, 3).tolist() == [10.0, 15.0, 20.0, 30.0]
+
+
+def test_year_over_year_compares_with_a_year_before():
+    np = pytest.importorskip("numpy")
+    values = [100] * 12 + [150] + [0] * 11
+    delta, pct = analytics.year_over_year(values)
+    assert np.isnan(delta[:12]).all() and np.isnan(pct[:12]).all()
+    assert delta[12] == 50 and pct[12] == 0.5
+    assert delta[13] == -100 and pct[13] == -1.0
+
+
+def test_report_trend_and_years(db):
+    for month in range(1, 13):
+        db.add_transaction(f"2023-{month:02d}-15", 1000, None, "Expense", None)
+        db.add_transaction(f"2024-{month:02d}-15", 1000 + 100 * month, None, "Expense", None)
+    report = analytics.build_report(db, 2024, 2024)
+    label, income, expense, avg3, avg12, delta, pct = report["months"][2]
+    assert label == "2024-03"
+    assert (income, expense) == (money.from_minor(0), money.from_minor(1300))
+    assert avg3 == pytest.approx((1100 + 1200 + 1300) / 3 / 100)
+    assert avg12 == pytest.approx((9 * 1000 + 1100 + 1200 + 1300) / 12 / 100)
+    assert delta == money.from_minor(300)
+    assert pct == pytest.approx(0.3)
+    year, total, year_delta, year_pct = report["years"][0]
+    assert (year, total, year_delta) == (2024, money.from_minor(12000 + 7800), money.from_minor(7800))
+    assert year_pct == pytest.approx(0.65)
@@ -0,0 +1,133 @@
+import datetime
+
+import pytest
+
+from expense_tracker.models import Database, TransactionFilter
+
+
+def test_archive_keeps_uuid_blobs(tmp_path):
+    db = Database(str(tmp_path / "expenses.db"))
+    year = datetime.date.today().year - 2
+    try:
+        tx_id = db.add_transaction(f"{year}-05-01", 1200, 1, "Expense", "old")
+        uuid = db.conn.execute("SELECT uuid FROM transactions WHERE id = ?", (tx_id,)).fetchone()[0]
+        db.archive_year(year)
+        schema = db._attach(year)
+        declared = {r["name"]: r["type"] for r in db.conn.execute(f"PRAGMA {schema}.table_info(transactions)")}
+        assert declared["uuid"] == "BLOB"
+        db.unarchive_year(year)
+        row = db.conn.execute("SELECT uuid, typeof(uuid) FROM transactions WHERE id = ?", (tx_id,)).fetchone()
+        assert tuple(row) == (uuid, "blob")
+    finally:
+        db.close()
+
+
+def _all_pages(db, flt, sort, descending):
+    rows, after = db.query_page(flt, sort, descending, limit=7)
+    ids = [r["id"] for r in rows]
+    while after is not None:
+        rows, after = db.query_page(flt, sort, descending, after=after, limit=7)
+        ids += [r["id"] for r in rows]
+    return ids
+
+
+def test_filters_reach_archived_years(tmp_path):
+    db = Database(str(tmp_path / "expenses.db"))
+    this_year = datetime.date.today().year
+    try:
+        food, rent = db.add_category("Food"), db.add_category("Rent")
+        words = ["lunch", "rent", None, "train ticket"]
+        for i in range(80):
+            year = this_year - 4 + i % 4
+            t_type = "Income" if i % 5 == 0 else "Expense"
+            category = [food, rent, None][i % 3]
+            db.add_transaction(f"{year}-{1 + i % 12:02d}-{1 + i % 28:02d}", 100 * (i % 9), category, t_type, words[i % 4])
+        filters = [
+            TransactionFilter(),
+            TransactionFilter(start_date=f"{this_year - 3}-03-01", end_date=f"{this_year - 2}-10-31"),
+            TransactionFilter(category_ids=(food, rent)),
+            TransactionFilter(t_type="Expense", min_amount=200),
+            TransactionFilter(text="lunch"),
+        ]
+        sorts = ["date", "amount", "type", "description", "category"]
+        expected = {(f, s, d): _all_pages(db, f, s, d) for f in filters for s in sorts for d in (True, False)}
+        db.archive_year(this_year - 4)
+        db.archive_year(this_year - 2)
+        for (flt, sort, descending), ids in expected.items():
+            assert _all_pages(db, flt, sort, descending) == ids, (flt, sort, descending)
+    finally:
+        db.close()
+
+
+def _ledger(db, years):
+    ids = {}
+    for year in years:
+        for month in (2, 7, 11):
+            ids[(year, month)] = db.add_transaction(f"{year}-{month:02d}-10", 100 * month, 1, "Expense", f"shop {year}")
+        db.add_transaction(f"{year}-12-31", 5000, 1, "Income", "bonus")
+    return ids
+
+
+def _history(db):
+    cursor, out = None, []
+    while True:
+        rows, cursor = db.get_transactions_page(after=cursor, limit=5)
+        out += [(r["id"], r["balance"]) for r in rows]
+        if cursor is None:
+            return out
+
+
+def test_archived_year_reads_like_before(db, tmp_path):
+    this_year = datetime.date.today().year
+    years = [this_year - 3, this_year - 2, this_year - 1]
+    _ledger(db, years)
+    old = years[0]
+    before = {
+        "month": [dict(r) for r in db.get_transactions(old, 7)],
+        "summary": db.get_monthly_summary(old, 7),
+        "page": db.get_transactions_page(old, 7)[0][0]["balance"],
+        "history": _history(db),
+        "balance": db.balance_before(years[1], 1),
+    }
+    assert db.archive_year(old) == 4
+    assert db.archived_years() == {old}
+    assert (tmp_path / "archive" / f"expenses-{old}.db").exists()
+    assert db.conn.execute("SELECT COUNT(*) FROM main.transactions WHERE date LIKE ?", (f"{old}-%",)).fetchone()[0] == 0
+    assert [dict(r) for r in db.get_transactions(old, 7)] == before["month"]
+    assert db.get_monthly_summary(old, 7) == before["summary"]
+    assert db.get_transactions_page(old, 7)[0][0]["balance"] == before["page"]
+    assert _history(db) == before["history"]
+    assert db.balance_before(years[1], 1) == before["balance"]
+    assert db.verify_monthly_totals() == []
+
+
+def test_archived_years_refuse_writes(db):
+    this_year = datetime.date.today().year
+    old = this_year - 2
+    ids = _ledger(db, [old])
+    db.archive_year(old)
+    with pytest.raises(ValueError, match="archived"):
+        db.add_transaction(f"{old}-03-01", 100, 1, "Expense", None)
+    with pytest.raises(ValueError):
+        db.update_transaction(ids[(old, 2)], f"{this_year}-01-01", 100, 1, "Expense", None)
+    with pytest.raises(ValueError):
+        db.delete_transaction(ids[(old, 2)])
+    with pytest.raises(ValueError, match="already archived"):
+        db.archive_year(old)
+    with pytest.raises(ValueError, match="past years"):
+        db.archive_year(this_year)
+    with pytest.raises(ValueError, match="No transactions"):
+        db.archive_year(old - 1)
+
+
+def test_unarchive_brings_the_year_back(db, tmp_path):
+    old = datetime.date.today().year - 2
+    ids = _ledger(db, [old])
+    db.archive_year(old)
+    assert db.unarchive_year(old) == 4
+    assert db.archived_years() == set()
+    assert not (tmp_path / "archive" / f"expenses-{old}.db").exists()
+    assert sorted(r["id"] for r in db.search(f"shop {old}")[0]) == sorted(ids.values())
+    assert db.verify_monthly_totals() == []
+    db.delete_transaction(ids[(old, 2)])
+    assert db.get_monthly_summary(old, 2) == (0, 0, 0)
@@ -0,0 +1,90 @@
+import gzip
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from expense_tracker import backup
+from expense_tracker.backup import BackupCancelled, BackupError, BackupInfo
+from expense_tracker.migrations import LATEST_VERSION
+from expense_tracker.models import Database
+
+
+@pytest.mark.parametrize("compression", backup.available_compressions())
+def test_backup_restores_the_ledger_it_copied(db, tmp_path, compression):
+    for day in range(1, 11):
+        db.add_transaction(f"2024-01-{day:02d}", 100 * day, 1, "Expense", f"row {day}")
+    dest = str(tmp_path / "backups")
+    steps = []
+    result = backup.create_backup(db.db_path, dest, compression, pages_per_step=2, progress=lambda d, t: steps.append((d, t)))
+    assert [b.path for b in backup.list_backups(dest)] == [result.path]
+    assert steps and steps[-1][0] == steps[-1][1]
+    check = backup.verify_backup(result.path)
+    assert check.ok and check.transactions == 10 and check.user_version == LATEST_VERSION
+
+    db.add_transaction("2024-02-01", 5, 1, "Expense", "after the backup")
+    db.close()
+    backup.restore_backup(result.path, db.db_path)
+    restored = Database(db.db_path)
+    try:
+        assert restored.count_transactions() == 10
+        assert restored.get_monthly_summary(2024, 1) == (0, 5500, -5500)
+        assert restored.search("after")[0] == []
+    finally:
+        restored.close()
+
+
+def test_cancelled_backup_leaves_nothing_behind(db, tmp_path):
+    dest = tmp_path / "backups"
+    with pytest.raises(BackupCancelled):
+        backup.create_backup(db.db_path, str(dest), "gzip", is_cancelled=lambda: True)
+    assert os.listdir(dest) == []
+
+
+def test_damaged_snapshot_fails_verification_and_is_not_restored(db, tmp_path):
+    result = backup.create_backup(db.db_path, str(tmp_path / "backups"), "gzip")
+    with open(result.path, "r+b") as f:
+        f.seek(40)
+        f.write(b"\0" * 64)
+    assert not backup.verify_backup(result.path).ok
+    with pytest.raises(BackupError):
+        backup.restore_backup(result.path, db.db_path)
+    assert db.count_transactions() == 0
+
+
+def test_snapshot_from_a_newer_schema_is_refused(tmp_path):
+    raw = str(tmp_path / "newer.db")
+    conn = sqlite3.connect(raw)
+    conn.execute("CREATE TABLE transactions (id INTEGER)")
+    conn.execute(f"PRAGMA user_version = {LATEST_VERSION + 1}")
+    conn.commit()
+    conn.close()
+    snapshot = str(tmp_path / "finly-20240101-000000.db.gz")
+    with open(raw, "rb") as src, gzip.open(snapshot, "wb") as dst:
+        dst.write(src.read())
+    with pytest.raises(BackupError, match="newer"):
+        backup.restore_backup(snapshot, str(tmp_path / "expenses.db"))
+
+
+def test_retention_keeps_the_newest_per_day_week_and_month():
+    start = datetime(2024, 1, 1, 12)
+    backups = [BackupInfo(f"b{i}", start + timedelta(hours=12 * i), 0) for i in range(120)]
+    kept = {b.created for b in backup.retained(backups, daily=3, weekly=2, monthly=2)}
+    newest = backups[-1].created
+    assert newest == datetime(2024, 3, 1)
+    assert kept == {
+        newest,  # also the newest of its day, week and month
+        datetime(2024, 2, 29, 12),  # previous day, and the newest of February
+        datetime(2024, 2, 28, 12),
+        datetime(2024, 2, 25, 12),  # Sunday, the end of the previous ISO week
+    }
+
+
+def test_prune_deletes_what_retention_drops(tmp_path):
+    for stamp in ("20240101-100000", "20240101-110000", "20240102-100000"):
+        (tmp_path / f"finly-{stamp}.db.gz").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("kept")
+    removed = backup.prune(str(tmp_path), daily=2, weekly=0, monthly=0)
+    assert [os.path.basename(p) for p in removed] == ["finly-20240101-100000.db.gz"]
+    assert sorted(os.listdir(tmp_path)) == ["finly-20240101-110000.db.gz", "finly-20240102-100000.db.gz", "notes.txt"]
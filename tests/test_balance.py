@@ -0,0 +1,73 @@
+import random
+
+from expense_tracker.models import Database, signed_amount
+
+
+def test_page_reads_do_not_store_checkpoints(tmp_path):
+    db = Database(str(tmp_path / "expenses.db"))
+    try:
+        for month in range(1, 7):
+            db.add_transaction(f"2024-{month:02d}-10", 1000 * month, 1, "Income", None)
+        count = lambda: db.conn.execute("SELECT COUNT(*) FROM balance_checkpoints").fetchone()[0]
+        rows, _ = db.get_transactions_page(2024, 6)
+        assert rows[0]["balance"] == 21000
+        assert db.balance_before(2024, 6) == 15000
+        assert count() == 0 and not db.conn.in_transaction
+        assert db.store_balance_checkpoints() == 6
+        assert db.balance_before(2024, 6) == 15000
+        assert db.store_balance_checkpoints() == 0
+    finally:
+        db.close()
+
+
+def _expected_balances(db):
+    # id -> balance after the row over all history, oldest first.
+    running = 0
+    out = {}
+    for r in db.conn.execute("SELECT id, amount, type FROM transactions ORDER BY date, id"):
+        running += signed_amount(r)
+        out[r["id"]] = running
+    return out
+
+
+def _page_through(db, year=None, month=None, limit=5):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = db.get_transactions_page(year, month, after=cursor, limit=limit)
+        seen += [(r["id"], r["balance"]) for r in rows]
+        if cursor is None:
+            return seen
+
+
+def _random_ledger(db, seed):
+    rng = random.Random(seed)
+    with db.transaction():
+        for _ in range(120):
+            date = f"2024-{rng.randint(1, 5):02d}-{rng.randint(1, 28):02d}"
+            db.add_transaction(date, rng.randint(1, 9000), 1, rng.choice(["Income", "Expense"]), None)
+
+
+def test_balances_match_a_running_sum_across_pages_and_months(db):
+    _random_ledger(db, 21)
+    expected = _expected_balances(db)
+    sql = "SELECT id FROM transactions WHERE date LIKE ? ORDER BY date DESC, id DESC"
+    for month in range(1, 6):
+        ids = [r["id"] for r in db.conn.execute(sql, (f"2024-{month:02d}-%",))]
+        assert _page_through(db, 2024, month) == [(tx_id, expected[tx_id]) for tx_id in ids]
+    assert _page_through(db, limit=17) == list(reversed(expected.items()))
+
+
+def test_checkpoints_follow_writes_to_earlier_months(db):
+    _random_ledger(db, 22)
+    db.store_balance_checkpoints()
+    db.add_transaction("2024-01-03", 777, 1, "Expense", None)
+    first = db.conn.execute("SELECT id, amount, type FROM transactions ORDER BY date, id LIMIT 1").fetchone()
+    db.update_transaction(first["id"], "2024-02-01", first["amount"] + 5, 1, first["type"], None)
+    expected = _expected_balances(db)
+    for month in (3, 4, 5):
+        rows, _ = db.get_transactions_page(2024, month, limit=1)
+        assert rows[0]["balance"] == expected[rows[0]["id"]]
+    last_of_april = db.conn.execute(
+        "SELECT id FROM transactions WHERE date < '2024-05-01' ORDER BY date DESC, id DESC LIMIT 1"
+    ).fetchone()[0]
+    assert db.balance_before(2024, 5) == expected[last_of_april]
@@ -0,0 +1,56 @@
+from expense_tracker.models import BudgetStatus
+
+
+def _status(db, year, month):
+    return {b.category: (b.limit, b.spent, b.count) for b in db.get_budget_status(year, month)}
+
+
+def test_spending_follows_every_write(db):
+    food = db.add_category("Food")
+    db.set_budget(food, 10000)
+    lunch = db.add_transaction("2024-03-02", 1500, food, "Expense", "lunch")
+    db.add_transaction("2024-03-03", 2500, food, "Expense", "market")
+    db.add_transaction("2024-03-04", 9900, food, "Income", "refund")
+    db.add_transaction("2024-04-01", 700, food, "Expense", "april")
+    assert _status(db, 2024, 3) == {"Food": (10000, 4000, 2)}
+    db.update_transaction(lunch, "2024-03-02", 2000, food, "Expense", "lunch")
+    assert _status(db, 2024, 3) == {"Food": (10000, 4500, 2)}
+    db.update_transaction(lunch, "2024-03-02", 2000, 1, "Expense", "lunch")
+    assert _status(db, 2024, 3) == {"Food": (10000, 2500, 1)}
+    db.update_transaction(lunch, "2024-04-02", 2000, food, "Expense", "lunch")
+    assert _status(db, 2024, 4) == {"Food": (10000, 2700, 2)}
+    db.delete_transaction(lunch)
+    assert _status(db, 2024, 4) == {"Food": (10000, 700, 1)}
+
+
+def test_a_months_own_limit_wins_over_the_standing_one(db):
+    food = db.add_category("Food")
+    rent = db.add_category("Rent")
+    db.set_budget(food, 10000)
+    db.set_budget(food, 25000, 2024, 12)
+    db.set_budget(rent, 90000, 2024, 12)
+    assert db.get_budgets(2024, 12) == {food: (10000, 25000), rent: (None, 90000)}
+    assert _status(db, 2024, 12) == {"Food": (25000, 0, 0), "Rent": (90000, 0, 0)}
+    assert _status(db, 2024, 11) == {"Food": (10000, 0, 0)}
+    db.set_budget(food, None, 2024, 12)
+    assert _status(db, 2024, 12) == {"Food": (10000, 0, 0), "Rent": (90000, 0, 0)}
+    db.set_budget(food, None)
+    assert _status(db, 2024, 11) == {}
+
+
+def test_most_used_budgets_come_first(db):
+    food = db.add_category("Food")
+    rent = db.add_category("Rent")
+    db.set_budget(food, 1000)
+    db.set_budget(rent, 1000)
+    db.add_transaction("2024-03-01", 400, food, "Expense", None)
+    db.add_transaction("2024-03-01", 1200, rent, "Expense", None)
+    rows = db.get_budget_status(2024, 3)
+    assert [b.category for b in rows] == ["Rent", "Food"]
+    assert rows[0].over() and rows[0].remaining() == -200
+    assert not rows[1].over() and rows[1].utilization() == 0.4
+
+
+def test_budget_status_arithmetic():
+    status = BudgetStatus(1, "Food", 5000, 5000, 3)
+    assert status.remaining() == 0 and not status.over() and status.utilization() == 1.0
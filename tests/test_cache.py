@@ -0,0 +1,71 @@
+import sqlite3
+
+from expense_tracker.cache import QueryCache
+from expense_tracker.models import Database
+
+
+def test_repeated_reads_hit_the_cache(db):
+    db.add_transaction("2024-01-01", 100, 1, "Expense", None)
+    first = db.get_monthly_summary(2024, 1)
+    hits = db.cache_stats()["hits"]
+    assert db.get_monthly_summary(2024, 1) is first
+    assert db.cache_stats()["hits"] == hits + 1
+
+
+def test_writes_invalidate_only_dependent_entries(db):
+    db.get_categories()
+    db.get_monthly_summary(2024, 1)
+    db.add_transaction("2024-01-01", 100, 1, "Expense", None)
+    assert db.get_monthly_summary(2024, 1) == (0, 100, -100)
+    hits = db.cache_stats()["hits"]
+    db.get_categories()
+    assert db.cache_stats()["hits"] == hits + 1
+
+
+def test_commits_from_another_connection_drop_the_cache(db):
+    assert db.get_monthly_summary(2024, 1) == (0, 0, 0)
+    other = sqlite3.connect(db.db_path)
+    other.execute(
+        "INSERT INTO transactions (date, amount, category_id, type, description) "
+        "VALUES ('2024-01-05', 250, 1, 'Income', 'elsewhere')"
+    )
+    other.commit()
+    other.close()
+    assert db.get_monthly_summary(2024, 1) == (250, 0, 250)
+
+
+def test_connections_sharing_a_cache_see_each_others_writes(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    cache = QueryCache()
+    writer = Database(path, cache=cache)
+    reader = Database(path, readonly=True, cache=cache)
+    try:
+        assert reader.get_monthly_summary(2024, 1) == (0, 0, 0)
+        writer.add_transaction("2024-01-01", 100, 1, "Income", None)
+        assert reader.get_monthly_summary(2024, 1) == (100, 0, 100)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_cache_evicts_least_recently_used_entries():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", (0,), 1)
+    cache.put("b", (0,), 2)
+    assert cache.get("a", ("t",)) == (True, 1)
+    cache.put("c", (0,), 3)
+    assert cache.get("b", ("t",)) == (False, None)
+    assert cache.get("a", ("t",)) == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_a_bumped_table_makes_its_entries_stale():
+    cache = QueryCache()
+    cache.put("q", cache.generations(("t", "*")), "value")
+    cache.bump(["other"])
+    assert cache.get("q", ("t", "*")) == (True, "value")
+    cache.bump(["t"])
+    assert cache.get("q", ("t", "*")) == (False, None)
+    cache.put("q", cache.generations(("t", "*")), "value")
+    cache.bump_all()
+    assert cache.get("q", ("t", "*")) == (False, None)
@@ -0,0 +1,72 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import pytest
+
+from expense_tracker import cli
+from expense_tracker import main as app_main
+from expense_tracker.models import Database
+
+
+def test_gui_opens_the_db_given(tmp_path, monkeypatch):
+    seen = []
+    monkeypatch.setattr(app_main, "main", seen.append)
+    path = str(tmp_path / "other.sqlite")
+    assert cli.main(["--db", path, "gui"]) == 0
+    assert seen == [["--db", path]]
+    assert not (tmp_path / "other.sqlite").exists()
+
+
+def test_add_to_archived_year_is_refused(tmp_path, capsys):
+    path = str(tmp_path / "expenses.db")
+    year = datetime.date.today().year - 2
+    db = Database(path)
+    db.add_transaction(f"{year}-05-01", 1200, 1, "Expense", "old")
+    db.archive_year(year)
+    db.close()
+    assert cli.main(["--db", path, "add", "3.50", "late", "--date", f"{year}-06-01"]) == 1
+    assert f"{year} is archived" in capsys.readouterr().err
+
+
+def test_add_then_summary_and_query(tmp_path, capsys):
+    path = str(tmp_path / "expenses.db")
+    assert cli.main(["--db", path, "add", "12.50", "lunch", "--date", "2024-03-02"]) == 0
+    assert cli.main(["--db", path, "add", "1000", "salary", "--date", "2024-03-01", "--type", "Income"]) == 0
+    capsys.readouterr()
+    assert cli.main(["--db", path, "summary", "2024-03"]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "2024-03"
+    assert out[1:] == ["Income:        1000.00", "Expenses:        12.50", "Balance:        987.50"]
+    assert cli.main(["--db", path, "query", "--month", "2024-03"]) == 0
+    lines = [line.split("\t") for line in capsys.readouterr().out.splitlines()]
+    assert [line[1:] for line in lines] == [
+        ["2024-03-02", "12.50", "Expense", "Uncategorized", "lunch"],
+        ["2024-03-01", "1000.00", "Income", "Uncategorized", "salary"],
+    ]
+    assert cli.main(["--db", path, "query", "--search", "lun"]) == 0
+    assert capsys.readouterr().out.split("\t")[-1].strip() == "lunch"
+
+
+def test_add_with_an_unknown_category_fails(tmp_path, capsys):
+    assert cli.main(["--db", str(tmp_path / "expenses.db"), "add", "1", "--category", "Nope"]) == 1
+    assert "Unknown category: Nope" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("argv", [["add", "abc"], ["summary", "2024-13"], ["add", "1", "--date", "yesterday"]])
+def test_malformed_arguments_exit_with_usage(tmp_path, argv):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--db", str(tmp_path / "expenses.db")] + argv)
+    assert exc.value.code == 2
+
+
+def test_cli_does_not_import_qt_or_the_exporters(tmp_path):
+    code = (
+        "import sys; from expense_tracker import cli; "
+        f"cli.main(['--db', {str(tmp_path / 'expenses.db')!r}, 'summary']); "
+        "print(sorted(m for m in sys.modules if m.startswith(('PySide6', 'expense_tracker.exporters', 'numpy'))))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert out.splitlines()[-1] == "[]"
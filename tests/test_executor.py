@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from expense_tracker.executor import DatabaseExecutor
+
+
+@pytest.fixture
+def executor(tmp_path):
+    ex = DatabaseExecutor(str(tmp_path / "expenses.db"))
+    yield ex
+    ex.shutdown()
+
+
+def test_reads_use_read_only_connections(executor):
+    assert executor.read(lambda db: db.readonly).result() is True
+    assert executor.write(lambda db: db.readonly).result() is False
+    with pytest.raises(sqlite3.OperationalError):
+        executor.read(lambda db: db.add_category("Nope")).result()
+
+
+def test_writes_run_in_order_on_one_thread(executor):
+    threads = set()
+
+    def add(db, i):
+        threads.add(threading.current_thread().name)
+        return db.add_transaction("2024-03-01", i + 1, 1, "Expense", str(i))
+
+    futures = [executor.write(lambda db, i=i: add(db, i)) for i in range(20)]
+    ids = [f.result() for f in futures]
+    assert ids == sorted(ids)
+    assert len(threads) == 1 and threads.pop().startswith("finly-db-writer")
+    rows = executor.read(lambda db: db.get_transactions(2024, 3)).result()
+    assert sorted(r["description"] for r in rows) == sorted(str(i) for i in range(20))
+
+
+def test_a_failed_read_reaches_the_caller(executor):
+    def fail(db):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        executor.read(fail).result()
+    # The reader is still usable afterwards.
+    assert executor.read(lambda db: len(db.get_categories())).result() == 1
+
+
+def test_results_are_delivered_on_the_watcher_thread(executor, qapp):
+    from expense_tracker.workers import FutureWatcher
+
+    watcher = FutureWatcher()
+    got = []
+    on_name = lambda name: got.append((name, threading.current_thread()))  # noqa: E731
+    watcher.watch(executor.read(lambda db: threading.current_thread().name), on_name)
+    watcher.watch(executor.read(lambda db: 1 / 0), got.append, lambda exc: got.append(type(exc)))
+    for _ in range(500):
+        qapp.processEvents()
+        if len(got) == 2:
+            break
+        time.sleep(0.01)
+    assert ZeroDivisionError in got
+    (name, thread), = [g for g in got if isinstance(g, tuple)]
+    assert name.startswith("finly-db-reader") and thread is threading.main_thread()
@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import sqlite3
+
+import pytest
+
+from expense_tracker import workers
+from expense_tracker.exporters import COLUMNS, ExportCancelled, available_formats, export_transactions
+from expense_tracker.models import Database
+
+
+def test_export_worker_reads_without_the_write_lock(tmp_path, monkeypatch):
+    path = str(tmp_path / "expenses.db")
+    db = Database(path)
+    db.add_transaction("2024-03-01", 1250, 1, "Expense", "lunch")
+    db.close()
+    opened = []
+
+    def database(*args, **kwargs):
+        conn = Database(*args, **kwargs)
+        opened.append(conn.readonly)
+        return conn
+
+    monkeypatch.setattr(workers, "Database", database)
+    # Another connection is in the middle of a write.
+    writer = sqlite3.connect(path, timeout=0)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        worker = workers.ExportWorker(path, str(tmp_path / "out.jsonl"), "jsonl")
+        done = []
+        worker.signals.finished.connect(done.append)
+        worker.signals.failed.connect(done.append)
+        worker.run()
+    finally:
+        writer.rollback()
+        writer.close()
+    assert opened == [True]
+    assert done == [1]
+    rows = [json.loads(line) for line in open(tmp_path / "out.jsonl")]
+    assert [r["description"] for r in rows] == ["lunch"]
+
+
+def _ledger(db, n=12):
+    food = db.add_category("Food")
+    for i in range(n):
+        db.add_transaction(f"2024-01-{1 + i:02d}", 1005 * (i + 1), food if i % 2 else None, "Expense", f"item {i}")
+
+
+def test_csv_export_streams_every_row_with_progress(db, tmp_path):
+    _ledger(db)
+    out = tmp_path / "out.csv"
+    progress = []
+    written = export_transactions(db, str(out), chunk_size=5, progress=lambda done, total: progress.append((done, total)))
+    assert written == 12
+    assert progress == [(5, 12), (10, 12), (12, 12)]
+    with open(out, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == COLUMNS
+    assert sorted(r[2] for r in rows[1:])[:2] == ["10.05", "100.50"]
+    assert not os.path.exists(str(out) + ".part")
+
+
+def test_cancelled_export_leaves_no_file(db, tmp_path):
+    _ledger(db)
+    out = tmp_path / "out.jsonl"
+    with pytest.raises(ExportCancelled):
+        export_transactions(db, str(out), chunk_size=5, is_cancelled=lambda: True)
+    assert not out.exists() and not os.path.exists(str(out) + ".part")
+
+
+def test_jsonl_amounts_are_decimal_text(db, tmp_path):
+    db.add_transaction("2024-01-01", 1234, 1, "Income", "pay")
+    out = tmp_path / "out.jsonl"
+    export_transactions(db, str(out))
+    record = json.loads(open(out).read())
+    assert (record["amount"], record["category"], record["description"]) == (12.34, "Uncategorized", "pay")
+
+
+@pytest.mark.skipif("parquet" not in available_formats(), reason="needs pyarrow")
+def test_parquet_keeps_exact_decimals(db, tmp_path):
+    import pyarrow.parquet as pq
+
+    _ledger(db, 3)
+    out = tmp_path / "out.parquet"
+    export_transactions(db, str(out))
+    table = pq.read_table(out)
+    assert sorted(str(a) for a in table.column("amount").to_pylist()) == ["10.05", "20.10", "30.15"]
@@ -0,0 +1,123 @@
+import datetime
+
+import pytest
+
+from expense_tracker.importers import StatementError, import_file, parse_csv, parse_qif
+from expense_tracker.models import Database
+
+
+def test_import_same_date_with_missing_fields(tmp_path):
+    # Rows that tie on date (and amount) while description or category is
+    # None on some of them must not break the batch ordering.
+    db = Database(str(tmp_path / "expenses.db"))
+    rows = [
+        ("2024-03-01", 500, None, "Expense", None, 1),
+        ("2024-03-01", 500, "Food", "Expense", "coffee", 2),
+        ("2024-03-01", 500, None, "Expense", "tea", 3),
+        ("2024-03-01", 500, "Food", "Expense", None, 4),
+    ]
+    try:
+        assert db.import_transactions(rows, batch_size=2) == (4, 4, 0)
+        assert db.import_transactions(rows) == (4, 0, 0)
+        assert len(db.get_transactions(2024, 3)) == 4
+    finally:
+        db.close()
+
+
+_OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKACCTFROM><BANKID>{bank}<ACCTID>{account}<ACCTTYPE>CHECKING</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240301<TRNAMT>-5.00<FITID>1<NAME>coffee</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240302<TRNAMT>-7.00<FITID>2<NAME>lunch</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_refs_are_kept_apart_per_account(tmp_path):
+    # Banks number FITIDs per account, so the same ids in another account's
+    # statement are other transactions.
+
+    db = Database(str(tmp_path / "expenses.db"))
+    paths = []
+    for account in ("111", "222"):
+        path = tmp_path / f"{account}.ofx"
+        path.write_text(_OFX.format(bank="99", account=account), encoding="latin-1")
+        paths.append(str(path))
+    try:
+        assert import_file(db, paths[0]).inserted == 2
+        assert import_file(db, paths[1]).inserted == 2
+        assert import_file(db, paths[0]).skipped == 2
+        qif = tmp_path / "card.qif"
+        qif.write_text("!Type:Bank\nD03/01/2024\nT-5.00\nN1\nPcoffee\n^\n", encoding="utf-8")
+        assert import_file(db, str(qif), account="card").inserted == 1
+        assert import_file(db, str(qif), account="savings").inserted == 1
+        assert import_file(db, str(qif), account="card").inserted == 0
+    finally:
+        db.close()
+
+
+def test_rows_in_archived_years_are_reported_as_refused(tmp_path):
+    year = datetime.date.today().year - 2
+    db = Database(str(tmp_path / "expenses.db"))
+    try:
+        db.add_transaction(f"{year}-01-05", 100, 1, "Expense", "old")
+        db.archive_year(year)
+        path = tmp_path / "statement.csv"
+        path.write_text(f"date,amount,description\n{year}-02-01,-5.00,late\n{year + 1}-02-01,-7.00,new\n")
+        first = import_file(db, str(path))
+        again = import_file(db, str(path))
+    finally:
+        db.close()
+    assert (first.read, first.inserted, first.skipped, first.refused) == (2, 1, 0, 1)
+    assert (again.inserted, again.skipped, again.refused) == (0, 1, 1)
+    assert first.summary() == "1 imported, 0 duplicates skipped, 1 refused (dated in an archived year)"
+
+
+def test_csv_debit_credit_columns_and_date_formats(tmp_path):
+    path = tmp_path / "bank.csv"
+    path.write_text(
+        "Posting Date,Payee,Money Out,Money In,Category\n"
+        "03/01/2024,Coffee,4.50,,Food\n"
+        "03/02/2024,Salary,,\"1,200.00\",\n"
+        "03/02/2024,Refund,(2.25),,\n"
+    )
+    rows = list(parse_csv(str(path), date_format="%m/%d/%Y"))
+    assert [tuple(r[:5]) for r in rows] == [
+        ("2024-03-01", 450, "Expense", "Food", "Coffee"),
+        ("2024-03-02", 120000, "Income", None, "Salary"),
+        ("2024-03-02", 225, "Expense", None, "Refund"),
+    ]
+
+
+def test_csv_errors_name_the_line(tmp_path):
+    path = tmp_path / "bank.csv"
+    path.write_text("date,amount\n2024-03-01,1.00\nyesterday,2.00\n")
+    with pytest.raises(StatementError, match="line 3"):
+        list(parse_csv(str(path)))
+    path.write_text("when,amount\n2024-03-01,1.00\n")
+    with pytest.raises(StatementError):
+        list(parse_csv(str(path)))
+
+
+def test_qif_splits_memo_and_transfers(tmp_path):
+    path = tmp_path / "bank.qif"
+    path.write_text(
+        "!Type:Bank\n"
+        "D1/ 2'24\nT-12.34\nPShop\nMweekly\nLFood:Groceries\nN101\n^\n"
+        "D1/ 3'24\nT50.00\nPFrom savings\nL[Savings]\n^\n"
+    )
+    rows = list(parse_qif(str(path)))
+    assert [tuple(r[:6]) for r in rows] == [
+        ("2024-01-02", 1234, "Expense", "Food", "Shop weekly", "101"),
+        ("2024-01-03", 5000, "Income", None, "From savings", None),
+    ]
+
+
+def test_identical_lines_are_kept_and_reimport_skips_them(db, tmp_path):
+    path = tmp_path / "bank.csv"
+    path.write_text("date,amount,description\n2024-03-01,-3.00,coffee\n2024-03-01,-3.00,coffee\n")
+    assert import_file(db, str(path)).summary() == "2 imported, 0 duplicates skipped"
+    assert import_file(db, str(path)).summary() == "0 imported, 2 duplicates skipped"
+    assert db.get_monthly_summary(2024, 3) == (0, 600, -600)
+    assert [r["description"] for r in db.search("coffee")[0]] == ["coffee", "coffee"]
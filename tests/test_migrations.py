@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from expense_tracker import migrations, money
+from expense_tracker.models import Database
+
+# The schema the app created before migrations existed.
+BASELINE_SCHEMA = """
+CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category_id INTEGER,
+    type TEXT NOT NULL CHECK (type IN ('Income','Expense')),
+    description TEXT,
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+);
+INSERT INTO categories (id, name) VALUES (1, 'Uncategorized'), (2, 'Food');
+INSERT INTO transactions (date, amount, category_id, type, description) VALUES
+    ('2023-12-30', 1000.0, 1, 'Income', 'salary'),
+    ('2024-01-05', 12.5, 2, 'Expense', 'lunch'),
+    ('2024-01-06', 0.1, NULL, 'Expense', NULL);
+"""
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = str(tmp_path / "expenses.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    return path
+
+
+def _indexes(conn):
+    sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions'"
+    return {r[0] for r in conn.execute(sql)}
+
+
+def test_unversioned_file_is_adopted_and_indexed(baseline):
+    conn = sqlite3.connect(baseline)
+    try:
+        assert migrations.get_version(conn) == 0
+        assert migrations.migrate(conn, target=2) == 2
+        assert migrations.get_version(conn) == 2
+        assert {"idx_transactions_date", "idx_transactions_type_date_amount"} <= _indexes(conn)
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 3
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM transactions WHERE date = '2024-01-05'").fetchall()
+        assert "idx_transactions_date" in " ".join(r[-1] for r in plan)
+    finally:
+        conn.close()
+
+
+def test_existing_database_migrates_to_latest(baseline):
+    db = Database(baseline)
+    try:
+        assert migrations.get_version(db.conn) == migrations.LATEST_VERSION
+        rows = db.get_transactions()
+        assert [(r["date"], r["amount"], r["description"]) for r in rows] == [
+            ("2024-01-06", 10, None),
+            ("2024-01-05", 1250, "lunch"),
+            ("2023-12-30", 100000, "salary"),
+        ]
+        assert db.get_monthly_summary(2024, 1) == (0, 1260, -1260)
+        assert [r["id"] for r in db.search("lunch")[0]] == [rows[1]["id"]]
+    finally:
+        db.close()
+    # Opening it again finds nothing left to do.
+    db = Database(baseline)
+    try:
+        assert len(db.get_transactions()) == 3
+    finally:
+        db.close()
+
+
+def test_failed_migration_leaves_the_last_applied_version(baseline, monkeypatch):
+    def broken(cur):
+        cur.execute("CREATE TABLE half_done (x)")
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:2] + [(3, "broken", broken)])
+    conn = sqlite3.connect(baseline)
+    try:
+        with pytest.raises(RuntimeError):
+            migrations.migrate(conn, target=3)
+        assert migrations.get_version(conn) == 2
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    finally:
+        conn.close()
+
+
+def test_newer_schema_is_refused(baseline):
+    conn = sqlite3.connect(baseline)
+    try:
+        conn.execute(f"PRAGMA user_version = {migrations.LATEST_VERSION + 1}")
+        with pytest.raises(RuntimeError):
+            migrations.migrate(conn)
+    finally:
+        conn.close()
+
+
+def test_real_amounts_become_exact_minor_units(baseline):
+    conn = sqlite3.connect(baseline)
+    try:
+        conn.execute("INSERT INTO transactions (date, amount, type) VALUES ('2024-02-01', 19.99, 'Expense')")
+        conn.execute("INSERT INTO transactions (date, amount, type) VALUES ('2024-02-02', 1.0, 'Expense')")
+        conn.execute("DELETE FROM transactions WHERE date = '2024-02-02'")
+        conn.commit()
+        migrations.migrate(conn, target=6)
+        ids = [r[0] for r in conn.execute("SELECT id FROM transactions ORDER BY id")]
+        migrations.migrate(conn, target=7)
+        rows = conn.execute("SELECT id, typeof(amount), amount FROM transactions ORDER BY id").fetchall()
+        assert [r[0] for r in rows] == ids
+        assert {r[1] for r in rows} == {"integer"}
+        assert [r[2] for r in rows] == [100000, 1250, 10, 1999]
+        exponent = conn.execute("SELECT value FROM settings WHERE key = ?", (migrations.CURRENCY_EXPONENT_KEY,))
+        assert exponent.fetchone()[0] == money.EXPONENT
+        # The deleted row's id is not handed out again.
+        conn.execute("INSERT INTO transactions (date, amount, type) VALUES ('2024-02-03', 1, 'Expense')")
+        assert conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] == 6
+    finally:
+        conn.close()
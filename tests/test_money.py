@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+import pytest
+
+from expense_tracker import money
+
+
+@pytest.mark.parametrize(
+    "value, minor",
+    [
+        ("12.34", 1234),
+        ("0,5", 50),
+        (19.99, 1999),
+        (0.1, 10),
+        (7, 700),
+        (Decimal("1.005"), 101),
+        ("-1.005", -101),
+        ("2.675", 268),
+        (" 3 ", 300),
+    ],
+)
+def test_to_minor_rounds_half_away_from_zero(value, minor):
+    assert money.to_minor(value) == minor
+
+
+@pytest.mark.parametrize("value", ["", "abc", "1.2.3", "nan", "inf"])
+def test_to_minor_refuses_non_amounts(value):
+    with pytest.raises(ValueError):
+        money.to_minor(value)
+
+
+@pytest.mark.parametrize("minor, text", [(0, "0.00"), (5, "0.05"), (-5, "-0.05"), (123450, "1234.50"), (-100, "-1.00")])
+def test_format_minor(minor, text):
+    assert money.format_minor(minor) == text
+    assert str(money.from_minor(minor)) == text
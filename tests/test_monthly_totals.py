@@ -0,0 +1,55 @@
+import random
+
+
+def _summary_by_scan(db, year, month):
+    rows = db.get_transactions(year, month)
+    income = sum(r["amount"] for r in rows if r["type"] == "Income")
+    expense = sum(r["amount"] for r in rows if r["type"] == "Expense")
+    return income, expense, income - expense
+
+
+def test_aggregates_follow_every_write(db):
+    rng = random.Random(3)
+    food = db.add_category("Food")
+    ids = []
+    for step in range(300):
+        op = rng.random()
+        if op < 0.6 or not ids:
+            date = f"2024-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}"
+            t_type = rng.choice(["Income", "Expense"])
+            ids.append(db.add_transaction(date, rng.randint(1, 5000), rng.choice([1, food, None]), t_type, None))
+        elif op < 0.85:
+            tx_id = rng.choice(ids)
+            date = f"2024-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}"
+            t_type = rng.choice(["Income", "Expense"])
+            db.update_transaction(tx_id, date, rng.randint(1, 5000), rng.choice([1, food]), t_type, "x")
+        else:
+            db.delete_transaction(ids.pop(rng.randrange(len(ids))))
+    assert db.verify_monthly_totals() == []
+    for month in range(1, 6):
+        assert db.get_monthly_summary(2024, month) == _summary_by_scan(db, 2024, month)
+
+
+def test_trends_fill_empty_months_and_sum_years(db):
+    db.add_transaction("2023-11-10", 2000, 1, "Income", None)
+    db.add_transaction("2024-01-03", 500, 1, "Expense", None)
+    db.add_transaction("2024-01-20", 300, 1, "Expense", None)
+    assert db.get_monthly_trend(2023, 11, 2024, 1) == [
+        ("2023-11", 2000, 0, 2000),
+        ("2023-12", 0, 0, 0),
+        ("2024-01", 0, 800, -800),
+    ]
+    assert [tuple(r) for r in db.get_yearly_trend(2022, 2024)] == [
+        ("2022", 0, 0, 0),
+        ("2023", 2000, 0, 2000),
+        ("2024", 0, 800, -800),
+    ]
+
+
+def test_rebuild_repairs_drifted_totals(db):
+    db.add_transaction("2024-02-01", 700, 1, "Expense", None)
+    db.conn.execute("UPDATE monthly_totals SET total = total + 1")
+    db.conn.commit()
+    assert db.verify_monthly_totals() == [("2024-02", "Expense", 1, 701, 700)]
+    db.rebuild_monthly_totals()
+    assert db.verify_monthly_totals() == []
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from expense_tracker.executor import DatabaseExecutor
+from expense_tracker.prefetch import MonthPrefetcher, adjacent_months
+
+
+@pytest.fixture
+def executor(tmp_path):
+    executor = DatabaseExecutor(str(tmp_path / "expenses.db"))
+    yield executor
+    executor.shutdown()
+
+
+def _settle(prefetcher):
+    # _store runs as a done callback, possibly just after result() returns.
+    deadline = time.monotonic() + 5
+    while prefetcher._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _warm(prefetcher, year, month):
+    prefetcher.prefetch_around(year, month)
+    _settle(prefetcher)
+    return prefetcher.take(year, month)
+
+
+def test_adjacent_months_alternate_outwards_across_years():
+    assert list(adjacent_months(2024, 1, radius=2)) == [(2023, 12), (2024, 2), (2023, 11), (2024, 3)]
+
+
+def test_warm_months_hold_what_the_table_would_load(executor):
+    executor.write(lambda db: db.add_transaction("2024-02-10", 700, 1, "Expense", "x")).result()
+    prefetcher = MonthPrefetcher(executor, page_size=50, radius=1)
+    prefetcher.prefetch_around(2024, 3)
+    _settle(prefetcher)
+    (rows, cursor), summary = prefetcher.take(2024, 2)
+    assert [r["amount"] for r in rows] == [700]
+    assert cursor is None
+    assert summary == (0, 700, -700)
+    assert prefetcher.take(2024, 4) is not None
+    assert prefetcher.hits == 2
+
+
+def test_warm_month_is_dropped_after_a_write(executor):
+    prefetcher = MonthPrefetcher(executor, page_size=50, radius=0)
+    assert _warm(prefetcher, 2024, 3) is not None
+    executor.write(lambda db: db.add_transaction("2024-03-01", 100, 1, "Expense", None)).result()
+    assert prefetcher.take(2024, 3) is None
+
+
+def test_warm_month_is_dropped_when_a_recurring_rule_changes(executor):
+    prefetcher = MonthPrefetcher(executor, page_size=50, radius=0)
+    assert _warm(prefetcher, 2024, 3) is not None
+    executor.write(lambda db: db.add_recurring_rule("2024-01-15", 900, 1, "Expense", "rent")).result()
+    assert prefetcher.take(2024, 3) is None
+
+
+def test_only_the_most_recent_months_are_kept(executor):
+    prefetcher = MonthPrefetcher(executor, page_size=50, keep=2, radius=0)
+    for month in (1, 2, 3):
+        _warm(prefetcher, 2024, month)
+    assert prefetcher.take(2024, 1) is None
+    assert prefetcher.take(2024, 3) is not None
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from expense_tracker.models import TransactionFilter
+
+DESCRIPTIONS = ["coffee shop", "coffee beans", "tea shop", "rent", None]
+
+
+@pytest.fixture
+def ledger(db):
+    rng = random.Random(11)
+    categories = {None: "", 1: "Uncategorized"}
+    for name in ("Food", "Home"):
+        categories[db.add_category(name)] = name
+    ids = list(categories)
+    with db.transaction():
+        for _ in range(150):
+            db.add_transaction(
+                f"2024-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}",
+                rng.choice([100, 250, 999, rng.randint(1, 5000)]),
+                rng.choice(ids),
+                rng.choice(["Income", "Expense"]),
+                rng.choice(DESCRIPTIONS),
+            )
+    rows = [dict(r) for r in db.conn.execute("SELECT * FROM transactions")]
+    for r in rows:
+        r["category"] = categories[r["category_id"]]
+    return db, rows
+
+
+SORTS = {
+    "date": lambda r: (r["date"], r["id"]),
+    "amount": lambda r: (r["amount"], r["id"]),
+    "type": lambda r: (r["type"], r["date"], r["amount"], r["id"]),
+    "description": lambda r: (r["description"] or "", r["id"]),
+    "category": lambda r: (r["category"], r["date"], r["id"]),
+}
+
+
+def _matches(flt, r):
+    return (
+        (flt.start_date is None or r["date"] >= flt.start_date)
+        and (flt.end_date is None or r["date"] <= flt.end_date)
+        and (flt.category_ids is None or r["category_id"] in flt.category_ids)
+        and (flt.t_type is None or r["type"] == flt.t_type)
+        and (flt.min_amount is None or r["amount"] >= flt.min_amount)
+        and (flt.max_amount is None or r["amount"] <= flt.max_amount)
+        and (flt.text is None or flt.text in (r["description"] or "").split())
+    )
+
+
+def _all_pages(db, flt, sort, descending, limit):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = db.query_page(flt, sort, descending, after=cursor, limit=limit)
+        ids += [r["id"] for r in rows]
+        if cursor is None:
+            return ids
+
+
+FILTERS = [
+    TransactionFilter(),
+    TransactionFilter(start_date="2024-02-10", end_date="2024-04-03"),
+    TransactionFilter(category_ids=(2,)),
+    TransactionFilter(category_ids=(1, 3), t_type="Expense"),
+    TransactionFilter(min_amount=250, max_amount=999),
+    TransactionFilter(text="coffee", t_type="Income"),
+]
+
+
+@pytest.mark.parametrize("flt", FILTERS)
+@pytest.mark.parametrize("sort", sorted(SORTS))
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_match_a_brute_force_filter_and_sort(ledger, flt, sort, descending):
+    db, rows = ledger
+    expected = [r["id"] for r in sorted((r for r in rows if _matches(flt, r)), key=SORTS[sort], reverse=descending)]
+    assert _all_pages(db, flt, sort, descending, limit=7) == expected
+
+
+def test_empty_filter_is_empty():
+    assert TransactionFilter().is_empty()
+    assert not TransactionFilter(t_type="Income").is_empty()
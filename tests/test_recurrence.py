@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from expense_tracker.recurrence import Rule
+
+
+def _rule(start, interval=1, day=None, end=None, amount=100, changes=()):
+    return Rule(1, start, interval, day or int(start[8:]), end, amount, None, "Expense", "rent", tuple(changes))
+
+
+def test_days_past_the_end_of_a_month_fall_on_its_last_day():
+    rule = _rule("2024-01-31")
+    assert list(rule.occurrences("2024-01-01", "2024-06-01")) == [
+        "2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30", "2024-05-31",
+    ]
+    assert list(rule.occurrences("2024-01-01", "2024-06-01", reverse=True))[0] == "2024-05-31"
+
+
+def test_interval_and_inclusive_end_date():
+    rule = _rule("2024-02-15", interval=3, end="2024-11-15")
+    assert list(rule.occurrences("2000-01-01", "2100-01-01")) == ["2024-02-15", "2024-05-15", "2024-08-15", "2024-11-15"]
+    assert rule.next_from("2024-05-16") == "2024-08-15"
+    assert rule.next_from("2024-11-16") is None
+    assert rule.occurs_on("2024-08-15") and not rule.occurs_on("2024-09-15")
+
+
+def test_occurrences_match_stepping_from_the_start():
+    rng = random.Random(5)
+    for _ in range(200):
+        start = f"{rng.randint(2020, 2022)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        rule = _rule(start, interval=rng.randint(1, 13), day=rng.randint(1, 31))
+        stepped = [rule.date_of(n) for n in range(120)]  # past 2027 at any interval
+        lo = f"{rng.randint(2019, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        hi = f"{rng.randint(2019, 2027)}-{rng.randint(1, 12):02d}-01"
+        expected = [d for d in stepped if max(lo, start) <= d < hi]
+        assert list(rule.occurrences(lo, hi)) == expected
+        assert list(rule.occurrences(lo, hi, reverse=True)) == expected[::-1]
+
+
+def test_amount_changes_apply_from_their_date():
+    rule = _rule("2024-01-01", changes=[("2024-03-01", 150), ("2024-06-15", 200)])
+    assert [rule.amount_on(d) for d in ("2024-02-01", "2024-03-01", "2024-06-01", "2024-07-01")] == [100, 150, 150, 200]
+
+
+def test_planned_rows_until_confirmed_or_skipped(db):
+    rent = db.add_recurring_rule("2024-01-05", 90000, 1, "Expense", "rent")
+    salary = db.add_recurring_rule("2024-01-25", 300000, 1, "Income", "salary", end_date="2024-02-28")
+    assert [(p.date, p.amount, p.rule_id) for p in db.get_planned(2024, 2)] == [
+        ("2024-02-05", 90000, rent),
+        ("2024-02-25", 300000, salary),
+    ]
+    assert db.get_monthly_summary(2024, 2) == (0, 0, 0)
+    assert db.get_monthly_summary(2024, 2, planned=True) == (300000, 90000, 210000)
+    assert db.get_planned(2024, 3)[0].rule_id == rent and len(db.get_planned(2024, 3)) == 1
+
+    tx_id = db.confirm_occurrence(rent, "2024-02-05", {"amount": 95000, "date": "2024-02-06"})
+    db.skip_occurrence(salary, "2024-02-25")
+    assert db.get_planned(2024, 2) == []
+    row = db.get_transaction(tx_id)
+    assert (row["date"], row["amount"], row["description"]) == ("2024-02-06", 95000, "rent")
+    assert db.get_monthly_summary(2024, 2, planned=True) == (0, 95000, -95000)
+    with pytest.raises(ValueError, match="already confirmed or skipped"):
+        db.confirm_occurrence(rent, "2024-02-05")
+    with pytest.raises(ValueError, match="does not occur"):
+        db.skip_occurrence(rent, "2024-02-06")
+
+
+def test_planned_rows_merge_with_booked_ones(db):
+    rule = db.add_recurring_rule("2024-01-10", 5000, 1, "Expense", "gym")
+    db.add_transaction("2024-03-10", 700, 1, "Expense", "lunch")
+    db.add_transaction("2024-03-20", 800, 1, "Expense", "dinner")
+    rows = db.get_transactions(2024, 3, planned=True)
+    assert [(r["date"], r["description"], r["id"] is None) for r in rows] == [
+        ("2024-03-20", "dinner", False),
+        ("2024-03-10", "lunch", False),
+        ("2024-03-10", "gym", True),
+    ]
+    db.change_recurring_amount(rule, "2024-03-01", 6000)
+    assert [p.amount for p in db.get_planned(2024, 2) + db.get_planned(2024, 3)] == [5000, 6000]
+
+
+def test_ending_or_deleting_a_rule_keeps_confirmed_rows(db):
+    rule = db.add_recurring_rule("2024-01-01", 1000, 1, "Expense", "phone")
+    tx_id = db.confirm_occurrence(rule, "2024-01-01")
+    db.end_recurring_rule(rule, "2024-02-01")
+    assert len(db.get_planned(2024, 2)) == 1 and db.get_planned(2024, 3) == []
+    db.delete_recurring_rule(rule)
+    assert db.get_planned(2024, 2) == []
+    assert db.get_transaction(tx_id)["amount"] == 1000
+    with pytest.raises(ValueError):
+        db.end_recurring_rule(rule, None)
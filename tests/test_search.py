@@ -0,0 +1,54 @@
+def _descriptions(rows):
+    return sorted(r["description"] for r in rows)
+
+
+def _seed(db):
+    db.add_transaction("2024-01-01", 100, 1, "Expense", "Grocery store downtown")
+    db.add_transaction("2024-01-02", 200, 1, "Expense", "Gas station")
+    db.add_transaction("2024-01-03", 300, 1, "Expense", "Groceries and gas")
+
+
+def test_last_word_matches_as_a_prefix(db):
+    _seed(db)
+    rows, _ = db.search("groc")
+    assert _descriptions(rows) == ["Groceries and gas", "Grocery store downtown"]
+    rows, _ = db.search("groc ")
+    assert rows == []
+
+
+def test_every_word_must_match(db):
+    _seed(db)
+    rows, _ = db.search("gas groc")
+    assert _descriptions(rows) == ["Groceries and gas"]
+
+
+def test_fts_syntax_in_the_query_is_inert(db):
+    _seed(db)
+    # AND is a word to look for here, not an operator.
+    rows, _ = db.search('gas AND "groc')
+    assert _descriptions(rows) == ["Groceries and gas"]
+    assert db.search("gas OR store")[0] == []
+    assert db.search("NEAR(") == ([], None)
+    assert db.search("***") == ([], None)
+
+
+def test_search_follows_updates_and_deletes(db):
+    _seed(db)
+    tx_id = db.add_transaction("2024-01-04", 400, 1, "Expense", "Bakery")
+    assert len(db.search("bakery")[0]) == 1
+    db.update_transaction(tx_id, "2024-01-04", 400, 1, "Expense", "Butcher")
+    assert db.search("bakery")[0] == []
+    assert len(db.search("butcher")[0]) == 1
+    db.delete_transaction(tx_id)
+    assert db.search("butcher")[0] == []
+
+
+def test_search_pages_by_offset(db):
+    for day in range(1, 6):
+        db.add_transaction(f"2024-01-{day:02d}", day, 1, "Expense", "coffee")
+    first, cursor = db.search("coffee", limit=3)
+    rest, end = db.search("coffee", offset=cursor, limit=3)
+    assert end is None
+    assert len(first) == 3 and len(rest) == 2
+    assert {r["id"] for r in first}.isdisjoint(r["id"] for r in rest)
+
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from expense_tracker import startup
+from expense_tracker.startup import DONE, StartupProfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_marks_keep_their_first_time_and_report_once_done():
+    done = []
+    profile = StartupProfile(0.0, on_done=done.append)
+    profile.mark("imports")
+    first = profile.elapsed("imports")
+    profile.mark("imports")
+    assert profile.elapsed("imports") == first
+    for name in DONE[:-1]:
+        profile.mark(name)
+    assert done == []
+    profile.mark(DONE[-1])
+    profile.mark(DONE[-1])
+    assert done == [profile]
+    report = profile.report()
+    assert "time to first paint" in report
+    assert all(name in report for name in DONE)
+
+
+def test_process_age_is_positive_where_available():
+    age = startup.process_age()
+    assert age is None or age >= 0
+
+
+def _run(code, *args):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    return subprocess.run(
+        [sys.executable, "-c", code, *args], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+
+
+def test_startup_module_stays_free_of_qt():
+    out = _run("import sys, expense_tracker.startup; print([m for m in sys.modules if m.startswith('PySide6')])")
+    assert out.stdout.strip() == "[]"
+
+
+def test_profiled_start_reaches_every_milestone_and_quits(tmp_path):
+    # The database open is slowed down so that data arrives after the
+    # first paint and the last milestone is marked from page_loaded.
+    code = (
+        "import sys, time\n"
+        "from expense_tracker import main, models\n"
+        "init = models.Database.__init__\n"
+        "def slow(self, *a, **k):\n"
+        "    init(self, *a, **k)\n"
+        "    if not self.readonly:\n"
+        "        time.sleep(0.5)\n"
+        "models.Database.__init__ = slow\n"
+        "main.main(sys.argv[1:])\n"
+    )
+    out = _run(code, "--db", str(tmp_path / "expenses.db"), startup.FLAG, startup.QUIT_FLAG)
+    assert out.returncode == 0, out.stderr
+    assert "Traceback" not in out.stderr
+    for name in DONE + ("database open", "imports", "window built"):
+        assert f"  {name} " in out.stderr
@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+from expense_tracker import sync
+from expense_tracker.models import Database
+from expense_tracker.sync import SyncError
+
+
+@pytest.fixture
+def pair(tmp_path):
+    a = Database(str(tmp_path / "a.db"))
+    b = Database(str(tmp_path / "b.db"))
+    yield a, b
+    a.close()
+    b.close()
+
+
+def _ledger(db):
+    return sorted(
+        tuple(r)
+        for r in db.conn.execute(
+            """
+            SELECT t.uuid, t.date, t.amount, t.type, t.description, c.name
+            FROM transactions t LEFT JOIN categories c ON c.id = t.category_id
+            """
+        )
+    )
+
+
+def _send(src, dst, tmp_path, name):
+    path = str(tmp_path / f"{name}.finlysync")
+    sync.export_changes(src, path)
+    return sync.apply_changes(dst, path), path
+
+
+def test_ledgers_converge_after_a_round_trip(pair, tmp_path):
+    a, b = pair
+    food = a.add_category("Food")
+    a.add_transaction("2024-03-01", 1200, food, "Expense", "lunch")
+    rent = a.add_transaction("2024-03-02", 90000, 1, "Expense", "rent")
+    _send(a, b, tmp_path, "a1")
+    assert _ledger(b) == _ledger(a)
+    assert b.get_monthly_summary(2024, 3) == (0, 91200, -91200)
+
+    b.add_transaction("2024-03-05", 5000, 1, "Income", "gift")
+    uuid = a.conn.execute("SELECT uuid FROM transactions WHERE id = ?", (rent,)).fetchone()[0]
+    b_rent = b.conn.execute("SELECT id FROM transactions WHERE uuid = ?", (uuid,)).fetchone()[0]
+    b.delete_transaction(b_rent)
+    _send(b, a, tmp_path, "b1")
+    assert _ledger(a) == _ledger(b)
+    assert a.get_monthly_summary(2024, 3) == (5000, 1200, 3800)
+    assert a.search("rent")[0] == []
+
+
+def test_the_later_edit_wins_on_both_sides(pair, tmp_path):
+    a, b = pair
+    tx_id = a.add_transaction("2024-03-01", 1000, 1, "Expense", "coffee")
+    _send(a, b, tmp_path, "a1")
+    _send(b, a, tmp_path, "b1")
+    a.update_transaction(tx_id, "2024-03-01", 1100, 1, "Expense", "coffee on a")
+    b_id = b.conn.execute("SELECT id FROM transactions").fetchone()[0]
+    b.update_transaction(b_id, "2024-03-01", 1200, 1, "Expense", "coffee on b")
+    # (stamp, device) of each edit; the higher one wins.
+    versions = {
+        (db.conn.execute("SELECT stamp FROM change_log WHERE entity = 't'").fetchone()[0], sync.device_id(db)): name
+        for db, name in ((a, "coffee on a"), (b, "coffee on b"))
+    }
+    _send(a, b, tmp_path, "a2")
+    _send(b, a, tmp_path, "b2")
+    assert _ledger(a) == _ledger(b)
+    assert [r[4] for r in _ledger(a)] == [versions[max(versions)]]
+
+
+def test_applying_a_file_again_changes_nothing(pair, tmp_path):
+    a, b = pair
+    a.add_transaction("2024-03-01", 1000, 1, "Expense", "coffee")
+    first, path = _send(a, b, tmp_path, "a1")
+    before = _ledger(b)
+    again = sync.apply_changes(b, path)
+    assert first.applied >= 1
+    assert again.applied == 0 and again.superseded == again.changes
+    assert _ledger(b) == before
+
+
+def test_categories_created_on_both_sides_merge_by_name(pair, tmp_path):
+    a, b = pair
+    a.add_transaction("2024-03-01", 1000, a.add_category("Food"), "Expense", "on a")
+    b.add_transaction("2024-03-02", 2000, b.add_category("Food"), "Expense", "on b")
+    _send(a, b, tmp_path, "a1")
+    _send(b, a, tmp_path, "b1")
+    for db in (a, b):
+        assert [c["name"] for c in db.get_categories()].count("Food") == 1
+        assert {r[5] for r in _ledger(db)} == {"Food"}
+    uuids = {db.conn.execute("SELECT uuid FROM categories WHERE name = 'Food'").fetchone()[0] for db in (a, b)}
+    assert len(uuids) == 1
+
+
+def test_own_files_are_refused(pair, tmp_path):
+    a, b = pair
+    a.add_transaction("2024-03-01", 1000, 1, "Expense", None)
+    _, path = _send(a, b, tmp_path, "a1")
+    with pytest.raises(SyncError, match="exported from this database"):
+        sync.apply_changes(a, path)
+
+
+def test_a_delta_after_a_missing_file_is_refused(pair, tmp_path):
+    a, b = pair
+    a.add_transaction("2024-03-01", 1000, 1, "Expense", None)
+    _send(a, b, tmp_path, "a1")
+    _send(b, a, tmp_path, "b1")
+    # b as it was before a2, e.g. restored from a backup.
+    restored = sqlite3.connect(str(tmp_path / "restored.db"))
+    b.conn.backup(restored)
+    restored.close()
+    a.add_transaction("2024-03-02", 1000, 1, "Expense", None)
+    _send(a, b, tmp_path, "a2")
+    _send(b, a, tmp_path, "b2")
+    a.add_transaction("2024-03-03", 1000, 1, "Expense", None)
+    path = str(tmp_path / "a3.finlysync")
+    assert sync.export_changes(a, path).since > 0
+    assert sync.apply_changes(b, path).applied == 1
+    assert _ledger(a) == _ledger(b)
+    c = Database(str(tmp_path / "restored.db"))
+    try:
+        with pytest.raises(SyncError, match="apply the earlier file"):
+            sync.apply_changes(c, path)
+        assert c.count_transactions() == 1
+    finally:
+        c.close()
@@ -0,0 +1,33 @@
+from datetime import date
+
+from benchmarks.run import stats
+from benchmarks.synthetic import generate, build_database
+
+
+def test_generator_is_deterministic_and_in_date_order():
+    rows = list(generate(2000, years=2, end=date(2024, 12, 31), seed=5))
+    assert rows == list(generate(2000, years=2, end=date(2024, 12, 31), seed=5))
+    assert rows != list(generate(2000, years=2, end=date(2024, 12, 31), seed=6))
+    dates = [r[0] for r in rows]
+    assert dates == sorted(dates)
+    assert dates[0] >= "2023-01-01" and dates[-1] <= "2024-12-31"
+    assert all(isinstance(r[1], int) and r[1] > 0 for r in rows)
+
+
+def test_built_database_holds_the_generated_rows(tmp_path):
+    db = build_database(str(tmp_path / "synthetic.db"), 500, years=1, seed=9)
+    try:
+        rows = list(generate(500, years=1, seed=9))
+        assert db.count_transactions() == 500
+        march = [r for r in rows if r[0].startswith("2025-03")]
+        income = sum(r[1] for r in march if r[3] == "Income")
+        expense = sum(r[1] for r in march if r[3] == "Expense")
+        assert db.get_monthly_summary(2025, 3) == (income, expense, income - expense)
+        assert {c["name"] for c in db.get_categories()} >= {r[2] for r in rows}
+    finally:
+        db.close()
+
+
+def test_stats_report_median_and_p95_in_milliseconds():
+    result = stats([i / 1000 for i in range(1, 101)], rows=3)
+    assert result == {"n": 100, "median_ms": 50.5, "p95_ms": 96.0, "min_ms": 1.0, "rows": 3}
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from expense_tracker.models import Database, signed_amount  # noqa: E402
+from expense_tracker.views import TransactionTableModel  # noqa: E402
+
+
+def _month_source(db):
+    def fetch_page(cursor, limit, deliver):
+        deliver(*db.get_transactions_page(2024, 3, after=cursor, limit=limit))
+
+    return fetch_page
+
+
+def _shown(model):
+    return [(model.row_at(i)["id"], model.data(model.index(i, model.BALANCE_COLUMN))) for i in range(model.rowCount())]
+
+
+def test_edits_shift_balances_without_touching_other_rows(tmp_path):
+    db = Database(str(tmp_path / "expenses.db"))
+    rng = random.Random(7)
+    try:
+        for i in range(30):
+            db.add_transaction(f"2024-03-{1 + i % 28:02d}", 100 + i, 1, rng.choice(["Income", "Expense"]), None)
+        model = TransactionTableModel(page_size=8)
+        model.set_source(_month_source(db))
+        model.fetchMore()
+        changed = []
+        model.dataChanged.connect(lambda top, bottom: changed.append((top.column(), bottom.column())))
+        for step in range(40):
+            op = rng.choice(["add", "edit", "delete", "earlier"])
+            if op == "earlier":
+                tx_id = db.add_transaction("2024-02-10", 500, 1, "Income", None)
+                model.shift_balances(signed_amount(db.get_transaction(tx_id)))
+                continue
+            ids = [model.row_at(i)["id"] for i in range(model.rowCount())]
+            if op == "add" or not ids:
+                tx_id = db.add_transaction(f"2024-03-{rng.randint(1, 28):02d}", rng.randint(1, 900), 1, "Expense", None)
+                assert model.apply_change(None, db.get_transaction(tx_id))
+            elif op == "edit":
+                old = db.get_transaction(rng.choice(ids))
+                db.update_transaction(old["id"], old["date"], rng.randint(1, 900), 1, old["type"], None)
+                assert model.apply_change(old, db.get_transaction(old["id"]))
+            else:
+                old = db.get_transaction(rng.choice(ids))
+                db.delete_transaction(old["id"])
+                assert model.apply_change(old, None)
+        assert changed and all(c == (model.BALANCE_COLUMN, model.BALANCE_COLUMN) for c in changed if c[0] != 0)
+        while model.canFetchMore():
+            model.fetchMore()
+        fresh = TransactionTableModel(page_size=1000)
+        fresh.set_source(_month_source(db))
+        assert _shown(model) == _shown(fresh)
+    finally:
+        db.close()
+
+
+def _ids(model):
+    return [model.row_at(i)["id"] for i in range(model.rowCount())]
+
+
+def test_inserts_land_in_date_order_and_deletes_remove_the_row(db):
+    first = db.add_transaction("2024-03-05", 100, 1, "Expense", None)
+    last = db.add_transaction("2024-03-20", 100, 1, "Expense", None)
+    model = TransactionTableModel(page_size=50)
+    model.set_source(_month_source(db))
+    inserted = []
+    model.rowsInserted.connect(lambda _parent, start, end: inserted.append((start, end)))
+    middle = db.add_transaction("2024-03-10", 100, 1, "Expense", None)
+    assert model.apply_change(None, db.get_transaction(middle))
+    assert inserted == [(1, 1)]
+    assert _ids(model) == [last, middle, first]
+    old = db.get_transaction(last)
+    db.delete_transaction(last)
+    assert model.apply_change(old, None)
+    assert _ids(model) == [middle, first]
+
+
+def test_a_moved_row_is_reordered(db):
+    a = db.add_transaction("2024-03-05", 100, 1, "Expense", None)
+    b = db.add_transaction("2024-03-20", 100, 1, "Expense", None)
+    model = TransactionTableModel(page_size=50)
+    model.set_source(_month_source(db))
+    old = db.get_transaction(a)
+    db.update_transaction(a, "2024-03-25", 100, 1, "Expense", None)
+    assert model.apply_change(old, db.get_transaction(a))
+    assert _ids(model) == [a, b]
+
+
+def test_changes_are_refused_while_a_page_is_loading(db):
+    pending = []
+    model = TransactionTableModel(page_size=50)
+    model.set_source(lambda cursor, limit, deliver: pending.append(deliver))
+    tx_id = db.add_transaction("2024-03-05", 100, 1, "Expense", None)
+    assert not model.apply_change(None, db.get_transaction(tx_id))
+    pending.pop()(*db.get_transactions_page(2024, 3, after=None, limit=50))
+    assert _ids(model) == [tx_id]
+
+
+def test_rows_beyond_the_loaded_pages_wait_for_their_page(db):
+    for day in range(10, 20):
+        db.add_transaction(f"2024-03-{day:02d}", 100, 1, "Expense", None)
+    model = TransactionTableModel(page_size=4)
+    model.set_source(_month_source(db))
+    tx_id = db.add_transaction("2024-03-01", 100, 1, "Expense", None)
+    assert model.apply_change(None, db.get_transaction(tx_id))
+    assert model.rowCount() == 4
+    while model.canFetchMore():
+        model.fetchMore()
+    assert _ids(model).count(tx_id) == 1
+    assert _ids(model)[-1] == tx_id
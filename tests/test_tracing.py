@@ -0,0 +1,78 @@
+import sqlite3
+
+from expense_tracker import tracing
+from expense_tracker.tracing import Histogram, Tracer, normalize_sql
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    hist = Histogram()
+    for ms in [0.05] * 90 + [3.0] * 9 + [4000.0]:
+        hist.add(ms)
+    assert hist.percentile(0.5) == 0.1
+    assert hist.percentile(0.95) == 5
+    assert hist.percentile(1.0) == 4000.0
+    summary = hist.to_dict()
+    assert summary["count"] == 100
+    assert summary["buckets_ms"] == {"0.1": 90, "5": 9, "inf": 1}
+
+
+def test_literals_are_folded_out_of_statements():
+    assert normalize_sql("SELECT *  FROM t\n WHERE a = 'it''s' AND b = 12.5 AND c2 = 3") == (
+        "SELECT * FROM t WHERE a = ? AND b = ? AND c2 = ?"
+    )
+
+
+def test_statements_are_grouped_under_their_operation(tmp_path):
+    path = str(tmp_path / "t.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    tracer = Tracer()
+    tracer.attach(conn, path)
+
+    class Store:
+        def fill(self, n):
+            for i in range(n):
+                conn.execute(f"INSERT INTO t VALUES ({i})")
+            conn.commit()
+
+        def rows(self):
+            yield from conn.execute("SELECT x FROM t")
+
+    tracer.instrument(Store)
+    Store().fill(3)
+    assert list(Store().rows()) == [(0,), (1,), (2,)]
+    conn.close()
+
+    report = tracer.report()
+    assert list(report["operations"]) == ["Store.fill"]
+    assert report["operations"]["Store.fill"]["count"] == 1
+    counts = {q["sql"]: q["count"] for q in report["queries"]}
+    assert counts["INSERT INTO t VALUES (?)"] == 3
+    insert = next(e for e in report["slowest"] if e["sql"].startswith("INSERT"))
+    assert insert["operation"] == "Store.fill"
+    assert insert["plan"] == []
+
+
+def test_slowest_select_carries_its_query_plan(tmp_path):
+    path = str(tmp_path / "t.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+    conn.commit()
+    tracer = Tracer()
+    tracer.attach(conn, path)
+    tracer.timed("lookup", lambda: conn.execute("SELECT x FROM t WHERE x = 1").fetchall())()
+    conn.close()
+    entry = tracer.report()["slowest"][0]
+    assert entry["operation"] == "lookup"
+    assert entry["plan"] == ["SEARCH t USING INTEGER PRIMARY KEY (rowid=?)"]
+
+
+def test_trace_is_requested_by_flag_or_environment(monkeypatch):
+    monkeypatch.delenv(tracing.ENV_VAR, raising=False)
+    assert not tracing.requested([])
+    assert tracing.requested(["--trace"])
+    monkeypatch.setenv(tracing.ENV_VAR, "1")
+    assert tracing.requested(None)
+    monkeypatch.setenv(tracing.ENV_VAR, "0")
+    assert not tracing.requested(None)
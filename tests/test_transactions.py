@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from expense_tracker.models import Database
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_unit_of_work_commits_once_at_the_end(db):
+    with db.transaction():
+        db.add_transaction("2024-01-01", 100, 1, "Expense", None)
+        db.add_transaction("2024-01-02", 200, 1, "Expense", None)
+        assert db.in_unit_of_work
+        assert _count(db.db_path) == 0
+    assert not db.in_unit_of_work
+    assert _count(db.db_path) == 2
+
+
+def test_a_failed_unit_of_work_rolls_back_everything(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_transaction("2024-01-01", 100, 1, "Expense", None)
+            raise RuntimeError("boom")
+    assert db.count_transactions() == 0
+    assert db.get_monthly_summary(2024, 1) == (0, 0, 0)
+
+
+def test_a_handled_inner_failure_only_undoes_the_inner_block(db):
+    with db.transaction():
+        db.add_transaction("2024-01-01", 100, 1, "Expense", "outer")
+        try:
+            with db.transaction():
+                db.add_transaction("2024-01-02", 200, 1, "Expense", "inner")
+                raise ValueError
+        except ValueError:
+            pass
+        db.add_transaction("2024-01-03", 300, 1, "Expense", "after")
+    assert [r["description"] for r in db.get_transactions(2024, 1)] == ["after", "outer"]
+    assert db.get_monthly_summary(2024, 1) == (0, 400, -400)
+
+
+def test_cached_reads_see_the_unit_of_work_after_commit(db):
+    assert db.get_monthly_summary(2024, 1) == (0, 0, 0)
+    with db.transaction():
+        db.add_transaction("2024-01-01", 100, 1, "Income", None)
+    assert db.get_monthly_summary(2024, 1) == (100, 0, 100)
+
+
+@pytest.mark.parametrize(
+    "profile, journal, synchronous",
+    [("safe", "delete", 2), ("balanced", "wal", 1), ("fast", "wal", 0)],
+)
+def test_durability_profiles_set_the_pragmas(tmp_path, profile, journal, synchronous):
+    database = Database(str(tmp_path / "p.db"), durability=profile)
+    try:
+        assert database.conn.execute("PRAGMA journal_mode").fetchone()[0] == journal
+        assert database.conn.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+    finally:
+        database.close()
+
+
+def test_durability_comes_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("FINLY_DURABILITY", "safe")
+    database = Database(str(tmp_path / "p.db"))
+    try:
+        assert database.durability == "safe"
+    finally:
+        database.close()
+
+
+def test_unknown_durability_profile_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        Database(str(tmp_path / "p.db"), durability="reckless")
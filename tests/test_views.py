@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from expense_tracker.views import TransactionTableModel  # noqa: E402
+
+
+def _row(i):
+    return {
+        "id": i,
+        "date": f"2024-03-{1 + i % 28:02d}",
+        "amount": 100 * i,
+        "type": "Expense",
+        "category": None,
+        "description": f"row {i}",
+    }
+
+
+def _list_source(rows, calls):
+    # Pages of `rows`; the cursor is the index of the next row.
+    def fetch_page(cursor, limit, deliver):
+        start = cursor or 0
+        calls.append((start, limit))
+        end = start + limit
+        deliver(rows[start:end], end if end < len(rows) else None)
+
+    return fetch_page
+
+
+def test_rows_are_fetched_a_page_at_a_time():
+    rows = [_row(i) for i in range(25)]
+    calls = []
+    model = TransactionTableModel(page_size=10)
+    model.set_source(_list_source(rows, calls))
+    assert model.rowCount() == 10 and calls == [(0, 10)]
+    assert model.data(model.index(3, 5)) == "row 3"
+    assert model.data(model.index(3, 2)) == "3.00"
+    assert model.data(model.index(3, 4)) == "Uncategorized"
+    model.fetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 25 and calls == [(0, 10), (10, 10), (20, 10)]
+    assert not model.canFetchMore()
+    model.fetchMore()
+    assert len(calls) == 3
+
+
+def test_pages_for_a_replaced_source_are_dropped():
+    pending = []
+    model = TransactionTableModel(page_size=10)
+    model.set_source(lambda cursor, limit, deliver: pending.append(deliver))
+    assert model.rowCount() == 0 and not model.canFetchMore()  # loading
+    model.set_source(_list_source([_row(i) for i in range(3)], []))
+    pending[0]([_row(i) for i in range(10)], 10)
+    assert [model.row_at(i)["id"] for i in range(model.rowCount())] == [0, 1, 2]
+    assert not model.canFetchMore()